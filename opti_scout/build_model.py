@@ -1,10 +1,42 @@
-from opti_scout.classes import AssigningActivititesProblem, Solution
+from opti_scout.checkpoint import IncumbentSnapshots
+from opti_scout.classes import AssigningActivititesProblem, ProblemDelta, Solution, selection_keys
+from opti_scout.decomposition import DecompositionRound, block_columns, fix_and_resolve
+from opti_scout.heuristic import AssignmentState, greedy_assignment, priority_order
+from opti_scout.lazy import ConflictGenerator
+from opti_scout.matrix import ModelMatrix, RowBlock
+from opti_scout.metrics import BuildReport, PresolveReport, ProgressEvent
+from opti_scout.presolve import presolve
+from opti_scout.solver import SolverConfig, captured_output, followed_log, highs_node_count, parse_solver_log
 from pydantic import BaseModel
-from mip import BINARY, xsum, Model, maximize, Var
+from contextlib import contextmanager, nullcontext
+from typing import Callable
+from mip import BINARY, INT_MAX, MAXIMIZE, Column, Constr, LinExpr, xsum, Model, maximize, OptimizationStatus, Var
+import hashlib
+import json
+import math
+import os
+import shutil
 import time
 import datetime
+import numpy as np
 import pandas as pd
 
+# the settings of the builder that change the rows of the model
+MODEL_SETTINGS = [
+    "minSessionsPerGroup",
+    "maxSessionsPerGroup",
+    "maxPopularActivities",
+    "noOverlapMode",
+    "assembly",
+    "presolve",
+    "oneLocationPerDay",
+    "conflictRows",
+]
+# the model files kept in the model cache, as written by matrix and by expression assembly
+MODEL_EXTENSIONS = [".mps", ".mps.gz"]
+# the seconds a solve of conflictRows "rounds" gets at least, also when the LP rounds used up the time
+MIN_ROUND_SECONDS = 1
+
 
 class ModelBuilder(BaseModel, arbitrary_types_allowed=True):
     assigning_activities_problem: AssigningActivititesProblem
@@ -13,529 +45,967 @@ class ModelBuilder(BaseModel, arbitrary_types_allowed=True):
     maxSolveSeconds: int
     maxPopularActivities: int
     minSessionsPerGroup: int
-
-
+    # "pairwise" adds one row per overlapping pair of sessions, "clique" one row per set of sessions running at the same time
+    noOverlapMode: str
+    # "expression" adds the rows one by one through python-mip, "matrix" collects them as arrays and loads them in bulk
+    assembly: str = "expression"
+    # name the rows in matrix assembly as well, for debugging
+    rowNames: bool = False
+    matrix: ModelMatrix | None = None
+    # trace the peak python memory of each phase, this slows down building the model
+    traceMemory: bool = False
+    # write the report of the phases as <filename>_metrics.json next to the model file
+    writeMetrics: bool = False
+    report: BuildReport | None = None
+    # solution of this or an earlier version of the problem to start the solver from
+    warmStart: Solution | None = None
+    # "mip" solves the model with the solver, "heuristic" assigns greedily by priority and improves with local search,
+    # "decomposition" solves the model per day or activity area in parallel
+    engine: str = "mip"
+    # heuristic engine: also solve the LP relaxation of the model for the gap of the heuristic solution
+    lpBound: bool = True
+    # decomposition engine: "day" or "area" blocks, the max number of rounds and of worker processes
+    decomposeBy: str = "day"
+    maxRounds: int = 5
+    workers: int | None = None
+    rounds: list[DecompositionRound] = []
+    # the last solution, its variables and where each constraint family starts in the model, for update
+    solution: Solution | None = None
+    variables: list[Var] | None = None
+    rowStarts: dict[str, int] = {}
+    liveRows: dict[tuple, Constr] | None = None
+    # directory of models built before, the model of the same problem and settings is read from there instead
+    # of being built again
+    modelCache: str | None = None
+    # drop the rows that can never bind and fix the selections that can never be chosen before solving, the presolve
+    # works on the collected rows, so the model is built with matrix assembly
+    presolve: bool = False
+    # backend, threads, cuts, preprocessing, emphasis, gap and node limit of the solver
+    solverConfig: SolverConfig = SolverConfig()
+    # a group does not do different activities in different activity areas on the same day
+    oneLocationPerDay: bool = False
+    # the pair rows of overlapping sessions in pairwise mode and of the one location per day rule, "model" adds all
+    # of them to the model, "rounds" only the ones of the groups the solution of the last solve breaks a pair of,
+    # over as many solves as needed, and "lazy" the ones broken by the solutions CBC finds, from its lazy constraints
+    # callback. CBC does not preprocess the model with lazy constraints. Only the mip engine leaves rows out
+    conflictRows: str = "model"
+    # Solve in parts of at most this many seconds, the next part starts from the best solution so far. Every better
+    # solution is written to filename + "_incumbent.json" after its part, resume reads it back. CBC starts its search
+    # again for every part, a part that does not improve the solution makes the next one twice as long
+    checkpointSeconds: int | None = None
+    # called with every phase that ends and, while the solver runs with its log, with the progress of the search
+    progress: Callable[[ProgressEvent], None] | None = None
 
     @classmethod
-    def create(cls, assigning_activities_problem: AssigningActivititesProblem) -> "ModelBuilder":
+    def create(
+        cls, assigning_activities_problem: AssigningActivititesProblem, solverConfig: SolverConfig | None = None
+    ) -> "ModelBuilder":
+        solverConfig = solverConfig or SolverConfig()
         return cls(assigning_activities_problem=assigning_activities_problem, 
-                   model=Model(),
+                   model=solverConfig.create_model(),
+                   solverConfig=solverConfig,
                    maxSessionsPerGroup=100,
                    maxSolveSeconds=300,
                    maxPopularActivities=10,
-                   minSessionsPerGroup=0)
+                   minSessionsPerGroup=0,
+                   noOverlapMode="pairwise")
 
     def solve(self, filename: str) -> Solution:
+        if self.engine == "heuristic":
+            return self.solve_heuristic(filename)
+        if self.engine == "decomposition":
+            return self.solve_decomposition(filename)
+        if self.engine != "mip":
+            raise ValueError(f"Unknown engine '{self.engine}', use 'mip', 'heuristic' or 'decomposition'")
+
+        x = self.build(filename)
+        return self.optimize(x, filename)
+
+    # solve the model built for the variables x, from the warm start when there is one
+    def optimize(self, x: list[Var], filename: str) -> Solution:
+        if self.warmStart is not None:
+            with self.phase("warm_start", counted=False):
+                self.set_start(x)
+
+        self.solverConfig.apply(self.model)
+        generator = None
+        if self.lazy_conflicts():
+            group = self.assigning_activities_problem.selection_table.group
+            generator = ConflictGenerator(x, self.conflict_pairs(), group)
+            print(f"{self.conflictRows} conflict rows: {len(generator.pairs)} pairs left out of the model")
+        self.model.lazy_constrs_generator = generator if self.conflictRows == "lazy" else None
+        assigned = None
+        solvestarttime = time.perf_counter()
+        with self.phase("optimize", counted=False):
+            if self.conflictRows == "rounds" and generator is not None:
+                status, assigned = self.solve_rounds(x, filename, generator)
+            else:
+                status, assigned = self.run_checkpointed(x, filename, self.maxSolveSeconds)
+        self.report.solve_seconds = time.perf_counter() - solvestarttime
+        self.report.status = status.name
+        if status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE] and assigned is None:
+            self.report.objective = self.model.objective_value
+            self.report.bound = self.model.objective_bound
+        if generator is not None:
+            self.report.lazy_rows = generator.rows
+        if assigned is not None:
+            self.report.objective = float(np.dot([v.obj for v in x], assigned))
+
+        self.report.print()
+        if self.writeMetrics:
+            self.report.to_json(filename + "_metrics.json")
+
+        if assigned is not None:
+            solution = Solution(problem=self.assigning_activities_problem, assigned=assigned, status=status)
+        else:
+            solution = Solution.build(self.assigning_activities_problem, x, status)
+        solution.report = self.report
+        # kept for update
+        self.variables = x
+        self.solution = solution
+        return solution
+
+    # The solver with the time and node limits, its output goes to filename + "_solver.log" when the solver config
+    # asks for the log or progress follows it, the nodes and the time to the first solution are then taken from it
+    def run_solver(self, filename: str, max_seconds: float) -> OptimizationStatus:
+        max_nodes = self.solverConfig.maxNodes if self.solverConfig.maxNodes is not None else INT_MAX
+        if not self.solverConfig.solverLog and self.progress is None:
+            status = self.model.optimize(max_seconds=max_seconds, max_nodes=max_nodes)
+        else:
+            logfilename = filename + "_solver.log"
+            verbose = self.model.verbose
+            self.model.verbose = 1
+            try:
+                following = followed_log(logfilename, self.progress) if self.progress is not None else nullcontext()
+                with captured_output(logfilename), following:
+                    status = self.model.optimize(max_seconds=max_seconds, max_nodes=max_nodes)
+            finally:
+                self.model.verbose = verbose
+            with open(logfilename, "r", encoding="utf-8", errors="replace") as file:
+                log = file.read()
+            if verbose:
+                print(log, end="")
+            self.report.nodes, self.report.first_feasible_seconds = parse_solver_log(log)
+        if self.solverConfig.backend == "highs":
+            self.report.nodes = highs_node_count(self.model)
+        return status
+
+    # The solver in parts of checkpointSeconds, the better solution of each part is written by the incumbent
+    # snapshots and is the start of the next part. Stops when the solution is optimal, the time is up or the solver
+    # stops before the end of its part, on its node limit or without a solution. Returns the status and, when the last part did not end
+    # with the best solution written, that solution as a feasible one. python-mip does not call an incumbent updater
+    # for CBC, so the snapshots are only written between the parts
+    def run_checkpointed(
+        self, x: list[Var], filename: str, max_seconds: float
+    ) -> tuple[OptimizationStatus, np.ndarray | None]:
+        if self.checkpointSeconds is None:
+            return self.run_solver(filename, max_seconds), None
+        snapshots = IncumbentSnapshots(self.model, self.assigning_activities_problem, x, filename + "_incumbent.json")
+        starttime = time.perf_counter()
+        part = self.checkpointSeconds
+        nodes = None
+        best = None
+        best_bound = None
+        while True:
+            seconds = min(part, max_seconds - (time.perf_counter() - starttime))
+            partstart = time.perf_counter()
+            status = self.run_solver(filename, seconds)
+            if self.report.nodes is not None:
+                nodes = (nodes or 0) + self.report.nodes
+            solved = status in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]
+            improved = False
+            if solved:
+                written = snapshots.written
+                solution = [(v, v.x) for v in x if v.x > 0.5]
+                snapshots.update_incumbent(self.model.objective_value, self.model.objective_bound, solution)
+                improved = snapshots.written > written
+            if improved:
+                best = np.array([v.x > 0.5 for v in x], dtype=np.int8)
+                best_bound = self.model.objective_bound
+            else:
+                part *= 2
+            if status == OptimizationStatus.OPTIMAL or time.perf_counter() - starttime >= max_seconds - 1:
+                break
+            if time.perf_counter() - partstart < seconds - 1:
+                break
+            if best is not None:
+                self.model.start = [(v, float(a)) for v, a in zip(x, best.tolist())]
+        self.report.nodes = nodes
+        self.report.checkpoints = snapshots.written
+        if best is None or improved or (solved and self.model.objective_value >= snapshots.objective - 1e-9):
+            return status, None
+        print("the last part did not end with the best solution, it is taken from the incumbent snapshot")
+        self.report.bound = best_bound
+        return OptimizationStatus.FEASIBLE, best
+
+    # Solves the model, adds the rows of the pairs of the groups its solution breaks a pair of and solves it again, from
+    # the solution without the broken pairs, until no pair is broken. When the time is up before, the last solution
+    # without the broken pairs is returned as a feasible solution if every group still has its min sessions, else
+    # no solution was found
+    def solve_rounds(
+        self, x: list[Var], filename: str, generator: ConflictGenerator
+    ) -> tuple[OptimizationStatus, np.ndarray | None]:
+        starttime = time.perf_counter()
+        # first the rounds of the LP relaxation, which is fast to solve
+        with self.phase("lp_rounds", counted=False):
+            while self.model.optimize(relax=True) == OptimizationStatus.OPTIMAL:
+                self.report.lazy_rounds += 1
+                added = generator.add_rows(self.model, np.array([v.x for v in x]))
+                objective = self.model.objective_value
+                print(f"round {self.report.lazy_rounds}: LP objective {objective}, {added} pairs added")
+                if added == 0 or time.perf_counter() - starttime >= self.maxSolveSeconds:
+                    break
+        nodes = 0
+        while True:
+            seconds = max(self.maxSolveSeconds - (time.perf_counter() - starttime), MIN_ROUND_SECONDS)
+            status = self.run_solver(filename, seconds)
+            nodes += self.report.nodes or 0
+            self.report.lazy_rounds += 1
+            if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+                break
+            values = np.array([v.x for v in x])
+            added = generator.add_rows(self.model, values)
+            print(f"round {self.report.lazy_rounds}: objective {self.model.objective_value}, {added} pairs added")
+            if added == 0:
+                break
+            assigned = generator.repair(values)
+            if time.perf_counter() - starttime >= self.maxSolveSeconds:
+                self.report.nodes = nodes
+                # dropping selections only breaks the rows of the min sessions, all other rows are <= rows
+                table = self.assigning_activities_problem.selection_table
+                sessions = np.bincount(table.group[assigned], minlength=len(self.assigning_activities_problem.groups))
+                if (sessions >= self.minSessionsPerGroup).all():
+                    return OptimizationStatus.FEASIBLE, assigned
+                return OptimizationStatus.NO_SOLUTION_FOUND, None
+            self.model.start = [(v, float(a)) for v, a in zip(x, assigned.tolist())]
+        self.report.nodes = nodes
+        return status, None
+
+    # Applies the edits of delta to the problem and to the model that was solved last, and solves it again starting
+    # from the previous solution. Only the variables and rows of the edited selections are added to the model
+    def update(self, delta: ProblemDelta) -> Solution:
+        if self.variables is None:
+            raise ValueError("Solve the model before updating it")
+        if self.presolve:
+            raise ValueError("A presolved model cannot be updated, the rows of the edited selections may be gone")
+        filename = self.report.filename
+        self.new_report(filename)
+        with self.phase("apply_delta", counted=False):
+            problem = self.assigning_activities_problem.apply(delta)
+        with self.phase("update_model"):
+            x = self.update_model(problem)
+        self.warmStart = self.solution
+        return self.optimize(x, filename)
+
+    # the rows of the model that new variables can be added to, by session, (group, activity) and group
+    def live_rows(self) -> dict[tuple, Constr]:
+        if self.liveRows is not None:
+            return self.liveRows
+        problem = self.assigning_activities_problem
+        constrs = self.model.constrs
+        rows = {}
+        start = self.rowStarts["add_maxscout_constraint"]
+        rows |= {
+            ("capacity", a.id, t.id): constrs[start + i] for i, (a, t) in enumerate(problem.get_session_activities())
+        }
+        start = self.rowStarts["add_max_1_session_constraint"]
+        pairs = problem.get_selection_index().by_group_activity
+        rows |= {
+            ("activity", problem.groups[g].id, problem.activities[a].id): constrs[start + i]
+            for i, (g, a) in enumerate(pairs)
+        }
+        for family, step in [
+            ("popular", "add_max_nb_of_most_popular_activities_constraint"),
+            ("min_sessions", "add_min_session_per_group_constraint"),
+            ("max_sessions", "add_max_sessions_per_group_constraint"),
+            ("out_of_camp", "add_at_most_1_activity_out_of_camp"),
+        ]:
+            start = self.rowStarts[step]
+            rows |= {(family, g.id): constrs[start + i] for i, g in enumerate(problem.groups)}
+        self.liveRows = rows
+        return rows
+
+    # Changes the model from the current problem to problem. The variables of selections that are still the same
+    # are kept, the others are fixed at 0 as deleting columns would renumber the model. New variables are added to
+    # the existing rows of their session, activity and group, new rows are only added for new (group, activity)
+    # pairs, new groups and the overlaps of the new variables. Returns the variables of the selections of problem
+    def update_model(self, problem: AssigningActivititesProblem) -> list[Var]:
+        old = self.assigning_activities_problem
+        rows = self.live_rows()
+        old_index, index = old.get_selection_index(), problem.get_selection_index()
+        old_keys = selection_keys(old)
+        old_position = {key: r for r, key in enumerate(old_keys)}
+        old_sizes = old.get_selection_sizes()
+
+        keys = selection_keys(problem)
+        sizes = problem.get_selection_sizes()
+        priority = problem.selection_table.priority.tolist()
+        x = [None] * len(keys)
+        kept = set()
+        added = []
+        for r, key in enumerate(keys):
+            o = old_position.get(key)
+            if (
+                o is not None
+                and old_index.start[o] == index.start[r]
+                and old_index.end[o] == index.end[r]
+                and old_sizes[o] == sizes[r]
+            ):
+                x[r] = self.variables[o]
+                kept.add(o)
+                if x[r].obj != priority[r]:
+                    x[r].obj = priority[r]
+            else:
+                added.append(r)
+        for o, v in enumerate(self.variables):
+            if o not in kept:
+                v.ub = 0
+                v.obj = 0
+
+        capacity = {(a.id, t.id): t.capacity for a, t in old.get_session_activities()}
+        for a, t in problem.get_session_activities():
+            if ("capacity", a.id, t.id) in rows and capacity.get((a.id, t.id)) != t.capacity:
+                rows[("capacity", a.id, t.id)].rhs = t.capacity
+        # a group that left must not keep asking for its min sessions
+        groups = {g.id for g in problem.groups}
+        for g in old.groups:
+            if g.id not in groups:
+                rows[("min_sessions", g.id)].rhs = 0
+
+        out_of_camp = np.zeros(len(keys), dtype=bool)
+        out_of_camp[np.concatenate(index.out_of_camp_by_group + [np.empty(0, dtype=np.int64)])] = True
+        popular = np.zeros(len(keys), dtype=bool)
+        popular[np.concatenate(index.popular_by_group + [np.empty(0, dtype=np.int64)])] = True
+        names = problem.get_selection_names()
+        for r in added:
+            g, a, t = keys[r]
+            entries = [
+                (("capacity", a, t), sizes[r]),
+                (("activity", g, a), 1),
+                (("min_sessions", g), 1),
+                (("max_sessions", g), 1),
+                (("popular", g), 1 if popular[r] else 0),
+                (("out_of_camp", g), 1 if out_of_camp[r] else 0),
+            ]
+            entries = [(rows[k], float(c)) for k, c in entries if c != 0 and k in rows]
+            x[r] = self.model.add_var(
+                name=names[r] if keys[r] not in old_position else f"{names[r]}_{self.model.num_cols}",
+                var_type=BINARY,
+                obj=priority[r],
+                column=Column([c for c, _ in entries], [v for _, v in entries]),
+            )
 
-        x = self.generate_variables()
-
-        print("Time:" + datetime.datetime.now().strftime("%H:%M:%S"))
-        print("filename: " + filename)
-        print("#Activities: " + str(len(self.assigning_activities_problem.activities)))
-        print("#Activities without sessions: " + str(self.assigning_activities_problem.activitieswithoutsesessions))
-        print("#Sessions: " + str(self.assigning_activities_problem.count_sessions()))
-        print("#Groups: " + str(len(self.assigning_activities_problem.groups)))
-        print("#Groups without priorities: " + str(self.assigning_activities_problem.grpswithoutselections))
-        print("#selections: " + str(len(self.assigning_activities_problem.selections)))
-        time.sleep(5)
-        nbsteps=11
-        actualstep=1
-        starttime = datetime.datetime.now()
-        print("add_maxscout_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_maxscout_constraint(x)
-        addmax_scout_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_max_1_session_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_max_1_session_constraint(x)
-        addmax_1_session_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_no_overlapping_sessions_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_no_overlapping_sessions_constraint(x)
-        add_no_overlapping_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_unavailable_time_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        print("DISABLED as selections are only at valid times")
-        #self.add_unavailable_time_constraint(x)
-        add_unavailable_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_onlyone_activitylocation_eachday_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        print("DISABLED as we have the max one out of camp")
-        #self.add_onlyone_activitylocation_eachday_constraint(x)
-        add_location_eachday_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_age_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_age_constraint(x)
-        add_age_time = datetime.datetime.now()
-        # number is the maxmimum of popular activities
-        actualstep=actualstep+1
-        print("add_max_nb_of_most_popular_activities_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_max_nb_of_most_popular_activities_constraint(x)
-        add_max_popular_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_min_1_session_per_group_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_min_session_per_group_constraint(x)
-        add_min_1_session_per_group_time = datetime.datetime.now()
-        actualstep=actualstep+1      
-        print("add_max_sessions_per_group_constraint ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_max_sessions_per_group_constraint(x)
-        add_max_sessions_per_group_constraint_time = datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_at_most_1_activity_out_of_camp ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_at_most_1_activity_out_of_camp(x)
-        add_at_most_1_activity_out_of_camp_time= datetime.datetime.now()
-        actualstep=actualstep+1
-        print("add_objective ("+str(actualstep)+"/"+str(nbsteps)+")")
-        self.add_objective(x)
-        add_objective_time = datetime.datetime.now()
-        modelready_time = datetime.datetime.now()
-
-        print("filename: " + filename)
-        print("#Activities: " + str(len(self.assigning_activities_problem.activities)))
-        print("#Sessions: " + str(self.assigning_activities_problem.count_sessions()))
-
-        print("#Groups: " + str(len(self.assigning_activities_problem.groups)))
-        print("#selections: " + str(len(self.assigning_activities_problem.selections)))
-
-        print("starttime:" + starttime.strftime("%H:%M:%S"))
-        print("modelready_time:" + modelready_time.strftime("%H:%M:%S"))
-        print("endtime starttime diff:" + str(int((modelready_time - starttime).total_seconds() // 60)) + " minutes")
-
-        print(
-            "addmax_scout_time: "
-            + addmax_scout_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((addmax_scout_time - starttime).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "addmax_1_session_time: "
-            + addmax_1_session_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((addmax_1_session_time - addmax_scout_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_no_overlapping_time: "
-            + add_no_overlapping_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_no_overlapping_time - addmax_scout_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_unavailable_time: "
-            + add_unavailable_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_unavailable_time - add_no_overlapping_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_1_location_eachday_time: "
-            + add_location_eachday_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_location_eachday_time - add_unavailable_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_age_time: "
-            + add_age_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_age_time - add_location_eachday_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_max_popular_time: "
-            + add_max_popular_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_max_popular_time - add_age_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_min_1_session_per_group_time: "
-            + add_min_1_session_per_group_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_min_1_session_per_group_time - add_max_popular_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_max_sessions_per_group_constraint_time: "
-            + add_max_sessions_per_group_constraint_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_max_sessions_per_group_constraint_time - add_min_1_session_per_group_time ).total_seconds() // 60))
-            + " minutes)"
-        )
-        
-        print(
-            "add_at_most_1_activity_out_of_camp_time: "
-            + add_at_most_1_activity_out_of_camp_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_at_most_1_activity_out_of_camp_time - add_max_sessions_per_group_constraint_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        
-        print(
-            "add_objective_time: "
-            + add_objective_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_objective_time - add_at_most_1_activity_out_of_camp_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "modelready_time: "
-            + modelready_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((modelready_time - add_objective_time).total_seconds() // 60))
-            + " minutes)"
-        )
-
-        print(
-            "modelready_time total: "
-            + modelready_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((modelready_time - starttime).total_seconds() // 60))
-            + " minutes)"
+        added_rows = set(added)
+        for (g, a), pair in index.by_group_activity.items():
+            key = ("activity", problem.groups[g].id, problem.activities[a].id)
+            if key not in rows:
+                rows[key] = self.model.add_constr(xsum(x[r] for r in pair.tolist()) <= 1)
+        for g, group in enumerate(problem.groups):
+            if ("max_sessions", group.id) in rows:
+                continue
+            for family, selected, sense, rhs in [
+                ("popular", index.popular_by_group[g], "<=", self.maxPopularActivities),
+                ("min_sessions", index.by_group[g], ">=", self.minSessionsPerGroup),
+                ("max_sessions", index.by_group[g], "<=", self.maxSessionsPerGroup),
+                ("out_of_camp", index.out_of_camp_by_group[g], "<=", 1),
+            ]:
+                expr = xsum(x[r] for r in selected.tolist())
+                rows[(family, group.id)] = self.model.add_constr(expr >= rhs if sense == ">=" else expr <= rhs)
+        # the pairs whose rows are left out of the model are checked when it is solved
+        pairs = [np.empty((0, 2), dtype=np.int64)]
+        if not (self.lazy_conflicts() and self.noOverlapMode == "pairwise"):
+            pairs.append(problem.get_overlapping_selection_pairs())
+        if self.oneLocationPerDay and not self.lazy_conflicts():
+            pairs.append(self.location_pairs(problem))
+        for s, s1 in np.concatenate(pairs).tolist():
+            if s in added_rows or s1 in added_rows:
+                self.model += x[s] + x[s1] <= 1
+
+        self.assigning_activities_problem = problem
+        self.variables = x
+        return x
+
+    # greedy construction and local search instead of the solver, the min sessions per group are not enforced
+    # the model is only built when lpBound is set, to solve its LP relaxation for the gap
+    def solve_heuristic(self, filename: str) -> Solution:
+        problem = self.assigning_activities_problem
+        if self.lpBound:
+            self.build(filename)
+            with self.phase("lp_relaxation", counted=False):
+                if self.model.optimize(relax=True) == OptimizationStatus.OPTIMAL:
+                    self.report.bound = self.model.objective_value
+        else:
+            self.new_report(filename)
+
+        solvestarttime = time.perf_counter()
+        with self.phase("greedy", counted=False):
+            preferred = self.warmStart.assigned_in(problem) if self.warmStart is not None else None
+            order = priority_order(problem, preferred)
+            state = AssignmentState.create(problem, self.maxSessionsPerGroup, self.maxPopularActivities)
+            state.greedy(order)
+        print(f"greedy objective: {state.objective}")
+        with self.phase("local_search", counted=False):
+            moves = state.local_search(order, solvestarttime + self.maxSolveSeconds)
+        print(f"local search: {moves} moves, objective: {state.objective}")
+        self.report.solve_seconds = time.perf_counter() - solvestarttime
+
+        # priorities are integers, so reaching the rounded down bound proves optimality
+        self.report.objective = state.objective
+        optimal = self.report.bound is not None and state.objective >= math.floor(self.report.bound + 1e-6)
+        status = OptimizationStatus.OPTIMAL if optimal else OptimizationStatus.FEASIBLE
+        self.report.status = status.name
+
+        self.report.print()
+        if self.writeMetrics:
+            self.report.to_json(filename + "_metrics.json")
+        return Solution(problem=problem, assigned=state.assigned, status=status, report=self.report)
+
+    # the rows are collected with matrix assembly and the blocks are cut from them, starting from the greedy or
+    # the warm start assignment, the model files of the blocks are written next to filename
+    def solve_decomposition(self, filename: str) -> Solution:
+        problem = self.assigning_activities_problem
+        self.assembly = "matrix"
+        self.new_report(filename)
+        starttime = time.perf_counter()
+        with self.phase("generate_variables"):
+            x = self.generate_variables()
+        self.add_constraints(x)
+        self.report.build_seconds = time.perf_counter() - starttime
+
+        solvestarttime = time.perf_counter()
+        with self.phase("greedy", counted=False):
+            preferred = self.warmStart.assigned_in(problem) if self.warmStart is not None else None
+            start = greedy_assignment(problem, self.maxSessionsPerGroup, self.maxPopularActivities, preferred)
+        blocks = block_columns(problem, self.decomposeBy)
+        print(f"decomposition by {self.decomposeBy}: {len(blocks)} blocks")
+        with self.phase("decomposition", counted=False):
+            assigned, self.rounds = fix_and_resolve(
+                self.matrix,
+                blocks,
+                problem.selection_table.group,
+                start,
+                self.maxSolveSeconds,
+                self.maxRounds,
+                self.workers,
+            )
+        self.report.solve_seconds = time.perf_counter() - solvestarttime
+
+        feasible = self.rounds[-1].violated_rows == 0 if self.rounds else self.matrix.violated_rows(assigned) == 0
+        status = OptimizationStatus.FEASIBLE if feasible else OptimizationStatus.INFEASIBLE
+        self.report.status = status.name
+        self.report.objective = float(self.matrix.objective @ assigned) if feasible else None
+        if not feasible:
+            assigned = np.zeros_like(assigned)
+        self.report.print()
+        if self.writeMetrics:
+            self.report.to_json(filename + "_metrics.json")
+        return Solution(problem=problem, assigned=assigned, status=status, report=self.report)
+
+    def new_report(self, filename: str) -> BuildReport:
+        problem = self.assigning_activities_problem
+        self.report = BuildReport(
+            filename=filename,
+            nb_activities=len(problem.activities),
+            nb_sessions=problem.count_sessions(),
+            nb_groups=len(problem.groups),
+            nb_selections=len(problem.selection_table),
+            settings=self.settings(),
         )
+        return self.report
+
+    # generate the variables and constraints and write the model to filename + ".mps"
+    def build(self, filename: str) -> list[Var]:
+        problem = self.assigning_activities_problem
+        self.new_report(filename)
+        self.liveRows = None
+        if self.presolve:
+            self.assembly = "matrix"
+        # the backend of the solver config can be changed up to the first build
+        if self.model.num_cols == 0 and not self.solverConfig.uses(self.model):
+            verbose = self.model.verbose
+            self.model = self.solverConfig.create_model()
+            self.model.verbose = verbose
 
-        modelfilename =filename + ".mps"
-        print("Writing model to: " + modelfilename )
-        self.model.write(modelfilename)
-        
         print("Time:" + datetime.datetime.now().strftime("%H:%M:%S"))
-        
-
-        print("preproces")
-        print(self.model.preprocess)
-        # print("set preproces to 0")
-        # self.model.preprocess=0
-
-        status = self.model.optimize(max_seconds=self.maxSolveSeconds)
-        endtime = datetime.datetime.now()
-
-        print("#Activities: " + str(len(self.assigning_activities_problem.activities)))
-        print("#Activities without sessions: " + str(self.assigning_activities_problem.activitieswithoutsesessions))
-        print("#Sessions: " + str(self.assigning_activities_problem.count_sessions()))
-        print("#Groups: " + str(len(self.assigning_activities_problem.groups)))
-        print("#Groups without priorities: " + str(self.assigning_activities_problem.grpswithoutselections))
-        print("#selections: " + str(len(self.assigning_activities_problem.selections)))
-
-        print("starttime:" + starttime.strftime("%H:%M:%S"))
-        print("endtime:" + endtime.strftime("%H:%M:%S"))
-        print("endtime starttime diff:" + str(int((endtime - starttime).total_seconds() // 60)) + " minutes")
-
-        print(
-            "addmax_scout_time: "
-            + addmax_scout_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((addmax_scout_time - starttime).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "addmax_1_session_time: "
-            + addmax_1_session_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((addmax_1_session_time - addmax_scout_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_no_overlapping_time: "
-            + add_no_overlapping_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_no_overlapping_time - addmax_scout_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_unavailable_time: "
-            + add_unavailable_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_unavailable_time - add_no_overlapping_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_1_location_eachday_time: "
-            + add_location_eachday_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_location_eachday_time - add_unavailable_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_age_time: "
-            + add_age_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_age_time - add_location_eachday_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_max_popular_time: "
-            + add_max_popular_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_max_popular_time - add_age_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_min_1_session_per_group_time: "
-            + add_min_1_session_per_group_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_min_1_session_per_group_time - add_max_popular_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "add_max_sessions_per_group_constraint_time: "
-            + add_max_sessions_per_group_constraint_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_max_sessions_per_group_constraint_time - add_min_1_session_per_group_time ).total_seconds() // 60))
-            + " minutes)"
-        )        
-        print(
-            "add_at_most_1_activity_out_of_camp_time: "
-            + add_at_most_1_activity_out_of_camp_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_at_most_1_activity_out_of_camp_time - add_max_sessions_per_group_constraint_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        
-        print(
-            "add_objective_time: "
-            + add_objective_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((add_objective_time - add_at_most_1_activity_out_of_camp_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "modelready_time: "
-            + modelready_time.strftime("%H:%M:%S")
-            + "("
-            + str(int((modelready_time - add_objective_time).total_seconds() // 60))
-            + " minutes)"
-        )
-        print(
-            "modelsolved_time: "
-            + endtime.strftime("%H:%M:%S")
-            + "("
-            + str(int((endtime - modelready_time).total_seconds() // 60))
-            + " minutes)"
-        )
-
-        return Solution.build(x, status)
-
-    def generate_variables(self) -> dict[tuple, Var]:
+        print("filename: " + filename)
+        print("#Activities: " + str(len(problem.activities)))
+        print("#Activities without sessions: " + str(problem.activitieswithoutsesessions))
+        print("#Sessions: " + str(self.report.nb_sessions))
+        print("#Groups: " + str(len(problem.groups)))
+        print("#Groups without priorities: " + str(problem.grpswithoutselections))
+        print("#selections: " + str(self.report.nb_selections))
+
+        starttime = time.perf_counter()
+        key = self.model_key() if self.modelCache is not None else None
+        if key is not None:
+            x = self.load_cached_model(key)
+            if x is not None:
+                self.report.build_seconds = time.perf_counter() - starttime
+                self.report.print()
+                return x
+
+        with self.phase("generate_variables"):
+            x = self.generate_variables()
+        self.add_constraints(x)
+
+        modelfilename = filename + ".mps"
+        if self.presolve:
+            with self.phase("presolve"):
+                self.report.presolve = self.presolve_matrix()
+        if self.assembly == "matrix":
+            print("Loading model from: " + modelfilename)
+            with self.phase("load_matrix"):
+                x = self.load_matrix(filename)
+        self.report.build_seconds = time.perf_counter() - starttime
+
+        if self.assembly == "expression":
+            print("Writing model to: " + modelfilename)
+            with self.phase("write_model", counted=False):
+                self.model.write(modelfilename)
+        if key is not None:
+            with self.phase("write_model_cache", counted=False):
+                self.write_cached_model(modelfilename, key)
+        self.report.print()
+        return x
+
+    # the problem and the settings that change the rows of the model or their names
+    def model_key(self) -> str:
+        settings = {k: v for k, v in self.settings().items() if k in MODEL_SETTINGS}
+        settings["rowNames"] = self.rowNames
+        key = self.assigning_activities_problem.content_hash() + json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    # Reads the cached model of key with the row starts of its constraint families, None when it is not cached.
+    # The columns of the model are the selections in the order of the selection table, as when it was built
+    def load_cached_model(self, key: str) -> list[Var] | None:
+        path = os.path.join(self.modelCache, key)
+        modelfile = next((path + e for e in MODEL_EXTENSIONS if os.path.exists(path + e)), None)
+        if modelfile is None or not os.path.exists(path + ".json"):
+            return None
+        print("Loading cached model from: " + modelfile)
+        with open(path + ".json", "r", encoding="utf-8") as file:
+            row_starts = json.load(file)["rowStarts"]
+        with self.phase("load_cached_model"):
+            self.model.read(modelfile)
+            # the model files do not keep the sense of the objective
+            self.model.sense = MAXIMIZE
+        self.rowStarts = row_starts
+        return list(self.model.vars)
+
+    # The model file is copied under a name of this process and renamed, so a model in the cache is always complete
+    # even with several processes writing the same model. The row starts are renamed last, the model only counts
+    # as cached once they are there
+    def write_cached_model(self, modelfilename: str, key: str) -> None:
+        # CBC writes the model of expression assembly compressed, as modelfilename + ".mps.gz"
+        source = modelfilename if os.path.exists(modelfilename) else modelfilename + ".mps.gz"
+        extension = next(e for e in MODEL_EXTENSIONS if source.endswith(e))
+        os.makedirs(self.modelCache, exist_ok=True)
+        path = os.path.join(self.modelCache, key)
+        temporary = f"{path}.{os.getpid()}"
+        shutil.copyfile(source, temporary + extension)
+        with open(temporary + ".json", "w", encoding="utf-8") as file:
+            json.dump({"rowStarts": self.rowStarts}, file)
+        os.replace(temporary + extension, path + extension)
+        os.replace(temporary + ".json", path + ".json")
+
+    # presolve of the collected rows, the constraint family of each row is the step of add_constraints it was added in
+    def presolve_matrix(self) -> PresolveReport:
+        steps = sorted(self.rowStarts.items(), key=lambda item: item[1])
+        ends = [start for _, start in steps[1:]] + [self.matrix.num_rows]
+        row_family = np.repeat(np.arange(len(steps)), [end - start for (_, start), end in zip(steps, ends)])
+        return presolve(self.matrix, row_family, [name for name, _ in steps])
+
+    # all constraints and the objective, each in its own phase of the report
+    def add_constraints(self, x: list[Var]) -> None:
+        # add_unavailable_time_constraint is not used as selections are only at valid times
+        # add_onlyone_activitylocation_eachday_constraint is only used with oneLocationPerDay, we have the max one
+        # out of camp. With conflictRows "rounds" or "lazy" the pair rows of both are added while solving
+        steps = [
+            self.add_maxscout_constraint,
+            self.add_max_1_session_constraint,
+        ]
+        if not (self.lazy_conflicts() and self.noOverlapMode == "pairwise"):
+            steps.append(self.add_no_overlapping_sessions_constraint)
+        if self.oneLocationPerDay and not self.lazy_conflicts():
+            steps.append(self.add_onlyone_activitylocation_eachday_constraint)
+        steps += [
+            self.add_age_constraint,
+            # number is the maxmimum of popular activities
+            self.add_max_nb_of_most_popular_activities_constraint,
+            self.add_min_session_per_group_constraint,
+            self.add_max_sessions_per_group_constraint,
+            self.add_at_most_1_activity_out_of_camp,
+            self.add_objective,
+        ]
+        self.rowStarts = {}
+        for actualstep, step in enumerate(steps, start=1):
+            print(step.__name__ + " (" + str(actualstep) + "/" + str(len(steps)) + ")")
+            self.rowStarts[step.__name__] = self.count_rows()[0]
+            with self.phase(step.__name__):
+                step(x)
+
+    # whether the pair rows are left out of the model for the mip engine
+    def lazy_conflicts(self) -> bool:
+        if self.conflictRows not in ["model", "rounds", "lazy"]:
+            raise ValueError(f"Unknown conflictRows '{self.conflictRows}', use 'model', 'rounds' or 'lazy'")
+        if self.conflictRows == "lazy" and self.solverConfig.backend != "cbc":
+            raise ValueError(f"Lazy constraints need the cbc backend, not '{self.solverConfig.backend}'")
+        return self.conflictRows != "model" and self.engine == "mip"
+
+    # the pairs of selections whose rows are left out of the model
+    def conflict_pairs(self) -> np.ndarray:
+        problem = self.assigning_activities_problem
+        pairs = [self.location_pairs(problem)] if self.oneLocationPerDay else []
+        if self.noOverlapMode == "pairwise":
+            pairs.append(problem.get_overlapping_selection_pairs())
+        return np.concatenate(pairs + [np.empty((0, 2), dtype=np.int64)])
+
+    @staticmethod
+    def location_pairs(problem: AssigningActivititesProblem) -> np.ndarray:
+        return np.array(problem.get_different_location_same_day_pairs(), dtype=np.int64).reshape(-1, 2)
+
+    # The latest incumbent snapshot of filename as the warm start, to resume a solve that was stopped. None when
+    # there is no snapshot
+    def resume(self, filename: str) -> Solution | None:
+        path = filename + "_incumbent.json"
+        if not os.path.exists(path):
+            return None
+        self.warmStart = Solution.from_json(self.assigning_activities_problem, path)
+        print(f"resuming from {path}: {int(self.warmStart.assigned.sum())} selections")
+        return self.warmStart
+
+    # greedy assignment by descending priority under the current settings, used as the start of the solver
+    def greedy_start(self) -> Solution:
+        problem = self.assigning_activities_problem
+        assigned = greedy_assignment(problem, self.maxSessionsPerGroup, self.maxPopularActivities)
+        self.warmStart = Solution(problem=problem, assigned=assigned, status=OptimizationStatus.FEASIBLE)
+        return self.warmStart
+
+    # give the warm start to the solver, the parts of it that no longer fit the problem or the settings are
+    # dropped and the rest is filled up greedily, so the solver gets a feasible start
+    def set_start(self, x: list[Var]) -> None:
+        problem = self.assigning_activities_problem
+        preferred = self.warmStart.assigned_in(problem)
+        assigned = greedy_assignment(problem, self.maxSessionsPerGroup, self.maxPopularActivities, preferred)
+        kept = int((preferred & assigned).sum())
+        print(f"warm start: {kept} of {int(preferred.sum())} selections kept, {int(assigned.sum())} in the start")
+        self.model.start = [(v, float(a)) for v, a in zip(x, assigned.tolist())]
+
+    # settings of the builder and of the solver
+    def settings(self) -> dict[str, int | float | str | bool]:
         return {
-            s: self.model.add_var(var_type=BINARY, name=str(s)) for s in self.assigning_activities_problem.selections
-        }
+            "minSessionsPerGroup": self.minSessionsPerGroup,
+            "maxSessionsPerGroup": self.maxSessionsPerGroup,
+            "maxSolveSeconds": self.maxSolveSeconds,
+            "maxPopularActivities": self.maxPopularActivities,
+            "noOverlapMode": self.noOverlapMode,
+            "assembly": self.assembly,
+            "engine": self.engine,
+            "decomposeBy": self.decomposeBy,
+            "presolve": self.presolve,
+            "oneLocationPerDay": self.oneLocationPerDay,
+            "conflictRows": self.conflictRows,
+        } | self.solverConfig.settings()
+
+    # rows and nonzeros in the model so far, or collected for matrix assembly
+    def count_rows(self) -> tuple[int, int]:
+        if self.assembly == "matrix" and self.matrix is not None and self.model.num_cols == 0:
+            return self.matrix.num_rows, self.matrix.num_nz
+        return self.model.num_rows, self.model.num_nz
+
+    @contextmanager
+    def phase(self, name: str, counted: bool = True):
+        with self.report.phase(name, self.count_rows if counted else None, trace_memory=self.traceMemory):
+            yield
+        if self.progress is not None:
+            self.progress(ProgressEvent(kind="phase", phase=self.report.phases[-1]))
+
+    # one variable per row of the selection table
+    # with matrix assembly the variables only exist once the model is loaded, the row numbers stand in for them
+    def generate_variables(self) -> list[Var]:
+        names = self.assigning_activities_problem.get_selection_names()
+        if self.assembly == "matrix":
+            self.matrix = ModelMatrix(column_names=names)
+            return list(range(len(names)))
+        if self.assembly != "expression":
+            raise ValueError(f"Unknown assembly '{self.assembly}', use 'expression' or 'matrix'")
+        return [self.model.add_var(var_type=BINARY, name=name) for name in names]
+
+    # add the rows of a block to the model, or collect them for matrix assembly
+    def add_rows(self, x: list[Var], block: RowBlock) -> None:
+        if self.assembly == "matrix":
+            self.matrix.add(block)
+            return
+
+        rowcounter = 0
+        for i, (columns, coefficients) in enumerate(block.rows()):
+            rowcounter = rowcounter + 1
+            if rowcounter % 10000 == 0:
+                print(rowcounter)
+            expr = LinExpr([x[j] for j in columns], coefficients)
+            if block.sense == "<=":
+                constr = expr <= block.rhs[i]
+            elif block.sense == ">=":
+                constr = expr >= block.rhs[i]
+            else:
+                constr = expr == block.rhs[i]
+            if block.names is not None:
+                self.model += (constr, block.names[i])
+            else:
+                self.model += constr
+
+    # matrix assembly: write the collected rows to filename + ".mps" and read them into the model in one go
+    def load_matrix(self, filename: str) -> list[Var]:
+        return self.matrix.load(self.model, filename + ".mps", with_names=self.rowNames)
+
+    # row names are always created for expression assembly, for matrix assembly only when asked for
+    def with_names(self) -> bool:
+        return self.assembly == "expression" or self.rowNames
 
     # any session of an activity cannot have more than the max number of participants for that session (capacity may  vary for each session of an activity)
-    def add_maxscout_constraint(self, x: dict[tuple, Var]) -> None:
+    def add_maxscout_constraint(self, x: list[Var]) -> None:
         print("add_maxscout_constraint")
-        activitycounter = 0
-        for a in self.assigning_activities_problem.activities:
-            activitycounter = activitycounter + 1
-            if activitycounter % 10 == 0:
-                print(a.id)
-            for activity_session in a.timeslots:
-                # print("one activity session")
-                # print (a.id, activity_session.id)
-                selections = {
-                    s
-                    for s in self.assigning_activities_problem.selections
-                    if s.activity == a and s.time_slot == activity_session
-                }
-                #if leaders can participate use the groupsize, otherwise use size without leaders 
-                if a.leaders_can_participate == True:
-                    self.model += xsum(s.group.size * x[s] for s in selections) <= activity_session.capacity
-                else:    
-                    self.model += xsum(s.group.size_without_leaders * x[s] for s in selections) <= activity_session.capacity
-                # print (selections)
+        self.add_rows(x, self.maxscout_rows())
+
+    def maxscout_rows(self) -> RowBlock:
+        problem = self.assigning_activities_problem
+        table = problem.selection_table
+        #if leaders can participate use the groupsize, otherwise use size without leaders 
+        session_activities = problem.get_session_activities()
+        return RowBlock.create(
+            row=table.session,
+            column=np.arange(len(table)),
+            coefficient=problem.get_selection_sizes(),
+            sense="<=",
+            rhs=np.array([t.capacity for t in problem.sessions], dtype=np.int64),
+            nb_rows=len(problem.sessions),
+            names=[f"capacity_{a.id}_{t.id}" for a, t in session_activities] if self.with_names() else None,
+        )
 
     # one group gets at most one session from any activity
-    def add_max_1_session_constraint(self, x: dict[tuple, Var]) -> None:
+    def add_max_1_session_constraint(self, x: list[Var]) -> None:
         print("add_max_1_session_for_each_activity_constraint")
-        grpcounter = 0
-        for g in self.assigning_activities_problem.groups:
-            grpcounter = grpcounter + 1
-            if grpcounter % 25 == 0:
-                print(g.id)
-            for a in self.assigning_activities_problem.activities:
-                selections = [
-                    s for s in self.assigning_activities_problem.selections if s.group == g and s.activity == a
-                ]
-                # print (a.id, g.id)
-                # print (selections)
-                self.model += (
-                    xsum(x[s] for s in selections) <= 1,
-                    "group_" + g.id + "_at_most_1_session_for_activity_" + a.id,
-                )
+        self.add_rows(x, self.max_1_session_rows())
+
+    def max_1_session_rows(self) -> RowBlock:
+        # only (group, activity) pairs that have selections, the other rows would be empty
+        problem = self.assigning_activities_problem
+        pairs = problem.get_selection_index().by_group_activity
+        rows = list(pairs.values())
+        return RowBlock.create(
+            row=np.repeat(np.arange(len(rows)), [len(r) for r in rows]),
+            column=np.concatenate(rows) if rows else np.empty(0),
+            coefficient=1,
+            sense="<=",
+            rhs=1,
+            nb_rows=len(rows),
+            names=[
+                "group_" + problem.groups[g].id + "_at_most_1_session_for_activity_" + problem.activities[a].id
+                for g, a in pairs
+            ]
+            if self.with_names()
+            else None,
+        )
 
     # any group can at most have 1 session of overlapping sessions across all activities that they have prioritized
-    def add_no_overlapping_sessions_constraint(self, x: dict[tuple, Var]) -> None:
-        print("add_no_overlapping_sessions_constraint")
-        sessioncounter = 0
-        for s in self.assigning_activities_problem.selections:
-            sessioncounter = sessioncounter + 1
-            if sessioncounter % 1000 == 0:
-                print(sessioncounter)
-            for s1 in self.assigning_activities_problem.get_overlapping_selections(s):
-                self.model += (
-                    x[s] + x[s1] <= 1,
-                    f"exclude_overlapping_sessions_for_{s.group.id}_{s.activity.id}_{s.time_slot.id}_with_{s1}",
-                )
+    def add_no_overlapping_sessions_constraint(self, x: list[Var]) -> None:
+        print("add_no_overlapping_sessions_constraint - noOverlapMode=" + self.noOverlapMode)
+        self.add_rows(x, self.no_overlapping_sessions_rows())
+
+    def no_overlapping_sessions_rows(self) -> RowBlock:
+        if self.noOverlapMode == "clique":
+            return self.no_overlapping_sessions_clique_rows()
+        if self.noOverlapMode != "pairwise":
+            raise ValueError(f"Unknown noOverlapMode '{self.noOverlapMode}', use 'pairwise' or 'clique'")
+
+        pairs = self.assigning_activities_problem.get_overlapping_selection_pairs()
+        names = None
+        if self.with_names():
+            selection_names = self.assigning_activities_problem.get_selection_names()
+            names = [
+                f"exclude_overlapping_sessions_for_{selection_names[s]}_with_{selection_names[s1]}"
+                for s, s1 in pairs.tolist()
+            ]
+        return RowBlock.create(
+            row=np.repeat(np.arange(len(pairs)), 2),
+            column=pairs.ravel(),
+            coefficient=1,
+            sense="<=",
+            rhs=1,
+            nb_rows=len(pairs),
+            names=names,
+        )
+
+    # a group can attend at most one of the sessions that all run at the same time
+    # one row per maximal clique replaces the rows of all the pairs within it
+    def add_no_overlapping_sessions_clique_constraint(self, x: list[Var]) -> None:
+        self.add_rows(x, self.no_overlapping_sessions_clique_rows())
+
+    def no_overlapping_sessions_clique_rows(self) -> RowBlock:
+        problem = self.assigning_activities_problem
+        group = problem.selection_table.group
+        cliques = problem.get_overlapping_selection_cliques()
+        return RowBlock.create(
+            row=np.repeat(np.arange(len(cliques)), [len(c) for c in cliques]),
+            column=np.concatenate(cliques) if cliques else np.empty(0),
+            coefficient=1,
+            sense="<=",
+            rhs=1,
+            nb_rows=len(cliques),
+            names=[
+                f"exclude_overlapping_sessions_for_{problem.groups[group[c[0]]].id}_clique_{i + 1}"
+                for i, c in enumerate(cliques)
+            ]
+            if self.with_names()
+            else None,
+        )
 
     # If a session falls outside the groups available hours, then force it to 0
     # This could be avoided if we only generated variables representing sessions in available timeslots for groups
-    def add_unavailable_time_constraint(self, x: dict[tuple, Var]) -> list[tuple]:
+    def add_unavailable_time_constraint(self, x: list[Var]) -> list[tuple]:
         print("add_unavailable_time_constraint")
-        sessioncounter = 0
-        for s in self.assigning_activities_problem.selections:
-            sessioncounter = sessioncounter + 1
-            if sessioncounter % 1000 == 0:
-                print(sessioncounter)
-            if s.group.in_available_timeslots(s.time_slot):
-                continue
-
-            self.model += (
-                x[s] <= 0,
-                f"groupDoesNotHaveAvailabletime_{s.group.id}_{s.activity.id}_{s.time_slot.id}",
-            )
+        self.add_rows(x, self.unavailable_time_rows())
+
+    def unavailable_time_rows(self) -> RowBlock:
+        problem = self.assigning_activities_problem
+        table = problem.selection_table
+        index = problem.get_selection_index()
+        unavailable = np.zeros(len(table), dtype=bool)
+        for g, rows in enumerate(index.by_group):
+            unavailable[rows] = ~problem.groups[g].contains_times(index.start[rows], index.end[rows])
+        columns = np.flatnonzero(unavailable)
+        names = None
+        if self.with_names():
+            selection_names = problem.get_selection_names()
+            names = [f"groupDoesNotHaveAvailabletime_{selection_names[s]}" for s in columns.tolist()]
+        return RowBlock.create(
+            row=np.arange(len(columns)),
+            column=columns,
+            coefficient=1,
+            sense="<=",
+            rhs=0,
+            nb_rows=len(columns),
+            names=names,
+        )
 
     # Any group can only do activities in same location
     # That is for each selection, make sure no other selections at other locations can take place
     # A lot of 2 seleciton constraints
-    def add_onlyone_activitylocation_eachday_constraint(self, x: dict[tuple, Var]) -> None:
+    def add_onlyone_activitylocation_eachday_constraint(self, x: list[Var]) -> None:
         print("add_onlyone_activitylocation_eachday_constraint")
-        sessioncounter = 0
-        for s in self.assigning_activities_problem.selections:
-            sessioncounter = sessioncounter + 1
-            if sessioncounter % 1000 == 0:
-                print(sessioncounter)
-            selections = self.assigning_activities_problem.get_all_selections_on_other_locations_for_different_activities_same_day(
-                s
-            )
-            for s1 in selections:
-                self.model += (
-                    x[s] + x[s1] <= 1,
-                    f"{s}_and_{s1}_excluded_because_different_location_same_day_{s.activity}",
-                )
+        self.add_rows(x, self.onlyone_activitylocation_eachday_rows())
+
+    def onlyone_activitylocation_eachday_rows(self) -> RowBlock:
+        problem = self.assigning_activities_problem
+        pairs = self.location_pairs(problem)
+        names = None
+        if self.with_names():
+            activity = problem.selection_table.activity
+            selection_names = problem.get_selection_names()
+            names = [
+                f"{selection_names[s]}_and_{selection_names[s1]}_excluded_because_different_location_same_day_{problem.activities[activity[s]]}"
+                for s, s1 in pairs.tolist()
+            ]
+        return RowBlock.create(
+            row=np.repeat(np.arange(len(pairs)), 2),
+            column=pairs.ravel(),
+            coefficient=1,
+            sense="<=",
+            rhs=1,
+            nb_rows=len(pairs),
+            names=names,
+        )
 
-    #def add_max_nb_of_most_popular_activities_constraint(self, x: dict[tuple, Var]) -> list[tuple]:
-    def add_at_most_1_activity_out_of_camp(self, x: dict[tuple, Var]) -> None:
+    # one row per group over some of the groups selections
+    def group_rows(self, rows: list[np.ndarray], sense: str, rhs: int, suffix: str) -> RowBlock:
+        groups = self.assigning_activities_problem.groups
+        return RowBlock.create(
+            row=np.repeat(np.arange(len(rows)), [len(r) for r in rows]),
+            column=np.concatenate(rows) if rows else np.empty(0),
+            coefficient=1,
+            sense=sense,
+            rhs=rhs,
+            nb_rows=len(rows),
+            names=["group_" + g.id + suffix for g in groups] if self.with_names() else None,
+        )
+
+    #def add_max_nb_of_most_popular_activities_constraint(self, x: list[Var]) -> list[tuple]:
+    def add_at_most_1_activity_out_of_camp(self, x: list[Var]) -> None:
         print("add_at_most_1_activity_out_of_camp")
-        grpcounter = 0
-        for g in self.assigning_activities_problem.groups:
-            grpcounter = grpcounter + 1
-            if grpcounter % 25 == 0:
-                print(g.id)
-            selections = [
-                s
-                for s in self.assigning_activities_problem.selections
-                if s.group == g and s.activity.in_camp == False
-            ]
-            # print (g.id)
-            # print (selections)
-            self.model += (
-                xsum(x[s] for s in selections) <= 1,
-                "group_" + g.id + "_at_most_1_activity_out_of_camp",
-            )
-        
+        self.add_rows(x, self.at_most_1_activity_out_of_camp_rows())
+
+    def at_most_1_activity_out_of_camp_rows(self) -> RowBlock:
+        index = self.assigning_activities_problem.get_selection_index()
+        return self.group_rows(index.out_of_camp_by_group, "<=", 1, "_at_most_1_activity_out_of_camp")
 
     # find all activities where age does not match and force these to zero
     # this should not happen for any, as data is supposed to be cleaned, keep it as a check
-    def add_age_constraint(self, x: dict[tuple, Var]) -> list[tuple]:
+    def add_age_constraint(self, x: list[Var]) -> list[tuple]:
         print("add_age_constraint")
+        problem = self.assigning_activities_problem
+        table = problem.selection_table
         sessioncounter = 0
         printmsg = 1
-        for s in self.assigning_activities_problem.selections:
+        for s, (g, a) in enumerate(zip(table.group.tolist(), table.activity.tolist())):
             sessioncounter = sessioncounter + 1
             if sessioncounter % 1000 == 0:
                 print(sessioncounter)
-            if s.group.age_span.low >= s.activity.age_span.low and s.group.age_span.high <= s.activity.age_span.high:
+            group = problem.groups[g]
+            activity = problem.activities[a]
+            if group.age_span.low >= activity.age_span.low and group.age_span.high <= activity.age_span.high:
                 continue
 
             if printmsg == 1:
                 print(
-                    f"NOTE found selection where age group not with allowed ages {s.group.id} {s.activity.id}, this should not be the case, adding constraint to prevent assignment"
+                    f"NOTE found selection where age group not with allowed ages {group.id} {activity.id}, this should not be the case, adding constraint to prevent assignment"
                 )
                 print("Remember this is disabled")
                 printmsg = 0
 
             # self.model += (
             #      x[s] <= 0,
-            #      f"group_{s.group.id}_does_not_have_age_required_for_{s.activity.id}_{s.time_slot.id}_{s.time_slot.startname()}",
+            #      f"group_{group.id}_does_not_have_age_required_for_{activity.id}_{problem.sessions[table.session[s]].id}",
             # )
 
     # find most popular activities and constrain to max_activities
     # another constraint will make sure at the most one session for one activity
-    def add_max_nb_of_most_popular_activities_constraint(self, x: dict[tuple, Var]) -> list[tuple]:
+    def add_max_nb_of_most_popular_activities_constraint(self, x: list[Var]) -> list[tuple]:
         print("add_max_nb_of_most_popular_activities_constraint - maxPopularActivities="+str(self.maxPopularActivities))
-        grpcounter = 0
-        for g in self.assigning_activities_problem.groups:
-            grpcounter = grpcounter + 1
-            if grpcounter % 25 == 0:
-                print(g.id)
-            selections = [
-                s
-                for s in self.assigning_activities_problem.selections
-                if s.group == g and s.activity in self.assigning_activities_problem.popularactivities
-            ]
-            # print (g.id)
-            # print (selections)
-            self.model += (
-                xsum(x[s] for s in selections) <= self.maxPopularActivities,
-                "group_" + g.id + "_at_most_1_popular_activity",
-            )
+        self.add_rows(x, self.max_nb_of_most_popular_activities_rows())
 
+    def max_nb_of_most_popular_activities_rows(self) -> RowBlock:
+        index = self.assigning_activities_problem.get_selection_index()
+        return self.group_rows(index.popular_by_group, "<=", self.maxPopularActivities, "_at_most_1_popular_activity")
 
-            
     # one group must have one activity
-    def add_min_session_per_group_constraint(self, x: dict[tuple, Var]) -> None:
+    def add_min_session_per_group_constraint(self, x: list[Var]) -> None:
         print("add_min_session_per_group_constraint - minSessionsPerGroup="+str(self.minSessionsPerGroup))
-        grpcounter = 0
-        for g in self.assigning_activities_problem.groups:
-            grpcounter = grpcounter + 1
-            if grpcounter % 25 == 0:
-                print(g.id)
-            selections = [
-                s for s in self.assigning_activities_problem.selections if s.group == g 
-            ]
-            self.model += (
-                xsum(x[s] for s in selections) >=  self.minSessionsPerGroup,
-                "group_" + g.id + "_min_sessions" ,
-            )
+        self.add_rows(x, self.min_session_per_group_rows())
+
+    def min_session_per_group_rows(self) -> RowBlock:
+        index = self.assigning_activities_problem.get_selection_index()
+        return self.group_rows(index.by_group, ">=", self.minSessionsPerGroup, "_min_sessions")
 
-                
-     
     # one group must have atmost Y activities
-    def add_max_sessions_per_group_constraint(self, x: dict[tuple, Var]) -> None:
+    def add_max_sessions_per_group_constraint(self, x: list[Var]) -> None:
         print("add_max_sessions_per_group_constraint - maxSessionsPerGroup="+str(self.maxSessionsPerGroup))
-        grpcounter = 0
-        for g in self.assigning_activities_problem.groups:
-            grpcounter = grpcounter + 1
-            if grpcounter % 25 == 0:
-                print(g.id)
-            selections = [
-                s for s in self.assigning_activities_problem.selections if s.group == g 
-            ]
-            self.model += (
-                xsum(x[s] for s in selections) <= self.maxSessionsPerGroup,
-                "group_" + g.id + "_max_sessions" ,
-            )
-
+        self.add_rows(x, self.max_sessions_per_group_rows())
 
+    def max_sessions_per_group_rows(self) -> RowBlock:
+        index = self.assigning_activities_problem.get_selection_index()
+        return self.group_rows(index.by_group, "<=", self.maxSessionsPerGroup, "_max_sessions")
 
     # define the objective function
-    def add_objective(self, x: dict[tuple, Var]) -> None:
+    def add_objective(self, x: list[Var]) -> None:
         print("add objective")
-        self.model.objective = maximize(xsum(s.priority * x[s] for s in self.assigning_activities_problem.selections))
+        priority = self.assigning_activities_problem.selection_table.priority
+        if self.assembly == "matrix":
+            self.matrix.objective = priority.astype(np.float64)
+            return
+        self.model.objective = maximize(xsum(p * x[s] for s, p in enumerate(priority.tolist())))
 
-        
     def to_dataframe(self):
-        columns = ["minSessionsPerGroup","maxSessionsPerGroup", "maxSolveSeconds", "maxPopularActivities"]
-
-        data = [
-            [
-                self.minSessionsPerGroup,
-                self.maxSessionsPerGroup,
-                self.maxSolveSeconds,
-                self.maxPopularActivities
-            ]
-        ]
-        return pd.DataFrame(data=data, columns=columns)
+        return pd.DataFrame(data=[self.settings()])
 
     def to_excel(self, filename: str, mode: str, sheet: str):
         df = self.to_dataframe()
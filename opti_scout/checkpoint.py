@@ -0,0 +1,50 @@
+from opti_scout.classes import AssigningActivititesProblem, Solution
+from mip import IncumbentUpdater, Model, OptimizationStatus, Var
+import json
+import os
+import time
+import numpy as np
+
+# The best solution of a long solve is kept on disk while the solver runs, so a crash or a kill late in the solve
+# still leaves a plan. The file has the status and the selection ids of Solution.to_json, read back with
+# Solution.from_json, and the objective, the bound and the seconds since the solve started
+
+
+class IncumbentSnapshots(IncumbentUpdater):
+    def __init__(self, model: Model, problem: AssigningActivititesProblem, x: list[Var], path: str):
+        super().__init__(model)
+        self.problem = problem
+        self.path = path
+        # the row of the selection table of each variable
+        self.rows = {v.idx: r for r, v in enumerate(x)}
+        self.objective: float | None = None
+        self.written = 0
+        self.start = time.perf_counter()
+
+    def update_incumbent(
+        self, objective_value: float, best_bound: float, solution: list[tuple[Var, float]]
+    ) -> list[tuple[Var, float]]:
+        # writes the solution when it is better than the last one written, solution has the nonzero variables
+        if self.objective is None or objective_value > self.objective + 1e-9:
+            assigned = np.zeros(len(self.problem.selection_table), dtype=np.int8)
+            rows = [self.rows[v.idx] for v, value in solution if value > 0.5 and v.idx in self.rows]
+            assigned[rows] = 1
+            solution_found = Solution(problem=self.problem, assigned=assigned, status=OptimizationStatus.FEASIBLE)
+            self.write(solution_found, objective_value, best_bound)
+        return solution
+
+    def write(self, solution: Solution, objective: float, bound: float) -> None:
+        # the file is written under another name and renamed, so it is always complete
+        data = {
+            "status": solution.status.name,
+            "objective": objective,
+            "bound": bound,
+            "seconds": time.perf_counter() - self.start,
+            "selections": [{"group": g, "activity": a, "time_slot": t} for g, a, t in solution.get_selection_ids()],
+        }
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+        os.replace(temporary, self.path)
+        self.objective = objective
+        self.written += 1
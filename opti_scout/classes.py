@@ -1,11 +1,19 @@
 import json
-from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, computed_field, field_validator, model_validator
+import numpy as np
 import pandas as pd
 from mip import OptimizationStatus, Var
-
-from datetime import datetime, timedelta
-from collections import Counter
+from opti_scout.export import write_sheets
+from opti_scout.metrics import BuildReport
+from opti_scout.popularity import Popularity
+from opti_scout.streaming import iter_json_items
+
+from datetime import datetime, timedelta, timezone
+from bisect import bisect_right
+from functools import cached_property
+import hashlib
 import heapq
+import os
 
 class age_span(BaseModel):
     low: int
@@ -35,7 +43,7 @@ class Timeslot(BaseModel):
             return False
 
     def __hash__(self):
-        return hash(self.start) + hash(self.end)
+        return hash((self.start, self.end))
 
     def overlaps(self, other):
         return self.start < other.end and self.end > other.start
@@ -81,7 +89,7 @@ class ActivityTimeslot(BaseModel):
             return False
 
     def __hash__(self):
-        return hash(self.start) + hash(self.end)
+        return hash((self.start, self.end))
 
     def overlaps(self, other):
         return self.start < other.end and self.end > other.start
@@ -141,6 +149,9 @@ class Group(BaseModel):
     age_span: age_span
     available: set[Timeslot]
 
+    # the available times merged and sorted, built on first use
+    _intervals: tuple[np.ndarray, np.ndarray] | None = PrivateAttr(default=None)
+
     def __eq__(self, other):
         return self.id == other.id
 
@@ -150,11 +161,27 @@ class Group(BaseModel):
     def __hash__(self):
         return hash(self.id)
 
-    def in_available_timeslots(self, ActivityTimeslot):
-        for t in self.available:
-            if t.contains(ActivityTimeslot):
-                return True
-        return False
+    def get_intervals(self) -> tuple[np.ndarray, np.ndarray]:
+        # start and end in epoch seconds of the available times, the ones that overlap or touch merged into one
+        if self._intervals is None:
+            self._intervals = merge_intervals(
+                epoch_seconds([t.start for t in self.available]), epoch_seconds([t.end for t in self.available])
+            )
+        return self._intervals
+
+    def contains_times(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        # for each time from start to end in epoch seconds, whether the group is available all of the time
+        interval_start, interval_end = self.get_intervals()
+        interval = np.searchsorted(interval_start, start, side="right") - 1
+        return (interval >= 0) & (interval_end[np.maximum(interval, 0)] >= end)
+
+    def contains_all(self, slots: list[ActivityTimeslot]) -> np.ndarray:
+        return self.contains_times(epoch_seconds([t.start for t in slots]), epoch_seconds([t.end for t in slots]))
+
+    def in_available_timeslots(self, slot: ActivityTimeslot) -> bool:
+        interval_start, interval_end = self.get_intervals()
+        interval = bisect_right(interval_start, int(slot.start.timestamp())) - 1
+        return interval >= 0 and bool(interval_end[interval] >= int(slot.end.timestamp()))
 
 
 class Selection(BaseModel):
@@ -173,169 +200,637 @@ class Selection(BaseModel):
         return hash(self.group) + 3 * hash(self.activity) + 5 * hash(self.time_slot) + 9 * hash(self.priority)
 
 
-list_activities_adapter = TypeAdapter(list[Activity])
-list_group_adapter = TypeAdapter(list[Group])
+def epoch_seconds(times: list[datetime]) -> np.ndarray:
+    return np.array([t.timestamp() for t in times], dtype=np.int64)
 
 
-class AssigningActivititesProblem(BaseModel):
-    activities: list[Activity]
-    groups: list[Group]
-    selections: set[Selection]
-    popularactivities: list[Activity]
-    grpswithoutselections: int
-    activitieswithoutsesessions: int
+def merge_intervals(start: np.ndarray, end: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # the union of the intervals as sorted intervals that do not overlap or touch
+    if len(start) == 0:
+        return start, end
+    order = np.argsort(start, kind="stable")
+    start, end = start[order], end[order]
+    reach = np.maximum.accumulate(end)
+    first = np.concatenate([[True], start[1:] > reach[:-1]])
+    last = np.concatenate([first[1:], [True]])
+    return start[first], reach[last]
+
+
+class SelectionTable(BaseModel, arbitrary_types_allowed=True):
+    # One row per selection, stored column wise. group, activity and session are positions
+    # in the groups, activities and sessions lists of the problem
+    group: np.ndarray
+    activity: np.ndarray
+    session: np.ndarray
+    priority: np.ndarray
+    popular: np.ndarray
+    assigned: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.group)
 
     @classmethod
-    def from_json(cls, file_name: str) -> "AssigningActivititesProblem":
-        with open(file_name, "r", encoding="utf-8") as file:
-            data = json.load(file)
+    def generate(
+        cls,
+        groups: list[Group],
+        sessions: list[ActivityTimeslot],
+        session_activity: np.ndarray,
+        priority_group: np.ndarray,
+        priority_activity: np.ndarray,
+        priority_value: np.ndarray,
+        popular_activity: np.ndarray,
+    ) -> "SelectionTable":
+        # every session of every prioritized activity, that fits within one of the groups available timeslots
+        nb_activities = len(popular_activity)
+
+        # expand the (group, activity) priorities to one candidate row per session of the activity
+        session_order = np.argsort(session_activity, kind="stable")
+        sessions_per_activity = np.bincount(session_activity, minlength=nb_activities)
+        first_session = np.cumsum(sessions_per_activity) - sessions_per_activity
+        repeats = sessions_per_activity[priority_activity]
+        rows = np.repeat(np.arange(len(priority_activity)), repeats)
+        offset = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        group = priority_group[rows]
+        activity = priority_activity[rows]
+        session = session_order[first_session[activity] + offset]
+
+        # the merged availability intervals of all groups, sorted on (group, start), so one binary search per
+        # candidate finds the only interval of its group that can contain the session
+        intervals = [g.get_intervals() for g in groups]
+        window_group = np.repeat(np.arange(len(groups), dtype=np.int64), [len(start) for start, _ in intervals])
+        window_start = np.concatenate([start for start, _ in intervals] + [np.empty(0, dtype=np.int64)])
+        window_end = np.concatenate([end for _, end in intervals] + [np.empty(0, dtype=np.int64)])
+        session_start = epoch_seconds([t.start for t in sessions])
+        session_end = epoch_seconds([t.end for t in sessions])
+
+        if len(rows) == 0 or len(window_group) == 0:
+            contained = np.zeros(len(rows), dtype=bool)
+        else:
+            all_times = np.concatenate([window_start, window_end, session_start, session_end])
+            base = all_times.min()
+            span = all_times.max() - base + 1
+            window_key = window_group * span + window_start - base
+
+            window = np.searchsorted(window_key, group * span + session_start[session] - base, side="right") - 1
+            found = window >= 0
+            window = np.where(found, window, 0)
+            contained = found & (window_group[window] == group) & (window_end[window] >= session_end[session])
+
+        return cls(
+            group=group[contained].astype(np.int32),
+            activity=activity[contained].astype(np.int32),
+            session=session[contained].astype(np.int32),
+            priority=priority_value[rows][contained].astype(np.int16),
+            popular=popular_activity[activity[contained]].astype(np.int8),
+            assigned=np.zeros(np.count_nonzero(contained), dtype=np.int8),
+        )
 
-   
+    @classmethod
+    def from_selections(
+        cls, selections: list[Selection], groups: list[Group], activities: list[Activity], sessions: list[ActivityTimeslot]
+    ) -> "SelectionTable":
+        group_position = {g.id: i for i, g in enumerate(groups)}
+        activity_position = {a.id: i for i, a in enumerate(activities)}
+        session_position = {(activities[a].id, t.id): i for i, (a, t) in enumerate(sessions_of(activities))}
+        return cls(
+            group=np.array([group_position[s.group.id] for s in selections], dtype=np.int32),
+            activity=np.array([activity_position[s.activity.id] for s in selections], dtype=np.int32),
+            session=np.array([session_position[(s.activity.id, s.time_slot.id)] for s in selections], dtype=np.int32),
+            priority=np.array([s.priority for s in selections], dtype=np.int16),
+            popular=np.array([s.popular for s in selections], dtype=np.int8),
+            assigned=np.array([s.assigned for s in selections], dtype=np.int8),
+        )
 
-        # to accomodate travel time add 30 min to each activity session duration and each group available time (to accomodate for longer session)
-        travelminutes = 30
+    def names(self, groups: list[Group], activities: list[Activity], sessions: list[ActivityTimeslot]) -> list[str]:
+        # same as str() of the Selection objects
+        group_ids = [g.id for g in groups]
+        activity_ids = [a.id for a in activities]
+        session_ids = [t.id for t in sessions]
+        return [
+            group_ids[g] + "_" + activity_ids[a] + "_" + session_ids[t]
+            for g, a, t in zip(self.group.tolist(), self.activity.tolist(), self.session.tolist())
+        ]
 
-        date_format = "%Y-%m-%dT%H:%M:%SZ"
-        for a in data["activities"]:
-            for t in a["timeslots"]:
-                t["real_end"] = t["end"]
-                t["end"] = (datetime.strptime(t["end"], date_format) + timedelta(minutes=travelminutes)).strftime(
-                    date_format
-                )
+    def to_selections(
+        self,
+        groups: list[Group],
+        activities: list[Activity],
+        sessions: list[ActivityTimeslot],
+        rows: np.ndarray | None = None,
+        assigned: np.ndarray | None = None,
+    ) -> list[Selection]:
+        # Selection objects for the given rows (all by default), optionally with the assigned values of a solution.
+        # The table is built from validated groups, activities and sessions, so no need to validate again
+        if rows is None:
+            rows = np.arange(len(self))
+        if assigned is None:
+            assigned = self.assigned
+        return [
+            Selection.model_construct(
+                group=groups[g], activity=activities[a], time_slot=sessions[t], priority=p, assigned=x, popular=pop
+            )
+            for g, a, t, p, x, pop in zip(
+                self.group[rows].tolist(),
+                self.activity[rows].tolist(),
+                self.session[rows].tolist(),
+                self.priority[rows].tolist(),
+                assigned[rows].tolist(),
+                self.popular[rows].tolist(),
+            )
+        ]
 
-        # increase available time to accomodate for the incresed session times
-        for g in data["groups"]:
-            for a in g["available"]:
-                a["end"] = (datetime.strptime(a["end"], date_format) + timedelta(minutes=travelminutes)).strftime(
-                    date_format
-                )
 
-        # Create named directory of activities
-        acts = {}
-        for i in data["activities"]:
-            acts[i["id"]] = i
+def sessions_of(activities: list[Activity]) -> list[tuple[int, ActivityTimeslot]]:
+    # all sessions with the position of their activity, in a fixed order
+    return [(i, t) for i, a in enumerate(activities) for t in sorted(a.timeslots, key=lambda t: (t.start, t.id))]
 
 
-        # Create named directory of priorities, which are selected activities for each group
-        priorities = {}
-        popular = []
-        grpwithout=0
-        for g in data["groups"]:
-            # start with priority 20 for each group
-            priocounter = 20
-            for a in g["priorities"]:
-                priorities[g["id"] + a] = priocounter
-                priocounter = priocounter - 1
-                popular.append(a)
-            if len(g["priorities"]) == 0:
-                grpwithout=grpwithout+1   
-        
-        data["grpswithoutselections"] = grpwithout
-        
+class PriorityMatrix(BaseModel, arbitrary_types_allowed=True):
+    # The sparse group x activity matrix of the priorities, one entry per (group position, activity position) a group
+    # asks for, in the order of the groups and of their priorities. 20 for the first activity a group asks for and
+    # one less for each next one, activities that are not in the camp are skipped
+    nb_groups: int
+    nb_activities: int
+    group: np.ndarray
+    activity: np.ndarray
+    value: np.ndarray
 
-        # we could extend this to include ties
-        # add nb most common as input to function from_json
-        most_common = Counter(popular).most_common(5)
+    def __len__(self) -> int:
+        return len(self.group)
 
-        top_activities = [item for item, count in most_common]
+    @classmethod
+    def build(
+        cls, groups: list[Group], activities: list[Activity], group_priorities: dict[str, list[str]]
+    ) -> "PriorityMatrix":
+        # the ids are looked up once each, an activity a group lists twice keeps the place of its first entry and
+        # the priority of its last one
+        activity_position = {a.id: i for i, a in enumerate(activities)}
+        entries = [group_priorities.get(g.id, []) for g in groups]
+        group = np.repeat(np.arange(len(groups), dtype=np.int64), [len(e) for e in entries])
+        activity = np.array([activity_position.get(a, -1) for e in entries for a in e], dtype=np.int64)
+        value = 20 - np.concatenate([np.arange(len(e), dtype=np.int64) for e in entries] + [np.empty(0, np.int64)])
+        known = activity >= 0
+        group, activity, value = group[known], activity[known], value[known]
+
+        keys = group * len(activities) + activity
+        _, first = np.unique(keys, return_index=True)
+        _, last = np.unique(keys[::-1], return_index=True)
+        order = np.argsort(first, kind="stable")
+        first, last = first[order], len(keys) - 1 - last[order]
+        return cls(
+            nb_groups=len(groups),
+            nb_activities=len(activities),
+            group=group[first],
+            activity=activity[first],
+            value=value[last],
+        )
 
+    def to_dense(self) -> np.ndarray:
+        # the priority of each group and activity, 0 when the group does not ask for the activity
+        dense = np.zeros((self.nb_groups, self.nb_activities), dtype=np.int16)
+        dense[self.group, self.activity] = self.value
+        return dense
+
+
+def generate_selections(
+    groups: list[Group],
+    activities: list[Activity],
+    priorities: PriorityMatrix,
+    popular_activity: np.ndarray,
+) -> tuple[list[ActivityTimeslot], SelectionTable]:
+    # the sessions in the order of sessions_of and the selections of the prioritized activities in them
+    sessions = sessions_of(activities)
+    table = SelectionTable.generate(
+        groups=groups,
+        sessions=[t for _, t in sessions],
+        session_activity=np.array([a for a, _ in sessions], dtype=np.int64),
+        priority_group=priorities.group,
+        priority_activity=priorities.activity,
+        priority_value=priorities.value,
+        popular_activity=popular_activity,
+    )
+    return [t for _, t in sessions], table
+
+
+def popularity_of(
+    groups: list[Group], activities: list[Activity], priorities: PriorityMatrix, table: SelectionTable
+) -> Popularity:
+    sessions = sessions_of(activities)
+    return Popularity.build(
+        activity_id=np.array([a.id for a in activities], dtype=object),
+        session_id=np.array([t.id for _, t in sessions], dtype=object),
+        session_activity=np.array([a for a, _ in sessions], dtype=np.int64),
+        session_capacity=np.array([t.capacity for _, t in sessions], dtype=np.int64),
+        group_size=np.array([g.size for g in groups], dtype=np.int64),
+        group_size_without_leaders=np.array([g.size_without_leaders for g in groups], dtype=np.int64),
+        priority_group=priorities.group,
+        priority_activity=priorities.activity,
+        selection_group=table.group,
+        selection_session=table.session,
+    )
+
+
+# to accomodate travel time 30 min are added to each activity session duration and each group available time
+TRAVEL_TIME = timedelta(minutes=30)
+
+
+def activity_record(data: dict) -> Activity:
+    # an activity as in the camp file, the end of its sessions moved by the travel time
+    timeslots = []
+    for t in data["timeslots"]:
+        end = datetime.fromisoformat(t["end"])
+        timeslots.append(dict(t, start=datetime.fromisoformat(t["start"]), end=end + TRAVEL_TIME, real_end=end))
+    return Activity.model_validate(dict(data, timeslots=timeslots))
+
+
+def group_record(data: dict) -> Group:
+    # a group as in the camp file, the end of its available times moved by the travel time
+    available = [
+        {"start": datetime.fromisoformat(a["start"]), "end": datetime.fromisoformat(a["end"]) + TRAVEL_TIME}
+        for a in data["available"]
+    ]
+    return Group.model_validate(dict(data, available=available))
+
+
+# bump when the snapshot layout or the way a camp file is loaded changes, so older snapshots are not reused
+SNAPSHOT_VERSION = 3
+
+
+def camp_hash(
+    file_name: str, popular_threshold: float, popular_method: str = "capacityratio", nb_most_common: int = 5
+) -> str:
+    # content hash of a camp file together with the settings it is loaded with
+    settings = [SNAPSHOT_VERSION, TRAVEL_TIME.total_seconds(), repr(popular_threshold), popular_method, nb_most_common]
+    digest = hashlib.sha256(" ".join(map(str, settings)).encode())
+    with open(file_name, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def load_camp(file_name: str) -> tuple[list[Activity], list[Group], dict[str, list[str]]]:
+    # The activities, groups and the priorities of the groups of a camp file. The file is streamed, every
+    # activity and group is turned into its record as soon as it is read
+    activities, groups, group_priorities = [], [], {}
+    for key, item in iter_json_items(file_name):
+        if key == "activities":
+            activities.append(activity_record(item))
+        elif key == "groups":
+            groups.append(group_record(item))
+            group_priorities[item["id"]] = list(item["priorities"])
+    return activities, groups, group_priorities
+
+
+def selection_keys(problem: "AssigningActivititesProblem") -> list[tuple[str, str, str]]:
+    # (group id, activity id, session id) of every row of the selection table
+    table = problem.selection_table
+    return [
+        (problem.groups[g].id, problem.activities[a].id, problem.sessions[t].id)
+        for g, a, t in zip(table.group.tolist(), table.activity.tolist(), table.session.tolist())
+    ]
+
+
+def rows_by_key(keys: np.ndarray, nb_keys: int) -> list[np.ndarray]:
+    # the row numbers for each key 0..nb_keys-1, in row order
+    if nb_keys == 0:
+        return []
+    order = np.argsort(keys, kind="stable")
+    return np.split(order, np.cumsum(np.bincount(keys, minlength=nb_keys))[:-1])
+
+
+class SelectionIndex(BaseModel, arbitrary_types_allowed=True):
+    # Lookup tables over the selections of a problem, built once so the constraint builders
+    # do not have to scan every selection for every group, activity or session.
+    # Selections are referred to by their row in the selection table, groups, activities
+    # and sessions by their position in the problem
+    by_group: list[np.ndarray]
+    by_activity: list[np.ndarray]
+    by_session: list[np.ndarray]
+    by_group_activity: dict[tuple[int, int], np.ndarray]
+    out_of_camp_by_group: list[np.ndarray]
+    popular_by_group: list[np.ndarray]
+    # start and end of each selection in epoch seconds
+    start: np.ndarray
+    end: np.ndarray
 
+    @classmethod
+    def build(cls, problem: "AssigningActivititesProblem") -> "SelectionIndex":
+        table = problem.selection_table
+        nb_groups = len(problem.groups)
+        nb_activities = len(problem.activities)
+        out_of_camp = np.array([not a.in_camp for a in problem.activities], dtype=bool)
+        popular_ids = {a.id for a in problem.popularactivities}
+        popular = np.array([a.id in popular_ids for a in problem.activities], dtype=bool)
+        group = table.group.astype(np.int64)
+
+        pair_keys = group * nb_activities + table.activity
+        unique_keys, first = np.unique(pair_keys, return_index=True)
+        pair_rows = rows_by_key(np.searchsorted(unique_keys, pair_keys), len(unique_keys))
+        # keep the pairs in the order they first appear in the table
+        by_group_activity = {
+            divmod(int(unique_keys[i]), nb_activities): pair_rows[i] for i in np.argsort(first, kind="stable")
+        }
+
+        out_of_camp_rows = np.flatnonzero(out_of_camp[table.activity])
+        popular_rows = np.flatnonzero(popular[table.activity])
+        session_start = epoch_seconds([t.start for t in problem.sessions])
+        session_end = epoch_seconds([t.end for t in problem.sessions])
+
+        return cls(
+            by_group=rows_by_key(table.group, nb_groups),
+            by_activity=rows_by_key(table.activity, nb_activities),
+            by_session=rows_by_key(table.session, len(problem.sessions)),
+            by_group_activity=by_group_activity,
+            out_of_camp_by_group=[out_of_camp_rows[r] for r in rows_by_key(table.group[out_of_camp_rows], nb_groups)],
+            popular_by_group=[popular_rows[r] for r in rows_by_key(table.group[popular_rows], nb_groups)],
+            start=session_start[table.session],
+            end=session_end[table.session],
+        )
 
+    def for_group(self, group: int) -> np.ndarray:
+        return self.by_group[group]
 
-        list_activities = list_activities_adapter.validate_python(data["activities"])
-        list_groups = list_group_adapter.validate_python(data["groups"])
+    def for_activity(self, activity: int) -> np.ndarray:
+        return self.by_activity[activity]
 
+    def for_session(self, session: int) -> np.ndarray:
+        return self.by_session[session]
 
+    def for_group_activity(self, group: int, activity: int) -> np.ndarray:
+        return self.by_group_activity.get((group, activity), np.empty(0, dtype=np.int64))
 
+    def out_of_camp_for_group(self, group: int) -> np.ndarray:
+        return self.out_of_camp_by_group[group]
 
-        #find the top activities based on totel capacity (#seats)/total priorities (#scouts)
-        #count total capacity
-        totalcapacity = {}
-        totalrequests = {}
-        for a in list_activities:
-            if a.id not in totalcapacity:
-                totalcapacity[a.id]=0
-                totalrequests[a.id]=0
-            for t in a.timeslots:
-              totalcapacity[a.id] += t.capacity
+    def popular_for_group(self, group: int) -> np.ndarray:
+        return self.popular_by_group[group]
 
-        for group in list_groups:
-            for activity in list_activities:
-                if group.id + activity.id in priorities:
-                    totalrequests[activity.id] += group.size
-            
-        activityCapacityToScoutRatio={}
-        for a in list_activities:
-            if totalcapacity[a.id] > 0 and totalrequests[a.id] > 0 :
-                activityCapacityToScoutRatio[a.id] = totalrequests[a.id]/totalcapacity[a.id]
-        #non_zeros_activityCapacityToScoutRatio = {k: v for k, v in activityCapacityToScoutRatio.items() if v != 0}
 
-        print(activityCapacityToScoutRatio)    
+list_activities_adapter = TypeAdapter(list[Activity])
+list_group_adapter = TypeAdapter(list[Group])
 
-        tmp = {k: v for (k, v) in activityCapacityToScoutRatio.items() if v < 0.02}
-        ratio_list = list(tmp.keys())
-        print (ratio_list)
 
-        #what defines a popular activity
-        popmethod = "capacityratio"
-        toppop = []
-        if popmethod == "groupcount":
-            for a in list_activities:
-                if a.id in top_activities:
-                    toppop.append(a)
-        if popmethod == "capacityratio":
-            for a in list_activities:
-                if a.id in ratio_list:
-                    toppop.append(a)
+class ProblemDelta(BaseModel):
+    # Edits to a camp after it was loaded. Groups are given as in the camp file, session times as the start and end
+    # in the camp file, the travel time is added as in from_json
+    add_groups: list[dict] = []
+    remove_groups: list[str] = []
+    # the new priorities of a group, most wanted first
+    priorities: dict[str, list[str]] = {}
+    # by (activity id, session id), a session id is only unique within its activity
+    capacities: dict[tuple[str, str], int] = {}
+    session_times: dict[tuple[str, str], tuple[str, str]] = {}
 
 
+class AssigningActivititesProblem(BaseModel):
+    activities: list[Activity]
+    groups: list[Group]
+    sessions: list[ActivityTimeslot]
+    selection_table: SelectionTable
+    popularactivities: list[Activity]
+    # how the popular activities were chosen, see opti_scout.popularity
+    popular_method: str = "capacityratio"
+    nb_most_common: int = 5
+    # scouts asking for an activity per seat in its sessions, for the activities that are asked for
+    capacity_ratios: dict[str, float] = {}
+    # the activity ids each group asked for, most wanted first
+    group_priorities: dict[str, list[str]] = {}
+    grpswithoutselections: int
+    activitieswithoutsesessions: int
 
+    _selections: list[Selection] | None = PrivateAttr(default=None)
+    _selection_index: SelectionIndex | None = PrivateAttr(default=None)
+    _positions: dict[str, dict] | None = PrivateAttr(default=None)
+    _priorities: PriorityMatrix | None = PrivateAttr(default=None)
+    _popularity: Popularity | None = PrivateAttr(default=None)
 
-        data["popularactivities"] = toppop
+    @model_validator(mode="before")
+    @classmethod
+    def selections_to_table(cls, data):
+        # the problem can also be given a list of Selection objects instead of a selection table
+        if not isinstance(data, dict) or "selection_table" in data:
+            return data
+        data = dict(data)
+        data["activities"] = list_activities_adapter.validate_python(data["activities"])
+        data["groups"] = list_group_adapter.validate_python(data["groups"])
+        data["sessions"] = [t for _, t in sessions_of(data["activities"])]
+        data["selection_table"] = SelectionTable.from_selections(
+            list(data.pop("selections", [])), data["groups"], data["activities"], data["sessions"]
+        )
+        return data
 
+    @property
+    def selections(self) -> list[Selection]:
+        # Selection objects are only created when something asks for them
+        if self._selections is None:
+            self._selections = self.selection_table.to_selections(self.groups, self.activities, self.sessions)
+        return self._selections
 
+    @classmethod
+    def from_json(
+        cls,
+        file_name: str,
+        popular_threshold: float = 0.02,
+        snapshot_directory: str | None = None,
+        popular_method: str = "capacityratio",
+        nb_most_common: int = 5,
+    ) -> "AssigningActivititesProblem":
+        # With a snapshot directory the loaded problem is kept there as a snapshot named by the camp_hash of the
+        # file, and read back from it as long as the file and the settings stay the same. The popular activities
+        # are chosen by popular_method, see opti_scout.popularity
+        if snapshot_directory is not None:
+            name = camp_hash(file_name, popular_threshold, popular_method, nb_most_common)
+            snapshot = os.path.join(snapshot_directory, name + ".npz")
+            if os.path.exists(snapshot):
+                print(f"Problem read from snapshot {snapshot}")
+                return cls.from_snapshot(snapshot)
+            problem = cls.from_json(file_name, popular_threshold, None, popular_method, nb_most_common)
+            os.makedirs(snapshot_directory, exist_ok=True)
+            problem.to_snapshot(snapshot)
+            return problem
+
+        # the activities and groups are read one by one from the file, with the travel time added on the way
+        list_activities, list_groups, group_priorities = load_camp(file_name)
+        data = {"group_priorities": group_priorities}
+
+        data["grpswithoutselections"] = sum(len(activity_ids) == 0 for activity_ids in group_priorities.values())
+
+        # Create the table of selections, selections are actual sessions for each of the activities that groups have prioritized == variables in the model
+        # only sessions that are actually in the groups available timeslots are added
+        priorities = PriorityMatrix.build(list_groups, list_activities, group_priorities)
+        no_popular = np.zeros(len(list_activities), dtype=np.int8)
+        data["sessions"], data["selection_table"] = generate_selections(
+            list_groups, list_activities, priorities, no_popular
+        )
 
-        # Create named directory of selections, selections are actual sessions for each of the activities that groups have prioritized == variables in the model
-        selections = []
+        # demand against capacity of every activity and session, the popular column of the selection table has the
+        # activities most groups ask for, the popular activities of the model are the ones of popular_method
+        popularity = popularity_of(list_groups, list_activities, priorities, data["selection_table"])
+        table = data["selection_table"]
+        table.popular[:] = popularity.popular("groupcount", nb_most_common=nb_most_common)[table.activity]
+        popular = popularity.popular(popular_method, popular_threshold, nb_most_common)
+        data["capacity_ratios"] = popularity.capacity_ratios()
+        data["popularactivities"] = [a for a, p in zip(list_activities, popular.tolist()) if p]
+        data["popular_method"] = popular_method
+        data["nb_most_common"] = nb_most_common
+        print(f"popular activities ({popular_method}): {[a.id for a in data['popularactivities']]}")
+
+        data["activities"] = list_activities
+        data["groups"] = list_groups
+        data["activitieswithoutsesessions"] = sum(len(a.timeslots) == 0 for a in list_activities)
+
+        problem = cls(**data)
+        problem._priorities = priorities
+        problem._popularity = popularity
+        return problem
+
+
+
+    # The problem as numpy arrays, as kept in a snapshot. Times are epoch seconds
+    def snapshot_arrays(self) -> dict[str, np.ndarray]:
+        sessions = sessions_of(self.activities)
+        windows = [
+            (i, t) for i, g in enumerate(self.groups) for t in sorted(g.available, key=lambda t: (t.start, t.end))
+        ]
+        activity_position = {a.id: i for i, a in enumerate(self.activities)}
+        arrays = {
+            "activity_id": np.array([a.id for a in self.activities], dtype=str),
+            "activity_name": np.array([a.name for a in self.activities], dtype=str),
+            "activity_area": np.array([a.activity_area for a in self.activities], dtype=str),
+            "activity_age": np.array([(a.age_span.low, a.age_span.high) for a in self.activities], dtype=np.int64),
+            "activity_leaders": np.array([a.leaders_can_participate for a in self.activities], dtype=bool),
+            "activity_in_camp": np.array([a.in_camp for a in self.activities], dtype=bool),
+            "session_id": np.array([t.id for _, t in sessions], dtype=str),
+            "session_activity": np.array([a for a, _ in sessions], dtype=np.int64),
+            "session_times": epoch_seconds([d for _, t in sessions for d in (t.start, t.end, t.real_end)]),
+            "session_capacity": np.array([t.capacity for _, t in sessions], dtype=np.int64),
+            "group_id": np.array([g.id for g in self.groups], dtype=str),
+            "group_size": np.array([(g.size, g.size_without_leaders) for g in self.groups], dtype=np.int64),
+            "group_age": np.array([(g.age_span.low, g.age_span.high) for g in self.groups], dtype=np.int64),
+            "window_group": np.array([i for i, _ in windows], dtype=np.int64),
+            "window_times": epoch_seconds([d for _, t in windows for d in (t.start, t.end)]),
+            "priority_group": np.array(list(self.group_priorities), dtype=str),
+            "priority_count": np.array([len(v) for v in self.group_priorities.values()], dtype=np.int64),
+            "priority_activity": np.array([a for v in self.group_priorities.values() for a in v], dtype=str),
+            "popular_activity": np.array([activity_position[a.id] for a in self.popularactivities], dtype=np.int64),
+            "ratio_activity": np.array(list(self.capacity_ratios), dtype=str),
+            "ratio_value": np.array(list(self.capacity_ratios.values()), dtype=np.float64),
+            "popular_method": np.array(self.popular_method, dtype=str),
+            "counts": np.array(
+                [SNAPSHOT_VERSION, self.grpswithoutselections, self.activitieswithoutsesessions, self.nb_most_common]
+            ),
+        }
+        for column in SelectionTable.model_fields:
+            arrays["table_" + column] = getattr(self.selection_table, column)
+        return arrays
+
+    # hash of everything in the problem, equal for problems loaded from the same camp with the same settings
+    def content_hash(self) -> str:
+        digest = hashlib.sha256()
+        for name, array in sorted(self.snapshot_arrays().items()):
+            digest.update(f"{name} {array.dtype.str} {array.shape}".encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    # The problem in an .npz file. from_snapshot reads it back without parsing, validating or generating the
+    # selections again, the times are read back in UTC
+    def to_snapshot(self, path: str) -> None:
+        arrays = self.snapshot_arrays()
+        # written next to path and renamed, so a run that stops halfway never leaves a broken snapshot behind
+        with open(path + ".tmp", "wb") as file:
+            np.savez(file, **arrays)
+        os.replace(path + ".tmp", path)
 
-        for group in list_groups:
-            for activity in list_activities:
-                if activity.id in top_activities:
-                    setpop = 1
-                else:
-                    setpop = 0  
-                if group.id + activity.id in priorities:
-                    for time_slot in activity.timeslots:
-                        #only add if session is actually in groups available timeslots
-                        if group.in_available_timeslots(time_slot) :
-                            selections.append(
-                                Selection(
-                                    group=group,
-                                    activity=activity,
-                                    time_slot=time_slot,
-                                    priority=priorities[group.id + activity.id],
-                                    assigned=0,
-                                    popular=setpop
-                                )
-                            )
-
-        data["selections"] = selections
-
-        maxSessionsPerGroup = 1
-       
-        actwithout=0
-        for a in list_activities:
-            if len(a.timeslots) == 0:
-                actwithout=actwithout+1 
-        
-        data["activitieswithoutsesessions"] = actwithout
-    
-        
-
-
-        return cls(**data)
+    @classmethod
+    def from_snapshot(cls, path: str) -> "AssigningActivititesProblem":
+        with np.load(path) as data:
+            arrays = dict(data)
+        version = arrays["counts"].tolist()[0]
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot '{path}' has version {version}, expected {SNAPSHOT_VERSION}")
+        _, grpswithout, actwithout, nb_most_common = arrays["counts"].tolist()
+
+        # the records were validated when the snapshot was written, so they are constructed as they are
+        session_times = arrays["session_times"].reshape(-1, 3).tolist()
+        sessions = [
+            ActivityTimeslot.model_construct(
+                id=i,
+                start=from_epoch_seconds(start),
+                end=from_epoch_seconds(end),
+                real_end=from_epoch_seconds(real_end),
+                capacity=capacity,
+            )
+            for i, (start, end, real_end), capacity in zip(
+                arrays["session_id"].tolist(), session_times, arrays["session_capacity"].tolist()
+            )
+        ]
+        timeslots = [set() for _ in arrays["activity_id"]]
+        for a, t in zip(arrays["session_activity"].tolist(), sessions):
+            timeslots[a].add(t)
+        activities = [
+            Activity.model_construct(
+                id=i,
+                name=name,
+                age_span=age_span.model_construct(low=low, high=high),
+                timeslots=t,
+                leaders_can_participate=leaders,
+                activity_area=area,
+                in_camp=in_camp,
+            )
+            for i, name, (low, high), t, leaders, area, in_camp in zip(
+                arrays["activity_id"].tolist(),
+                arrays["activity_name"].tolist(),
+                arrays["activity_age"].tolist(),
+                timeslots,
+                arrays["activity_leaders"].tolist(),
+                arrays["activity_area"].tolist(),
+                arrays["activity_in_camp"].tolist(),
+            )
+        ]
 
+        available = [set() for _ in arrays["group_id"]]
+        for g, (start, end) in zip(arrays["window_group"].tolist(), arrays["window_times"].reshape(-1, 2).tolist()):
+            available[g].add(Timeslot.model_construct(start=from_epoch_seconds(start), end=from_epoch_seconds(end)))
+        groups = [
+            Group.model_construct(
+                id=i,
+                size=size,
+                size_without_leaders=without_leaders,
+                age_span=age_span.model_construct(low=low, high=high),
+                available=a,
+            )
+            for i, (size, without_leaders), (low, high), a in zip(
+                arrays["group_id"].tolist(),
+                arrays["group_size"].tolist(),
+                arrays["group_age"].tolist(),
+                available,
+            )
+        ]
 
+        ends = np.cumsum(arrays["priority_count"]).tolist()
+        priority_activity = arrays["priority_activity"].tolist()
+        group_priorities = {
+            g: priority_activity[end - count : end]
+            for g, count, end in zip(arrays["priority_group"].tolist(), arrays["priority_count"].tolist(), ends)
+        }
+        table = SelectionTable(**{column: arrays["table_" + column] for column in SelectionTable.model_fields})
+        return cls.model_construct(
+            activities=activities,
+            groups=groups,
+            sessions=sessions,
+            selection_table=table,
+            popularactivities=[activities[a] for a in arrays["popular_activity"].tolist()],
+            popular_method=str(arrays["popular_method"]),
+            nb_most_common=nb_most_common,
+            capacity_ratios=dict(zip(arrays["ratio_activity"].tolist(), arrays["ratio_value"].tolist())),
+            group_priorities=group_priorities,
+            grpswithoutselections=grpswithout,
+            activitieswithoutsesessions=actwithout,
+        )
 
     def count_sessions(self) :
         sessioncounter = 0 
@@ -345,95 +840,225 @@ class AssigningActivititesProblem(BaseModel):
             
         return sessioncounter 
 
-    def get_group_info(self) :
-        columns = ["GroupID", "Size","Size_without_leaders"]
+    # The frames of the exports are built column wise, from the selection table and one array per group, activity or
+    # session, never from Selection objects
 
-        data = [
-            [
-                g.id,
-                g.size,
-                g.size_without_leaders
-            ]
-            for g in self.groups
-        ]
-        return pd.DataFrame(data=data, columns=columns)
-
-
-    def get_session_info(self) :
-        columns = ["Sessionid", "Start","End","Capacity","ActivityArea","Activityid","Name","leaders_can_participate"]
-        data = [
-            [
-                t.id,
-                t.start.replace(tzinfo=None),
-                t.real_end.replace(tzinfo=None),
-                t.capacity,
-                a.activity_area,
-                a.id,
-                a.name,
-                a.leaders_can_participate
-            ]
-            for a in self.activities for t in a.timeslots
-        ]
-            
-        return pd.DataFrame(data=data, columns=columns)
-
-    def get_popular_info(self) :
-        columns = ["ActivityArea","Activityid","Name"]
-        data = [
-            [
-                a.activity_area,
-                a.id,
-                a.name
-            ]
-            for a in self.popularactivities 
-        ]
-            
-        return pd.DataFrame(data=data, columns=columns)
-
-
-    def get_selection_info(self) :
-        columns = ["Group","Activity","time_slot","priority","assigned","popular"]
-        data = [
-            [
-                s.group,
-                s.activity,
-                s.time_slot.id,
-                s.priority,
-                s.assigned,
-                s.popular
-            ]
-            for s in self.selections 
-        ]
-            
-        return pd.DataFrame(data=data, columns=columns)
-
-
-    def write_base_info(self, path: str):
-        df = self.get_group_info()
-        df.sort_values(by=["GroupID"], inplace=True)
-        df.to_excel(path+'group_info.xlsx', index=False)
-        df1 = self.get_session_info()
-        df1.sort_values(by=["Sessionid"], inplace=True)
-        df1.to_excel(path+'session_info.xlsx', index=False)
-        df2 = self.get_popular_info()
-        df2.sort_values(by=["Activityid"], inplace=True)
-        df2.to_excel(path+'popular_info.xlsx', index=False)
-        df3 = self.get_selection_info()
-        df3.to_excel(path+'selections.xlsx', index=False)
+    def get_group_columns(self) -> dict[str, np.ndarray]:
+        return {
+            "id": np.array([g.id for g in self.groups], dtype=object),
+            "size": np.array([g.size for g in self.groups], dtype=np.int64),
+            "size_without_leaders": np.array([g.size_without_leaders for g in self.groups], dtype=np.int64),
+        }
+
+    def get_group_info(self) -> pd.DataFrame:
+        groups = self.get_group_columns()
+        return pd.DataFrame(
+            {"GroupID": groups["id"], "Size": groups["size"], "Size_without_leaders": groups["size_without_leaders"]}
+        )
+
+    def get_session_columns(self) -> dict[str, np.ndarray]:
+        # one array per session, in the order of the sessions list, with the times without their time zone
+        return {
+            "id": np.array([t.id for t in self.sessions], dtype=object),
+            "start": np.array([t.start.replace(tzinfo=None) for t in self.sessions], dtype="datetime64[us]"),
+            "end": np.array([t.real_end.replace(tzinfo=None) for t in self.sessions], dtype="datetime64[us]"),
+            "capacity": np.array([t.capacity for t in self.sessions], dtype=np.int64),
+            "activity": np.array([a for a, _ in sessions_of(self.activities)], dtype=np.int64),
+        }
+
+    def get_activity_columns(self) -> dict[str, np.ndarray]:
+        popular_ids = {a.id for a in self.popularactivities}
+        return {
+            "id": np.array([a.id for a in self.activities], dtype=object),
+            "name": np.array([a.name for a in self.activities], dtype=object),
+            "area": np.array([a.activity_area for a in self.activities], dtype=object),
+            "leaders": np.array([a.leaders_can_participate for a in self.activities], dtype=bool),
+            "popular": np.array([a.id in popular_ids for a in self.activities], dtype=np.int64),
+        }
+
+    def get_session_info(self) -> pd.DataFrame:
+        sessions = self.get_session_columns()
+        activities = self.get_activity_columns()
+        activity = sessions["activity"]
+        return pd.DataFrame(
+            {
+                "Sessionid": sessions["id"],
+                "Start": sessions["start"],
+                "End": sessions["end"],
+                "Capacity": sessions["capacity"],
+                "ActivityArea": activities["area"][activity],
+                "Activityid": activities["id"][activity],
+                "Name": activities["name"][activity],
+                "leaders_can_participate": activities["leaders"][activity],
+            }
+        )
+
+    def get_popular_info(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "ActivityArea": [a.activity_area for a in self.popularactivities],
+                "Activityid": [a.id for a in self.popularactivities],
+                "Name": [a.name for a in self.popularactivities],
+            }
+        )
+
+    def get_selection_info(self) -> pd.DataFrame:
+        table = self.selection_table
+        return pd.DataFrame(
+            {
+                "Group": self.get_group_columns()["id"][table.group],
+                "Activity": self.get_activity_columns()["id"][table.activity],
+                "time_slot": self.get_session_columns()["id"][table.session],
+                "priority": table.priority,
+                "assigned": table.assigned,
+                "popular": table.popular,
+            }
+        )
+
+    def get_base_info_sheets(self) -> dict[str, pd.DataFrame]:
+        return {
+            "group_info": self.get_group_info().sort_values(by=["GroupID"]),
+            "session_info": self.get_session_info().sort_values(by=["Sessionid"]),
+            "popular_info": self.get_popular_info().sort_values(by=["Activityid"]),
+            "selections": self.get_selection_info(),
+            "activity_demand": self.get_popularity().activity_dataframe(),
+            "session_demand": self.get_popularity().session_dataframe(),
+        }
+
+    def write_base_info(self, path: str, format: str = "xlsx"):
+        # a workbook per sheet, path + sheet + ".xlsx", in the other formats a file path + "base_" + sheet per sheet
+        sheets = self.get_base_info_sheets()
+        if format == "xlsx":
+            for sheet, df in sheets.items():
+                write_sheets(path + sheet + ".xlsx", {"Sheet1": df})
+        else:
+            write_sheets(path + "base", sheets, format)
         print("Baseinfo written")
 
+    # The problem after the edits of delta. The selections are generated again, the popular activities and
+    # capacity ratios are kept as they were loaded
+    def apply(self, delta: ProblemDelta) -> "AssigningActivititesProblem":
+        removed = set(delta.remove_groups)
+        groups = [g for g in self.groups if g.id not in removed] + [group_record(g) for g in delta.add_groups]
+        group_priorities = {k: v for k, v in self.group_priorities.items() if k not in removed}
+        group_priorities |= {g["id"]: list(g.get("priorities", [])) for g in delta.add_groups}
+        group_priorities |= {k: list(v) for k, v in delta.priorities.items()}
+
+        activities = []
+        for a in self.activities:
+            if not any((a.id, t.id) in delta.capacities or (a.id, t.id) in delta.session_times for t in a.timeslots):
+                activities.append(a)
+                continue
+            timeslots = set()
+            for t in a.timeslots:
+                update = {}
+                if (a.id, t.id) in delta.capacities:
+                    update["capacity"] = delta.capacities[(a.id, t.id)]
+                if (a.id, t.id) in delta.session_times:
+                    start, end = (datetime.fromisoformat(v) for v in delta.session_times[(a.id, t.id)])
+                    update |= {"start": start, "end": end + TRAVEL_TIME, "real_end": end}
+                timeslots.add(ActivityTimeslot.model_validate(t.model_dump() | update))
+            activities.append(a.model_copy(update={"timeslots": timeslots}))
+
+        popular_activity = np.zeros(len(activities), dtype=np.int8)
+        popular_activity[self.selection_table.activity[self.selection_table.popular == 1]] = 1
+        priorities = PriorityMatrix.build(groups, activities, group_priorities)
+        sessions, table = generate_selections(groups, activities, priorities, popular_activity)
+        popular_ids = {a.id for a in self.popularactivities}
+        problem = type(self)(
+            activities=activities,
+            groups=groups,
+            sessions=sessions,
+            selection_table=table,
+            popularactivities=[a for a in activities if a.id in popular_ids],
+            popular_method=self.popular_method,
+            nb_most_common=self.nb_most_common,
+            capacity_ratios=self.capacity_ratios,
+            group_priorities=group_priorities,
+            grpswithoutselections=sum(len(group_priorities.get(g.id, [])) == 0 for g in groups),
+            activitieswithoutsesessions=self.activitieswithoutsesessions,
+        )
+        problem._priorities = priorities
+        return problem
+
+    # a copy of the problem with the popular activities for another threshold, chosen by the popular method of the
+    # problem as from_json does
+    def with_popular_threshold(self, popular_threshold: float) -> "AssigningActivititesProblem":
+        popular = self.get_popularity().popular(self.popular_method, popular_threshold, self.nb_most_common)
+        activities = [a for a, p in zip(self.activities, popular.tolist()) if p]
+        problem = self.model_copy(update={"popularactivities": activities})
+        problem._selection_index = None
+        return problem
+
     def get_popular_activities(self) -> list[Activity]:
         return {a for a in self.popularactivities}
 
+    def get_popularity(self) -> Popularity:
+        # the demand against capacity of from_json, or built on first use
+        if self._popularity is None:
+            self._popularity = popularity_of(self.groups, self.activities, self.get_priorities(), self.selection_table)
+        return self._popularity
+
+    def get_priorities(self) -> PriorityMatrix:
+        # the group_priorities by position of the group and the activity, built on first use
+        if self._priorities is None:
+            self._priorities = PriorityMatrix.build(self.groups, self.activities, self.group_priorities)
+        return self._priorities
+
+    def get_selection_index(self) -> SelectionIndex:
+        # built on first use, the selections are not expected to change afterwards
+        if self._selection_index is None:
+            self._selection_index = SelectionIndex.build(self)
+        return self._selection_index
+
+    def get_group_position(self, group: Group) -> int:
+        return self._get_positions()["groups"][group.id]
+
+    def get_activity_position(self, activity: Activity) -> int:
+        return self._get_positions()["activities"][activity.id]
+
+    def get_session_position(self, activity: Activity, time_slot: ActivityTimeslot) -> int:
+        return self._get_positions()["sessions"][(activity.id, time_slot.id)]
+
+    def _get_positions(self) -> dict[str, dict]:
+        if self._positions is None:
+            self._positions = {
+                "groups": {g.id: i for i, g in enumerate(self.groups)},
+                "activities": {a.id: i for i, a in enumerate(self.activities)},
+                "sessions": {(a.id, t.id): i for i, (a, t) in enumerate(self.get_session_activities())},
+            }
+        return self._positions
+
+    def get_session_activities(self) -> list[tuple[Activity, ActivityTimeslot]]:
+        # the sessions are listed in the order of sessions_of
+        return [(self.activities[a], t) for a, t in sessions_of(self.activities)]
+
+    def get_selection_names(self) -> list[str]:
+        return self.selection_table.names(self.groups, self.activities, self.sessions)
+
+    def get_selection_rows(self, keys: list[tuple[str, str, str]]) -> np.ndarray:
+        # rows of the selection table for (group id, activity id, session id), keys of other problems are skipped
+        position = {key: r for r, key in enumerate(selection_keys(self))}
+        return np.array(sorted({position[k] for k in keys if k in position}), dtype=np.int64)
+
+    def get_selection_sizes(self) -> np.ndarray:
+        # seats a selection takes in its session, the leaders only count when they can participate in the activity
+        table = self.selection_table
+        leaders = np.array([a.leaders_can_participate for a in self.activities], dtype=bool)
+        size = np.array([g.size for g in self.groups], dtype=np.int64)
+        size_without_leaders = np.array([g.size_without_leaders for g in self.groups], dtype=np.int64)
+        return np.where(leaders[table.activity], size[table.group], size_without_leaders[table.group])
+
     def get_selections_for_activity(self, activity: Activity, time_slot: ActivityTimeslot) -> set[Selection]:
-        return {s for s in self.selections if s.activity == activity and time_slot == s.time_slot}
+        selections = self.selections
+        rows = self.get_selection_index().for_session(self.get_session_position(activity, time_slot))
+        return {selections[r] for r in rows.tolist()}
 
     def get_overlapping_selections(self, selection: Selection) -> list[Selection]:
         overlaps = []
-        for s in self.selections:
-            if s.group != selection.group:
-                continue
-
+        selections = self.selections
+        for r in self.get_selection_index().for_group(self.get_group_position(selection.group)).tolist():
+            s = selections[r]
             if s.activity == selection.activity:
                 continue
 
@@ -442,14 +1067,84 @@ class AssigningActivititesProblem(BaseModel):
 
         return overlaps
 
+    def get_overlapping_selection_pairs(self) -> np.ndarray:
+        # Sort the selections on (group, start). The selections overlapping with one selection that start at the
+        # same time or later are then the ones following it up to the first one starting after it has ended.
+        # Every overlapping pair of selections of different activities is returned exactly once, as rows of
+        # the selection table with the earlier starting selection first
+        index = self.get_selection_index()
+        table = self.selection_table
+        if len(table) == 0:
+            return np.empty((0, 2), dtype=np.int64)
+
+        base = index.start.min()
+        span = index.end.max() - base + 1
+        group = table.group.astype(np.int64)
+        start_key = group * span + index.start - base
+        end_key = group * span + index.end - base
+        order = np.lexsort((end_key, start_key))
+        stop = np.searchsorted(start_key[order], end_key[order], side="left")
+        counts = stop - np.arange(len(order)) - 1
+        first = np.repeat(np.arange(len(order)), counts)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+        pairs = np.column_stack((order[first], order[second]))
+        return pairs[table.activity[pairs[:, 0]] != table.activity[pairs[:, 1]]]
+
+    def get_overlapping_selection_cliques(self) -> list[list[int]]:
+        # Maximal sets of a group's selections that all run at the same time. Sweeping the start and end events
+        # in time order, the running selections form a maximal clique whenever a selection ends right after
+        # one has started. Ends are handled before starts at the same time, as touching sessions do not overlap.
+        # Sessions of the same activity may end up in one clique, which is implied by the max 1 session rule.
+        index = self.get_selection_index()
+        activity = self.selection_table.activity.tolist()
+        cliques = []
+        for rows in index.by_group:
+            rows = rows.tolist()
+            events = [(t, 1, r) for t, r in zip(index.start[rows].tolist(), rows)]
+            events += [(t, 0, r) for t, r in zip(index.end[rows].tolist(), rows)]
+            events.sort()
+
+            running = {}
+            started = False
+            for _, is_start, r in events:
+                if is_start:
+                    running[r] = None
+                    started = True
+                    continue
+                if started and len({activity[r1] for r1 in running}) > 1:
+                    cliques.append(list(running))
+                started = False
+                del running[r]
+
+        return cliques
+
+    def get_different_location_same_day_pairs(self) -> list[tuple[int, int]]:
+        # pairs of a group's selections for different activities in different areas on the same day
+        index = self.get_selection_index()
+        table = self.selection_table
+        pairs = []
+        for rows in index.by_group:
+            rows = rows.tolist()
+            for i, r in enumerate(rows):
+                a = self.activities[table.activity[r]]
+                t = self.sessions[table.session[r]]
+                for r1 in rows[i + 1 :]:
+                    a1 = self.activities[table.activity[r1]]
+                    # only allow other activitites in other locations
+                    if a1 == a or a1.activity_area == a.activity_area:
+                        continue
+                    if t.is_same_day(self.sessions[table.session[r1]]):
+                        pairs.append((r, r1))
+
+        return pairs
+
     def get_all_selections_on_other_locations_for_different_activities_same_day(
         self, selection: Selection
     ) -> list[Selection]:
         selections = []
-        for s in self.selections:
-            # only look for this group
-            if s.group != selection.group:
-                continue
+        # only look for this group
+        for r in self.get_selection_index().for_group(self.get_group_position(selection.group)).tolist():
+            s = self.selections[r]
             # only allow other activitites
             if s.activity == selection.activity:
                 continue
@@ -463,92 +1158,204 @@ class AssigningActivititesProblem(BaseModel):
         return selections
 
 
-class Solution(BaseModel):
-    selections: set[Selection]
-    allvars: set[Selection]
+class Solution(BaseModel, arbitrary_types_allowed=True):
+    problem: AssigningActivititesProblem = Field(exclude=True, repr=False)
+    # 1 for the rows of the selection table that are part of the solution
+    assigned: np.ndarray = Field(exclude=True, repr=False)
     status: OptimizationStatus
+    # timings and model size of the run that found the solution
+    report: BuildReport | None = None
 
     @classmethod
-    def build(cls, variables: dict[Selection, Var], status: OptimizationStatus) -> "Solution":
+    def build(
+        cls, problem: AssigningActivititesProblem, variables: list[Var], status: OptimizationStatus
+    ) -> "Solution":
         print("solution status:")
         print(status)
 
         if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
-            return cls(selections=set(), status=status)
+            return cls(problem=problem, assigned=np.zeros(len(variables), dtype=np.int8), status=status)
 
-        selections = []
-        allvars = []
-        for selection, variable in variables.items():
-            selection.assigned = 0
-            if 1 == 2:
-                print(f"{variable.name}: {variable.x}")
-            if variable.x > 0.5:
-                selection.assigned = 1
-                selections.append(selection)
-            allvars.append(selection)
-
-        return cls(selections=selections, allvars=allvars, status=status)
+        assigned = np.array([variable.x > 0.5 for variable in variables], dtype=np.int8)
+        return cls(problem=problem, assigned=assigned, status=status)
 
-    def is_valid(self) -> bool:
-        return len(self.selections) > 0
-
-    def to_dataframe(self):
-        columns = ["Group", "Activity", "Timeslot", "Start", "End", "Location", "Priority", "PriorityValue", "Assigned","ActivityArea"]
-
-        data = [
-            [
-                s.group.id,
-                s.activity.id,
-                s.time_slot.id,
-                s.time_slot.start.replace(tzinfo=None),
-                s.time_slot.real_end.replace(tzinfo=None),
-                s.activity.activity_area,
-                21 - s.priority,
-                s.priority,
-                s.assigned,
-                s.activity.activity_area
-            ]
-            for s in self.selections
+    # a solution read back from an export, the selections that are no longer part of the problem are skipped
+    @classmethod
+    def from_selection_ids(
+        cls,
+        problem: AssigningActivititesProblem,
+        keys: list[tuple[str, str, str]],
+        status: OptimizationStatus = OptimizationStatus.FEASIBLE,
+    ) -> "Solution":
+        assigned = np.zeros(len(problem.selection_table), dtype=np.int8)
+        assigned[problem.get_selection_rows(keys)] = 1
+        return cls(problem=problem, assigned=assigned, status=status)
+
+    @classmethod
+    def from_json(cls, problem: AssigningActivititesProblem, filename: str) -> "Solution":
+        with open(filename, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        keys = [(s["group"], s["activity"], s["time_slot"]) for s in data["selections"]]
+        return cls.from_selection_ids(problem, keys, OptimizationStatus[data["status"]])
+
+    @classmethod
+    def from_excel(cls, problem: AssigningActivititesProblem, filename: str) -> "Solution":
+        # reads the sheet of to_excel, or the one of to_visualization_excel that has all selections
+        df = pd.read_excel(filename, sheet_name="solution", dtype=str)
+        if "Group" in df.columns:
+            return cls.from_selection_ids(problem, list(zip(df["Group"], df["Activity"], df["Timeslot"])))
+        df = df[df["Assigned"].astype(int) == 1]
+        return cls.from_selection_ids(problem, list(zip(df["gid"], df["aid"], df["sid"])))
+
+    # (group id, activity id, session id) of the assigned selections
+    def get_selection_ids(self) -> list[tuple[str, str, str]]:
+        table = self.problem.selection_table
+        rows = np.flatnonzero(self.assigned)
+        return [
+            (self.problem.groups[g].id, self.problem.activities[a].id, self.problem.sessions[t].id)
+            for g, a, t in zip(table.group[rows].tolist(), table.activity[rows].tolist(), table.session[rows].tolist())
         ]
-        return pd.DataFrame(data=data, columns=columns)
+
+    # the assigned selections by id only, to be read back with from_json
+    def to_json(self, filename: str) -> None:
+        data = {
+            "status": self.status.name,
+            "selections": [{"group": g, "activity": a, "time_slot": t} for g, a, t in self.get_selection_ids()],
+        }
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=2)
+
+    # the assigned rows of this solution in the selection table of problem, which may be an edited version
+    def assigned_in(self, problem: AssigningActivititesProblem) -> np.ndarray:
+        if problem is self.problem:
+            return self.assigned
+        assigned = np.zeros(len(problem.selection_table), dtype=np.int8)
+        assigned[problem.get_selection_rows(self.get_selection_ids())] = 1
+        return assigned
+
+    # the Selection objects are only created when exporting the solution
+
+    @computed_field
+    @cached_property
+    def selections(self) -> list[Selection]:
+        return self.problem.selection_table.to_selections(
+            self.problem.groups,
+            self.problem.activities,
+            self.problem.sessions,
+            rows=np.flatnonzero(self.assigned),
+            assigned=self.assigned,
+        )
+
+    @computed_field
+    @cached_property
+    def allvars(self) -> list[Selection]:
+        return self.problem.selection_table.to_selections(
+            self.problem.groups, self.problem.activities, self.problem.sessions, assigned=self.assigned
+        )
+
+    def is_valid(self) -> bool:
+        return bool(self.assigned.any())
+
+    def get_columns(self, rows: np.ndarray) -> dict[str, np.ndarray]:
+        # the columns of the exports for the given rows of the selection table
+        problem = self.problem
+        table = problem.selection_table
+        groups = problem.get_group_columns()
+        sessions = problem.get_session_columns()
+        activities = problem.get_activity_columns()
+        group = table.group[rows]
+        activity = table.activity[rows]
+        session = table.session[rows]
+        return {
+            "group": groups["id"][group],
+            "group_size": groups["size"][group],
+            "group_size_without_leaders": groups["size_without_leaders"][group],
+            "activity": activities["id"][activity],
+            "name": activities["name"][activity],
+            "area": activities["area"][activity],
+            "leaders": activities["leaders"][activity],
+            "session": sessions["id"][session],
+            "start": sessions["start"][session],
+            "end": sessions["end"][session],
+            "capacity": sessions["capacity"][session],
+            "priority": table.priority[rows].astype(np.int64),
+            "assigned": self.assigned[rows].astype(np.int64),
+            "popular": table.popular[rows].astype(np.int64),
+        }
+
+    def to_dataframe(self) -> pd.DataFrame:
+        columns = self.get_columns(np.flatnonzero(self.assigned))
+        return pd.DataFrame(
+            {
+                "Group": columns["group"],
+                "Activity": columns["activity"],
+                "Timeslot": columns["session"],
+                "Start": columns["start"],
+                "End": columns["end"],
+                "Location": columns["area"],
+                "Priority": 21 - columns["priority"],
+                "PriorityValue": columns["priority"],
+                "Assigned": columns["assigned"],
+                "ActivityArea": columns["area"],
+            }
+        )
 
     def to_excel(self, filename: str):
         df = self.to_dataframe()
         df.sort_values(by=["Group", "Start"], inplace=True)
-        df.to_excel(filename, sheet_name="solution", index=False)
-
-    def to_visualization_dataframe(self):
-        columns = ["gid", "aid", "name","sid", "Start", "End", "ActivityArea", "Priority", "objvalue", "Assigned","Capacity","Size","Size_without_leaders","PopularActivity","leaders_can_participate"]
-
-        data = [
-            [
-                s.group.id,
-                s.activity.id,
-                s.activity.name,
-                s.time_slot.id,
-                s.time_slot.start.replace(tzinfo=None),
-                s.time_slot.real_end.replace(tzinfo=None),
-                s.activity.activity_area,
-                21 - s.priority,
-                s.priority,
-                s.assigned,
-                s.time_slot.capacity,
-                s.group.size,
-                s.group.size_without_leaders,
-                s.popular,
-                s.activity.leaders_can_participate
-                
-                
-            ]
-            for s in self.allvars
-        ]
-        return pd.DataFrame(data=data, columns=columns)
+        write_sheets(filename, {"solution": df})
+
+    def to_visualization_dataframe(self) -> pd.DataFrame:
+        columns = self.get_columns(np.arange(len(self.assigned)))
+        return pd.DataFrame(
+            {
+                "gid": columns["group"],
+                "aid": columns["activity"],
+                "name": columns["name"],
+                "sid": columns["session"],
+                "Start": columns["start"],
+                "End": columns["end"],
+                "ActivityArea": columns["area"],
+                "Priority": 21 - columns["priority"],
+                "objvalue": columns["priority"],
+                "Assigned": columns["assigned"],
+                "Capacity": columns["capacity"],
+                "Size": columns["group_size"],
+                "Size_without_leaders": columns["group_size_without_leaders"],
+                "PopularActivity": columns["popular"],
+                "leaders_can_participate": columns["leaders"],
+            }
+        )
 
-    def to_visualization_excel(self, filename: str):
+    # all selections, and the settings of the run in a properties sheet when given
+    def to_visualization_excel(self, filename: str, properties: dict | None = None):
         df = self.to_visualization_dataframe()
         df.sort_values(by=["gid", "Start"], inplace=True)
-        df.to_excel(filename, sheet_name="solution", index=False)
-        # df.append_df_to_excel(filename, df, header=None, index=False)
+        sheets = {"solution": df}
+        if properties:
+            sheets["properties"] = pd.DataFrame(data=[properties])
+        write_sheets(filename, sheets)
+
+    def get_sheets(self, properties: dict | None = None, base_info: bool = False) -> dict[str, pd.DataFrame]:
+        # The solution, all selections, the settings of the run and optionally the base info of the problem. The
+        # settings are the ones of the report when not given
+        sheets = {
+            "solution": self.to_dataframe().sort_values(by=["Group", "Start"]),
+            "allvars": self.to_visualization_dataframe().sort_values(by=["gid", "Start"]),
+        }
+        if properties is None and self.report is not None:
+            properties = self.report.settings
+        if properties:
+            sheets["properties"] = pd.DataFrame(data=[properties])
+        if base_info:
+            sheets |= self.problem.get_base_info_sheets()
+        return sheets
+
+    # all sheets in one workbook, or a Parquet or CSV file per sheet, see write_sheets
+    def export(
+        self, filename: str, format: str = "xlsx", properties: dict | None = None, base_info: bool = False
+    ) -> list[str]:
+        return write_sheets(filename, self.get_sheets(properties, base_info), format)
 
     def create_gantt_chart(self) -> None:
         pass
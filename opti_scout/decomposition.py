@@ -0,0 +1,133 @@
+from opti_scout.classes import AssigningActivititesProblem, rows_by_key
+from opti_scout.matrix import ModelMatrix, RowActivity
+from pydantic import BaseModel
+from mip import Model, OptimizationStatus
+from concurrent.futures import ProcessPoolExecutor
+import os
+import tempfile
+import time
+import numpy as np
+
+# The model decomposed into blocks of selections, per day or per activity area. Most rows of the model only
+# involve the selections of one group on one day, the others (max sessions, max popular, out of camp, one session
+# per activity) link the blocks. Each round every block is solved in its own process with the selections of the
+# other blocks fixed at the current assignment, so the linking rows only leave the room the other blocks do not use.
+# The block solutions are then merged one by one as long as the whole model stays feasible, what conflicts with a
+# block merged earlier in the round is solved again in the next round.
+
+
+class DecompositionRound(BaseModel):
+    round: int
+    seconds: float
+    objective: float
+    violated_rows: int
+    # blocks whose solution was merged whole, merged for some of the groups only, or not at all
+    merged: int
+    partial: int
+    rejected: int
+
+
+def block_columns(problem: AssigningActivititesProblem, by: str) -> list[np.ndarray]:
+    # the rows of the selection table of each block
+    index = problem.get_selection_index()
+    if by == "day":
+        keys = index.start // 86400
+    elif by == "area":
+        areas = np.array([a.activity_area for a in problem.activities])
+        keys = areas[problem.selection_table.activity]
+    else:
+        raise ValueError(f"Unknown decomposition '{by}', use 'day' or 'area'")
+    blocks, inverse = np.unique(keys, return_inverse=True)
+    return rows_by_key(inverse, len(blocks))
+
+
+def solve_block(matrix: ModelMatrix, path: str, start: np.ndarray, max_seconds: int) -> np.ndarray | None:
+    # runs in a worker process, returns the assignment of the columns of the block or None without a solution
+    model = Model()
+    model.verbose = 0
+    model.threads = 1
+    x = matrix.load(model, path)
+    model.start = [(v, float(s)) for v, s in zip(x, start.tolist())]
+    status = model.optimize(max_seconds=max_seconds)
+    if status not in [OptimizationStatus.OPTIMAL, OptimizationStatus.FEASIBLE]:
+        return None
+    return np.array([v.x > 0.5 for v in x], dtype=np.int8)
+
+
+def fix_and_resolve(
+    matrix: ModelMatrix,
+    blocks: list[np.ndarray],
+    group: np.ndarray,
+    start: np.ndarray,
+    max_seconds: int,
+    max_rounds: int,
+    workers: int | None = None,
+) -> tuple[np.ndarray, list[DecompositionRound]]:
+    # Improves the assignment start block by block until a round merges nothing, max_rounds or max_seconds.
+    # A merge is accepted when it violates fewer rows, or as few rows with a better objective, so an infeasible
+    # start, for example one without the min sessions per group, is repaired on the way. A block that conflicts
+    # with the blocks merged before it is merged group by group, as the linking rows are rows of one group.
+    # The block models are written to a temporary directory of the call, so runs at the same time do not share them
+    activity = RowActivity.create(matrix, start)
+    deadline = time.perf_counter() + max_seconds
+    block_seconds = max(1, max_seconds // max_rounds)
+    rounds = []
+    with tempfile.TemporaryDirectory() as directory, ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for r in range(1, max_rounds + 1):
+            roundstarttime = time.perf_counter()
+            futures = [
+                pool.submit(
+                    solve_block,
+                    matrix.restrict(columns, activity.x),
+                    os.path.join(directory, f"block_{i}.mps"),
+                    activity.x[columns],
+                    max(1, min(block_seconds, int(deadline - roundstarttime))),
+                )
+                for i, columns in enumerate(blocks)
+            ]
+            solutions = [f.result() for f in futures]
+
+            # merge the blocks that gain the most first
+            gains = [
+                float(activity.objective[columns] @ (s - activity.x[columns])) if s is not None else 0.0
+                for columns, s in zip(blocks, solutions)
+            ]
+            merged = partial = rejected = 0
+            for i in np.argsort(gains, kind="stable")[::-1].tolist():
+                if solutions[i] is None:
+                    continue
+                columns, values = blocks[i], solutions[i]
+                if activity.try_change(columns, values):
+                    merged += 1
+                    continue
+                changed = values != activity.x[columns]
+                if not changed.any():
+                    continue
+                columns, values = columns[changed], values[changed]
+                groups, inverse = np.unique(group[columns], return_inverse=True)
+                accepted = [
+                    activity.try_change(columns[rows], values[rows]) for rows in rows_by_key(inverse, len(groups))
+                ]
+                if any(accepted):
+                    partial += 1
+                else:
+                    rejected += 1
+
+            rounds.append(
+                DecompositionRound(
+                    round=r,
+                    seconds=time.perf_counter() - roundstarttime,
+                    objective=activity.objective_value,
+                    violated_rows=activity.nb_violated,
+                    merged=merged,
+                    partial=partial,
+                    rejected=rejected,
+                )
+            )
+            print(
+                f"decomposition round {r}: objective {activity.objective_value}, {merged} blocks merged, "
+                f"{partial} merged per group, {rejected} rejected"
+            )
+            if merged + partial == 0 or time.perf_counter() >= deadline:
+                break
+    return activity.x, rounds
@@ -0,0 +1,39 @@
+import pandas as pd
+
+# Writes the sheets of a camp run, each a DataFrame by sheet name, in one pass. Excel goes through a write-only
+# openpyxl workbook that streams the rows to the file instead of keeping a cell object for each of them. Parquet and
+# CSV write a file per sheet, filename + "_" + sheet + ".parquet" or ".csv", Parquet needs the pyarrow package,
+# pip install opti_scout[parquet]
+
+EXPORT_FORMATS = ["xlsx", "parquet", "csv"]
+
+
+def write_sheets(filename: str, sheets: dict[str, pd.DataFrame], format: str = "xlsx") -> list[str]:
+    # the files written, filename is the workbook for xlsx and the start of the file names for the others
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{format}', use {', '.join(EXPORT_FORMATS)}")
+    if format == "xlsx":
+        write_workbook(filename, sheets)
+        return [filename]
+    files = []
+    for sheet, df in sheets.items():
+        path = f"{filename}_{sheet}.{format}"
+        if format == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+        files.append(path)
+    return files
+
+
+def write_workbook(filename: str, sheets: dict[str, pd.DataFrame]) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet, df in sheets.items():
+        worksheet = workbook.create_sheet(sheet)
+        worksheet.append([str(column) for column in df.columns])
+        # the numbers come out of the columns as python scalars and the times as Timestamps, which openpyxl writes
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append(row)
+    workbook.save(filename)
@@ -0,0 +1,279 @@
+from opti_scout.classes import AssigningActivititesProblem
+from pydantic import BaseModel
+import numpy as np
+import time
+
+
+class AssignmentState(BaseModel, arbitrary_types_allowed=True):
+    # A partial assignment of the rows of the selection table, with the load of every session and the assigned
+    # rows of every group kept up to date, so checking whether a row can be added only looks at its own group.
+    # The rules are the ones of the model: session capacity, one session per activity, no overlapping sessions,
+    # at most one activity out of camp and the max number of popular activities and of sessions per group
+    maxSessionsPerGroup: int
+    maxPopularActivities: int
+    # per row of the selection table
+    group: list[int]
+    activity: list[int]
+    session: list[int]
+    priority: list[int]
+    size: list[int]
+    start: list[int]
+    end: list[int]
+    out_of_camp: list[bool]
+    popular: list[bool]
+    # the rows of the other sessions of the same activity for the same group
+    same_activity: list[list[int]]
+    # per session, its assigned rows and all its rows, by descending priority
+    capacity: list[int]
+    load: list[int]
+    session_rows: list[list[int]]
+    all_session_rows: list[list[int]]
+    # per group, its assigned rows and all its rows, by descending priority
+    rows: list[list[int]]
+    all_group_rows: list[list[int]]
+    nb_out_of_camp: list[int]
+    nb_popular: list[int]
+    assigned: np.ndarray
+
+    @classmethod
+    def create(
+        cls, problem: AssigningActivititesProblem, maxSessionsPerGroup: int, maxPopularActivities: int
+    ) -> "AssignmentState":
+        table = problem.selection_table
+        index = problem.get_selection_index()
+        out_of_camp = np.zeros(len(table), dtype=bool)
+        out_of_camp[np.concatenate(index.out_of_camp_by_group + [np.empty(0, dtype=np.int64)])] = True
+        popular = np.zeros(len(table), dtype=bool)
+        popular[np.concatenate(index.popular_by_group + [np.empty(0, dtype=np.int64)])] = True
+        # the rows of a group or a session by descending priority, earlier sessions first on ties
+        by_priority = np.lexsort([index.start, -table.priority.astype(np.int64)])
+        rank = np.empty(len(table), dtype=np.int64)
+        rank[by_priority] = np.arange(len(table))
+        same_activity = [[] for _ in range(len(table))]
+        for rows in index.by_group_activity.values():
+            rows = rows.tolist()
+            for r in rows:
+                same_activity[r] = rows
+        # the lists are built here, validating them would take longer than the heuristic
+        return cls.model_construct(
+            maxSessionsPerGroup=maxSessionsPerGroup,
+            maxPopularActivities=maxPopularActivities,
+            group=table.group.tolist(),
+            activity=table.activity.tolist(),
+            session=table.session.tolist(),
+            priority=table.priority.tolist(),
+            size=problem.get_selection_sizes().tolist(),
+            start=index.start.tolist(),
+            end=index.end.tolist(),
+            out_of_camp=out_of_camp.tolist(),
+            popular=popular.tolist(),
+            same_activity=same_activity,
+            capacity=[t.capacity for t in problem.sessions],
+            load=[0] * len(problem.sessions),
+            session_rows=[[] for _ in problem.sessions],
+            all_session_rows=[r[np.argsort(rank[r])].tolist() for r in index.by_session],
+            rows=[[] for _ in problem.groups],
+            all_group_rows=[r[np.argsort(rank[r])].tolist() for r in index.by_group],
+            nb_out_of_camp=[0] * len(problem.groups),
+            nb_popular=[0] * len(problem.groups),
+            assigned=np.zeros(len(table), dtype=np.int8),
+        )
+
+    @property
+    def objective(self) -> int:
+        return int(np.dot(self.assigned, self.priority)) if len(self.assigned) > 0 else 0
+
+    def conflicts(self, row: int) -> list[int]:
+        # the assigned rows of the group that row cannot be combined with
+        activity, start, end = self.activity[row], self.start[row], self.end[row]
+        return [
+            r
+            for r in self.rows[self.group[row]]
+            if self.activity[r] == activity or (self.start[r] < end and start < self.end[r])
+        ]
+
+    def fits(self, row: int, leaving: list[int] | None = None) -> bool:
+        # row can be assigned once the rows in leaving, all of the same group, are unassigned
+        leaving = leaving or []
+        if self.assigned[row] or any(r not in leaving for r in self.conflicts(row)):
+            return False
+        load = self.load[self.session[row]] + self.size[row]
+        load -= sum(self.size[r] for r in leaving if self.session[r] == self.session[row])
+        if load > self.capacity[self.session[row]]:
+            return False
+        return self.within_limits(row, leaving)
+
+    def within_limits(self, row: int, leaving: list[int] | None = None) -> bool:
+        # the limits on the number of sessions, out of camp and popular activities of the group
+        leaving = leaving or []
+        g = self.group[row]
+        if len(self.rows[g]) - len(leaving) >= self.maxSessionsPerGroup:
+            return False
+        if self.out_of_camp[row] and self.nb_out_of_camp[g] - sum(self.out_of_camp[r] for r in leaving) >= 1:
+            return False
+        if self.popular[row]:
+            return self.nb_popular[g] - sum(self.popular[r] for r in leaving) < self.maxPopularActivities
+        return True
+
+    def assign(self, row: int) -> None:
+        g = self.group[row]
+        self.assigned[row] = 1
+        self.load[self.session[row]] += self.size[row]
+        self.session_rows[self.session[row]].append(row)
+        self.rows[g].append(row)
+        self.nb_out_of_camp[g] += self.out_of_camp[row]
+        self.nb_popular[g] += self.popular[row]
+
+    def unassign(self, row: int) -> None:
+        g = self.group[row]
+        self.assigned[row] = 0
+        self.load[self.session[row]] -= self.size[row]
+        self.session_rows[self.session[row]].remove(row)
+        self.rows[g].remove(row)
+        self.nb_out_of_camp[g] -= self.out_of_camp[row]
+        self.nb_popular[g] -= self.popular[row]
+
+    def greedy(self, order: list[int]) -> None:
+        # assign the rows in the given order whenever they fit
+        for row in order:
+            if self.fits(row):
+                self.assign(row)
+
+    def swap(self, row: int) -> bool:
+        # Assigns row in place of the rows of its group that are in the way, when it is worth more than them.
+        # Those are the rows of the same activity or overlapping with it, and when a limit of the group is reached
+        # the cheapest other row that makes room
+        leaving = self.conflicts(row)
+        if not self.fits(row, leaving):
+            others = sorted((r for r in self.rows[self.group[row]] if r not in leaving), key=self.priority.__getitem__)
+            leaving = next((leaving + [r] for r in others if self.fits(row, leaving + [r])), None)
+            if leaving is None:
+                return False
+        if self.priority[row] <= sum(self.priority[r] for r in leaving):
+            return False
+        for r in leaving:
+            self.unassign(r)
+        self.assign(row)
+        return True
+
+    def relocate(self, row: int) -> bool:
+        # Assigns row when its session is full by moving another group to a different session of the same activity.
+        # The moved group keeps its priority, so the objective improves by the priority of row
+        session = self.session[row]
+        if self.conflicts(row) or not self.within_limits(row):
+            return False
+        if self.load[session] + self.size[row] <= self.capacity[session]:
+            return False
+        for other in list(self.session_rows[session]):
+            if self.load[session] - self.size[other] + self.size[row] > self.capacity[session]:
+                continue
+            target = next((r for r in self.same_activity[other] if r != other and self.fits(r, [other])), None)
+            if target is None:
+                continue
+            self.unassign(other)
+            self.assign(target)
+            if self.fits(row):
+                self.assign(row)
+                return True
+            self.unassign(target)
+            self.assign(other)
+        return False
+
+    def shift(self, row: int) -> bool:
+        # Assigns row when a single row of its group of another activity overlaps with it, by moving that row to
+        # another session of its activity
+        in_the_way = self.conflicts(row)
+        if len(in_the_way) != 1 or self.activity[in_the_way[0]] == self.activity[row]:
+            return False
+        other = in_the_way[0]
+        for target in self.same_activity[other]:
+            if target == other or (self.start[target] < self.end[row] and self.start[row] < self.end[target]):
+                continue
+            if not self.fits(target, [other]):
+                continue
+            self.unassign(other)
+            self.assign(target)
+            if self.fits(row):
+                self.assign(row)
+                return True
+            self.unassign(target)
+            self.assign(other)
+        return False
+
+    def reassign(self, row: int) -> bool:
+        # Assigns row after taking out all rows of its group and of the other groups in its session that are in
+        # the way, lowest priority first. Those groups are filled up again, with the rows they did not have first,
+        # then the other groups get the places they left. Kept when this is worth more than the rows taken out,
+        # else the rows are put back. This moves several groups at once, where each move on its own is not worth it
+        session = self.session[row]
+        groups = [self.group[row]]
+        freed = sum(self.size[r] for r in self.session_rows[session] if self.group[r] == groups[0])
+        for other in sorted(self.session_rows[session], key=self.priority.__getitem__):
+            if self.load[session] - freed + self.size[row] <= self.capacity[session]:
+                break
+            if self.group[other] not in groups:
+                groups.append(self.group[other])
+                freed += sum(self.size[r] for r in self.session_rows[session] if self.group[r] == groups[-1])
+        taken = [r for g in groups for r in self.rows[g]]
+        for r in taken:
+            self.unassign(r)
+        added = []
+        if self.fits(row):
+            self.assign(row)
+            was_taken = set(taken)
+            refill = [r for g in groups for r in self.all_group_rows[g]]
+            self.greedy([r for r in refill if r not in was_taken] + [r for r in refill if r in was_taken])
+            added = [r for g in groups for r in self.rows[g]]
+            for t in sorted({self.session[r] for r in taken if not self.assigned[r]}):
+                for r in self.all_session_rows[t]:
+                    if self.load[t] + self.size[r] <= self.capacity[t] and self.group[r] not in groups and self.fits(r):
+                        self.assign(r)
+                        added.append(r)
+            if sum(self.priority[r] for r in added) > sum(self.priority[r] for r in taken):
+                return True
+        for r in added:
+            self.unassign(r)
+        for r in taken:
+            self.assign(r)
+        return False
+
+    def local_search(self, order: list[int], deadline: float) -> int:
+        # passes over the unassigned rows in the given order, filling up greedily after each pass, until no
+        # move improves the assignment or the deadline has passed, returns the number of moves
+        moves = 0
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for row in order:
+                if self.assigned[row]:
+                    continue
+                if self.shift(row) or self.relocate(row) or self.swap(row) or self.reassign(row):
+                    moves += 1
+                    improved = True
+                if time.perf_counter() >= deadline:
+                    break
+            self.greedy(order)
+        return moves
+
+
+def priority_order(problem: AssigningActivititesProblem, preferred: np.ndarray | None = None) -> list[int]:
+    # rows by descending priority, earlier sessions first on ties, with the preferred rows before all others
+    index = problem.get_selection_index()
+    keys = [index.start, -problem.selection_table.priority.astype(np.int64)]
+    if preferred is not None:
+        keys.append(1 - preferred.astype(np.int64))
+    return np.lexsort(keys).tolist()
+
+
+def greedy_assignment(
+    problem: AssigningActivititesProblem,
+    maxSessionsPerGroup: int,
+    maxPopularActivities: int,
+    preferred: np.ndarray | None = None,
+) -> np.ndarray:
+    # Assigns the selections by descending priority as long as they fit. The preferred rows, for example
+    # the assignment of an earlier solve, are tried first, so what is still feasible of them is kept.
+    # The min sessions per group are not enforced
+    state = AssignmentState.create(problem, maxSessionsPerGroup, maxPopularActivities)
+    state.greedy(priority_order(problem, preferred))
+    return state.assigned
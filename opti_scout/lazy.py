@@ -0,0 +1,59 @@
+from mip import ConstrsGenerator, Model, Var
+import numpy as np
+
+# The rows x + y <= 1 of pairs of selections that exclude each other, overlapping sessions and activities in other
+# areas on the same day, are many but only few of them bind. With lazy conflicts they are left out of the model and
+# only the pairs a solution breaks become rows, in rounds between solves or from the lazy constraints callback of CBC
+
+# a pair is broken when its two values sum to more than 1 plus this
+VIOLATION = 1e-6
+
+
+class ConflictGenerator(ConstrsGenerator):
+    def __init__(self, x: list[Var], pairs: np.ndarray, group: np.ndarray):
+        # pairs are rows of the selection table, x the variables of the selections and group their group
+        self.x = x
+        self.pairs = pairs
+        self.pair_group = group[pairs[:, 0]] if len(pairs) else np.empty(0, dtype=np.int64)
+        self.columns = np.unique(pairs)
+        # the pairs added as rows of the model, the calls of the callback and the rows added over all calls
+        self.added = np.zeros(len(pairs), dtype=bool)
+        self.calls = 0
+        self.rows = 0
+
+    def broken(self, values: np.ndarray) -> np.ndarray:
+        # positions in pairs of the pairs broken by the values of the selections
+        return np.flatnonzero(values[self.pairs[:, 0]] + values[self.pairs[:, 1]] > 1 + VIOLATION)
+
+    def add_rows(self, model: Model, values: np.ndarray) -> int:
+        # The pairs of the groups with a pair broken by the solution values of model become rows of model, as the
+        # next solution tends to break another pair of the same group. Returns the number of rows added
+        broken = np.zeros(int(self.pair_group.max(initial=-1)) + 1, dtype=bool)
+        broken[self.pair_group[self.broken(values)]] = True
+        added = np.flatnonzero(broken[self.pair_group] & ~self.added)
+        for s, s1 in self.pairs[added].tolist():
+            model += self.x[s] + self.x[s1] <= 1
+        self.added[added] = True
+        self.rows += len(added)
+        return len(added)
+
+    def repair(self, values: np.ndarray) -> np.ndarray:
+        # the solution without the selection of lower priority of each broken pair, all rows of the model hold
+        # for it when the minimum of sessions per group is 0
+        assigned = values > 0.5
+        for s, s1 in self.pairs[self.broken(values)].tolist():
+            if assigned[s] and assigned[s1]:
+                assigned[s if self.x[s].obj < self.x[s1].obj else s1] = False
+        return assigned
+
+    def generate_constrs(self, model: Model, depth: int = 0, npass: int = 0) -> None:
+        # the lazy constraints callback, the model of the callback has its own variables, found by name
+        self.calls += 1
+        variables = model.translate([self.x[c] for c in self.columns.tolist()])
+        values = np.zeros(len(self.x))
+        values[self.columns] = [v.x if v is not None else 0.0 for v in variables]
+        position = np.searchsorted(self.columns, self.pairs[self.broken(values)])
+        for s, s1 in position.tolist():
+            if variables[s] is not None and variables[s1] is not None:
+                model += variables[s] + variables[s1] <= 1
+                self.rows += 1
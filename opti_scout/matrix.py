@@ -0,0 +1,237 @@
+from pydantic import BaseModel
+from mip import MAXIMIZE, Model, Var
+import numpy as np
+
+
+class RowBlock(BaseModel, arbitrary_types_allowed=True):
+    # The rows of one constraint family in coordinate form. row is the row within the block
+    # and column the row of the selection table for each nonzero
+    row: np.ndarray
+    column: np.ndarray
+    coefficient: np.ndarray
+    sense: str
+    rhs: np.ndarray
+    names: list[str] | None = None
+
+    @classmethod
+    def create(
+        cls,
+        row: np.ndarray,
+        column: np.ndarray,
+        coefficient: np.ndarray | int,
+        sense: str,
+        rhs: np.ndarray | int,
+        nb_rows: int,
+        names: list[str] | None = None,
+    ) -> "RowBlock":
+        if sense not in ["<=", ">=", "=="]:
+            raise ValueError(f"Unknown sense '{sense}', use '<=', '>=' or '=='")
+        return cls(
+            row=np.asarray(row, dtype=np.int64),
+            column=np.asarray(column, dtype=np.int64),
+            coefficient=np.broadcast_to(np.asarray(coefficient, dtype=np.float64), np.shape(row)),
+            sense=sense,
+            rhs=np.broadcast_to(np.asarray(rhs, dtype=np.float64), (nb_rows,)),
+            names=names,
+        )
+
+    @property
+    def num_rows(self) -> int:
+        return len(self.rhs)
+
+    @property
+    def num_nz(self) -> int:
+        return len(self.column)
+
+    def rows(self) -> list[tuple[list[int], list[float]]]:
+        # columns and coefficients of each row, in row order
+        order = np.argsort(self.row, kind="stable")
+        split = np.cumsum(np.bincount(self.row, minlength=self.num_rows))[:-1] if self.num_rows > 0 else []
+        columns = np.split(self.column[order], split)
+        coefficients = np.split(self.coefficient[order], split)
+        return [(c.tolist(), v.tolist()) for c, v in zip(columns, coefficients)]
+
+
+MPS_SENSE = {"<=": "L", ">=": "G", "==": "E"}
+
+
+class ModelMatrix(BaseModel, arbitrary_types_allowed=True):
+    # The whole model as arrays: one binary column per row of the selection table, the row blocks
+    # of all constraints and the objective to maximize. It is written as an MPS file and read by the
+    # solver in one go, instead of adding the rows one at a time through python-mip
+    column_names: list[str]
+    blocks: list[RowBlock] = []
+    objective: np.ndarray | None = None
+    # columns fixed at 0, for example by the presolve
+    fixed: np.ndarray | None = None
+
+    @property
+    def num_rows(self) -> int:
+        return sum(b.num_rows for b in self.blocks)
+
+    @property
+    def num_nz(self) -> int:
+        return sum(b.num_nz for b in self.blocks)
+
+    def add(self, block: RowBlock) -> None:
+        self.blocks.append(block)
+
+    def to_coo(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # row, column and coefficient of each nonzero, then the sense and rhs of each row
+        offsets = np.cumsum([0] + [b.num_rows for b in self.blocks])
+        row = np.concatenate([b.row + o for b, o in zip(self.blocks, offsets)] + [np.empty(0, dtype=np.int64)])
+        column = np.concatenate([b.column for b in self.blocks] + [np.empty(0, dtype=np.int64)])
+        coefficient = np.concatenate([b.coefficient for b in self.blocks] + [np.empty(0)])
+        sense = np.concatenate([np.full(b.num_rows, b.sense) for b in self.blocks] + [np.empty(0, dtype="<U2")])
+        rhs = np.concatenate([b.rhs for b in self.blocks] + [np.empty(0)])
+        return row, column, coefficient, sense, rhs
+
+    def restrict(self, columns: np.ndarray, fixed: np.ndarray) -> "ModelMatrix":
+        # The model over the given columns, with all other columns fixed at their value in fixed. Their part of
+        # each row moves to the rhs, the rows that do not have any of the columns are left out
+        position = np.full(len(self.column_names), -1, dtype=np.int64)
+        position[columns] = np.arange(len(columns))
+        blocks = []
+        for b in self.blocks:
+            inside = position[b.column] >= 0
+            outside = ~inside
+            fixed_part = np.bincount(
+                b.row[outside], weights=b.coefficient[outside] * fixed[b.column[outside]], minlength=b.num_rows
+            )
+            rows = np.unique(b.row[inside])
+            blocks.append(
+                RowBlock.create(
+                    row=np.searchsorted(rows, b.row[inside]),
+                    column=position[b.column[inside]],
+                    coefficient=b.coefficient[inside],
+                    sense=b.sense,
+                    rhs=(b.rhs - fixed_part)[rows],
+                    nb_rows=len(rows),
+                    names=[b.names[r] for r in rows.tolist()] if b.names is not None else None,
+                )
+            )
+        return ModelMatrix(
+            column_names=[self.column_names[c] for c in columns.tolist()],
+            blocks=blocks,
+            objective=self.objective[columns] if self.objective is not None else None,
+        )
+
+    def violated_rows(self, x: np.ndarray) -> int:
+        # number of rows that the values x of the columns do not satisfy
+        row, column, coefficient, sense, rhs = self.to_coo()
+        lhs = np.bincount(row, weights=coefficient * x[column], minlength=len(rhs))
+        violated = ((sense == "<=") & (lhs > rhs + 1e-9)) | ((sense == ">=") & (lhs < rhs - 1e-9))
+        violated |= (sense == "==") & (np.abs(lhs - rhs) > 1e-9)
+        return int(violated.sum())
+
+    def row_names(self, with_names: bool) -> list[str]:
+        # the names given by the blocks, or short generated ones when they are not needed for debugging
+        if not with_names:
+            return [f"r{i}" for i in range(self.num_rows)]
+        names = []
+        for b in self.blocks:
+            names += b.names if b.names is not None else [f"r{len(names) + i}" for i in range(b.num_rows)]
+        return names
+
+    def write_mps(self, path: str, with_names: bool = False) -> None:
+        row, column, coefficient, sense, rhs = self.to_coo()
+        names = self.row_names(with_names)
+        objective = self.objective if self.objective is not None else np.zeros(len(self.column_names))
+
+        # the COLUMNS section lists the nonzeros column by column, starting with the objective
+        column = np.concatenate([np.arange(len(self.column_names)), column])
+        row = np.concatenate([np.full(len(self.column_names), -1), row])
+        coefficient = np.concatenate([objective, coefficient])
+        order = np.lexsort((row, column))
+        row_name = names + ["OBJ"]
+
+        lines = ["NAME opti_scout", "ROWS", " N OBJ"]
+        lines += [f" {MPS_SENSE[s]} {n}" for s, n in zip(sense.tolist(), names)]
+        lines.append("COLUMNS")
+        lines += [
+            f" {self.column_names[c]} {row_name[r]} {v:.12g}"
+            for c, r, v in zip(column[order].tolist(), row[order].tolist(), coefficient[order].tolist())
+        ]
+        lines.append("RHS")
+        lines += [f" RHS {n} {v:.12g}" for n, v in zip(names, rhs.tolist()) if v != 0]
+        lines.append("BOUNDS")
+        fixed = self.fixed if self.fixed is not None else np.zeros(len(self.column_names), dtype=bool)
+        lines += [f" FX BND {n} 0" if f else f" BV BND {n}" for n, f in zip(self.column_names, fixed.tolist())]
+        lines.append("ENDATA")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+    def load(self, model: Model, path: str, with_names: bool = False) -> list[Var]:
+        # replaces the contents of model, the variables are returned in the order of the selection table
+        self.write_mps(path, with_names)
+        model.read(path)
+        model.sense = MAXIMIZE
+        return list(model.vars)
+
+
+class RowActivity(BaseModel, arbitrary_types_allowed=True):
+    # The left hand side of every row of a ModelMatrix for a 0/1 assignment of the columns. A change of some
+    # columns is checked against the rows of those columns only, so many small changes can be tried quickly
+    x: np.ndarray
+    lhs: np.ndarray
+    sense: np.ndarray
+    rhs: np.ndarray
+    objective: np.ndarray
+    # the nonzeros ordered by column, the ones of column c are at start[c]:start[c + 1]
+    start: np.ndarray
+    row: np.ndarray
+    coefficient: np.ndarray
+    nb_violated: int
+
+    @classmethod
+    def create(cls, matrix: ModelMatrix, x: np.ndarray) -> "RowActivity":
+        row, column, coefficient, sense, rhs = matrix.to_coo()
+        order = np.argsort(column, kind="stable")
+        start = np.concatenate([[0], np.cumsum(np.bincount(column, minlength=len(matrix.column_names)))])
+        lhs = np.bincount(row, weights=coefficient * x[column], minlength=len(rhs))
+        activity = cls(
+            x=x.astype(np.int8),
+            lhs=lhs,
+            sense=sense,
+            rhs=rhs,
+            objective=matrix.objective if matrix.objective is not None else np.zeros(len(matrix.column_names)),
+            start=start,
+            row=row[order],
+            coefficient=coefficient[order],
+            nb_violated=0,
+        )
+        activity.nb_violated = int(activity.violated(np.arange(len(rhs)), lhs).sum())
+        return activity
+
+    @property
+    def objective_value(self) -> float:
+        return float(self.objective @ self.x)
+
+    def violated(self, rows: np.ndarray, lhs: np.ndarray) -> np.ndarray:
+        sense, rhs = self.sense[rows], self.rhs[rows]
+        return (
+            ((sense == "<=") & (lhs > rhs + 1e-9))
+            | ((sense == ">=") & (lhs < rhs - 1e-9))
+            | ((sense == "==") & (np.abs(lhs - rhs) > 1e-9))
+        )
+
+    def try_change(self, columns: np.ndarray, values: np.ndarray) -> bool:
+        # sets the columns to values when that violates fewer rows, or as many rows with a better objective
+        delta = values.astype(np.int64) - self.x[columns]
+        changed = delta != 0
+        columns, delta = columns[changed], delta[changed]
+        if len(columns) == 0:
+            return False
+        counts = self.start[columns + 1] - self.start[columns]
+        nonzeros = np.repeat(self.start[columns] - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        rows, inverse = np.unique(self.row[nonzeros], return_inverse=True)
+        lhs = self.lhs[rows] + np.bincount(
+            inverse, weights=self.coefficient[nonzeros] * np.repeat(delta, counts), minlength=len(rows)
+        )
+        extra = int(self.violated(rows, lhs).sum()) - int(self.violated(rows, self.lhs[rows]).sum())
+        if extra > 0 or (extra == 0 and float(self.objective[columns] @ delta) <= 0):
+            return False
+        self.x[columns] += delta.astype(np.int8)
+        self.lhs[rows] = lhs
+        self.nb_violated += extra
+        return True
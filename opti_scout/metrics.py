@@ -0,0 +1,163 @@
+from pydantic import BaseModel
+from contextlib import contextmanager
+from typing import Callable
+import time
+import tracemalloc
+
+
+class PhaseMetrics(BaseModel):
+    name: str
+    seconds: float
+    # rows and nonzeros the phase added to the model
+    rows: int
+    nonzeros: int
+    # peak of the memory allocated by python during the phase, only when memory is traced
+    peak_memory_mb: float | None = None
+
+
+class PresolveReport(BaseModel):
+    rows_before: int
+    rows_after: int
+    nonzeros_before: int
+    nonzeros_after: int
+    # columns fixed at 0, rows dropped per constraint family as they can never bind, and pair rows dropped as
+    # another row covers them
+    fixed_columns: int
+    dropped_rows: dict[str, int] = {}
+    dominated_pairs: int = 0
+
+    def print(self) -> None:
+        print(
+            f"presolve: {self.rows_before} -> {self.rows_after} rows, "
+            f"{self.nonzeros_before} -> {self.nonzeros_after} nonzeros"
+        )
+        print(f"presolve: {self.fixed_columns} columns fixed at 0, {self.dominated_pairs} dominated pair rows dropped")
+        for family, count in self.dropped_rows.items():
+            print(f"presolve: {count} rows of {family} dropped")
+
+
+class ProgressEvent(BaseModel):
+    # "phase" when a phase of building or solving ends, "solver" for the progress of the search, and from the solve
+    # service "queued", "started", "extended", "done", "cancelled" and "failed" for the job
+    kind: str
+    job: str = ""
+    phase: PhaseMetrics | None = None
+    # best solution, best bound, nodes and seconds of the search, the objective is None before the first solution
+    objective: float | None = None
+    bound: float | None = None
+    nodes: int | None = None
+    seconds: float | None = None
+    message: str = ""
+
+    @property
+    def gap(self) -> float | None:
+        if self.objective is None or self.bound is None or self.bound == 0:
+            return None
+        return (self.bound - self.objective) / abs(self.bound)
+
+
+class BuildReport(BaseModel):
+    filename: str
+    nb_activities: int
+    nb_sessions: int
+    nb_groups: int
+    nb_selections: int
+    settings: dict[str, int | float | str | bool] = {}
+    phases: list[PhaseMetrics] = []
+    rows: int = 0
+    nonzeros: int = 0
+    build_seconds: float = 0.0
+    solve_seconds: float = 0.0
+    status: str | None = None
+    objective: float | None = None
+    # best bound of the solver, or the LP relaxation for the heuristic engine
+    bound: float | None = None
+    # nodes of the search and seconds until the solver found its first solution, when the solver reports them
+    nodes: int | None = None
+    first_feasible_seconds: float | None = None
+    presolve: PresolveReport | None = None
+    # rows of pairs of selections added while solving and the number of solves with conflictRows "rounds"
+    lazy_rows: int | None = None
+    lazy_rounds: int = 0
+    # improving solutions written to the incumbent snapshot with checkpointSeconds
+    checkpoints: int = 0
+
+    @contextmanager
+    def phase(self, name: str, counts: Callable[[], tuple[int, int]] | None, trace_memory: bool = False):
+        # times the body of the with statement and records what it added to the model,
+        # counts returns the current number of rows and nonzeros of the model, None when the phase
+        # does not change the model
+        rows, nonzeros = counts() if counts is not None else (0, 0)
+        started = trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        # a phase that raises is recorded as well, up to where it failed
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else None
+            if started:
+                tracemalloc.stop()
+            end_rows, end_nonzeros = counts() if counts is not None else (0, 0)
+            self.phases.append(
+                PhaseMetrics(
+                    name=name,
+                    seconds=seconds,
+                    rows=end_rows - rows,
+                    nonzeros=end_nonzeros - nonzeros,
+                    peak_memory_mb=peak,
+                )
+            )
+            if counts is not None:
+                self.rows = end_rows
+                self.nonzeros = end_nonzeros
+
+    @property
+    def gap(self) -> float | None:
+        # relative distance of the objective to the bound
+        if self.objective is None or self.bound is None or self.bound == 0:
+            return None
+        return (self.bound - self.objective) / abs(self.bound)
+
+    def get_phase(self, name: str) -> PhaseMetrics | None:
+        return next((p for p in self.phases if p.name == name), None)
+
+    def print(self) -> None:
+        print("filename: " + self.filename)
+        print("#Activities: " + str(self.nb_activities))
+        print("#Sessions: " + str(self.nb_sessions))
+        print("#Groups: " + str(self.nb_groups))
+        print("#selections: " + str(self.nb_selections))
+        for key, value in self.settings.items():
+            print(f"{key}: {value}")
+        print(f"{'phase':<50}{'seconds':>10}{'rows':>10}{'nonzeros':>12}{'peak MB':>10}")
+        for p in self.phases:
+            peak = f"{p.peak_memory_mb:.1f}" if p.peak_memory_mb is not None else "-"
+            print(f"{p.name:<50}{p.seconds:>10.2f}{p.rows:>10}{p.nonzeros:>12}{peak:>10}")
+        if self.presolve is not None:
+            self.presolve.print()
+        print("#rows: " + str(self.rows))
+        print("#nonzeros: " + str(self.nonzeros))
+        print(f"model build seconds: {self.build_seconds:.2f}")
+        if self.status is not None:
+            print(f"model solve seconds: {self.solve_seconds:.2f}")
+            print("status: " + self.status)
+            print("objective: " + str(self.objective))
+            if self.gap is not None:
+                print(f"bound: {self.bound} gap: {100 * self.gap:.2f}%")
+            if self.nodes is not None:
+                print(f"nodes: {self.nodes}")
+            if self.first_feasible_seconds is not None:
+                print(f"first solution after: {self.first_feasible_seconds:.2f} seconds")
+            if self.lazy_rows is not None:
+                print(f"lazy rows: {self.lazy_rows} in {self.lazy_rounds} rounds")
+            if self.checkpoints:
+                print(f"incumbent snapshots: {self.checkpoints}")
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.model_dump_json(indent=2))
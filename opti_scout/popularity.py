@@ -0,0 +1,125 @@
+from pydantic import BaseModel
+import numpy as np
+import pandas as pd
+
+# Demand against capacity for every activity and every session of a camp. An activity is asked for by the groups that
+# have it among their priorities, a session by the groups that ask for its activity and are available at the time of
+# the session, the rows of the selection table. Demand is counted in groups, in scouts and in scouts without leaders
+
+# capacityratio: the activities with fewer scouts asking per seat than the threshold,
+# groupcount: the activities most groups ask for
+POPULAR_METHODS = ["capacityratio", "groupcount"]
+
+
+class Popularity(BaseModel, arbitrary_types_allowed=True):
+    # per activity, in the order of the activities of the problem
+    activity_id: np.ndarray
+    activity_capacity: np.ndarray
+    activity_groups: np.ndarray
+    activity_scouts: np.ndarray
+    activity_scouts_without_leaders: np.ndarray
+    # position of the first priority that asks for the activity, the number of priorities when none does
+    activity_first_asked: np.ndarray
+    # per session, in the order of the sessions of the problem
+    session_id: np.ndarray
+    session_activity: np.ndarray
+    session_capacity: np.ndarray
+    session_groups: np.ndarray
+    session_scouts: np.ndarray
+    session_scouts_without_leaders: np.ndarray
+
+    @classmethod
+    def build(
+        cls,
+        activity_id: np.ndarray,
+        session_id: np.ndarray,
+        session_activity: np.ndarray,
+        session_capacity: np.ndarray,
+        group_size: np.ndarray,
+        group_size_without_leaders: np.ndarray,
+        priority_group: np.ndarray,
+        priority_activity: np.ndarray,
+        selection_group: np.ndarray,
+        selection_session: np.ndarray,
+    ) -> "Popularity":
+        # the priorities are the distinct (group, activity) pairs asked for, the selections the rows of the table
+        nb_activities = len(activity_id)
+        nb_sessions = len(session_id)
+        first_asked = np.full(nb_activities, len(priority_activity), dtype=np.int64)
+        asked, first = np.unique(priority_activity, return_index=True)
+        first_asked[asked] = first
+        return cls(
+            activity_id=activity_id,
+            activity_capacity=np.bincount(session_activity, weights=session_capacity, minlength=nb_activities),
+            activity_groups=np.bincount(priority_activity, minlength=nb_activities),
+            activity_scouts=np.bincount(priority_activity, weights=group_size[priority_group], minlength=nb_activities),
+            activity_scouts_without_leaders=np.bincount(
+                priority_activity, weights=group_size_without_leaders[priority_group], minlength=nb_activities
+            ),
+            activity_first_asked=first_asked,
+            session_id=session_id,
+            session_activity=session_activity,
+            session_capacity=session_capacity,
+            session_groups=np.bincount(selection_session, minlength=nb_sessions),
+            session_scouts=np.bincount(selection_session, weights=group_size[selection_group], minlength=nb_sessions),
+            session_scouts_without_leaders=np.bincount(
+                selection_session, weights=group_size_without_leaders[selection_group], minlength=nb_sessions
+            ),
+        )
+
+    def activity_ratio(self) -> np.ndarray:
+        # scouts asking per seat, nan for the activities without seats or without scouts asking
+        ratio = np.full(len(self.activity_id), np.nan)
+        defined = (self.activity_capacity > 0) & (self.activity_scouts > 0)
+        ratio[defined] = self.activity_scouts[defined] / self.activity_capacity[defined]
+        return ratio
+
+    def session_ratio(self) -> np.ndarray:
+        ratio = np.full(len(self.session_id), np.nan)
+        defined = (self.session_capacity > 0) & (self.session_scouts > 0)
+        ratio[defined] = self.session_scouts[defined] / self.session_capacity[defined]
+        return ratio
+
+    def capacity_ratios(self) -> dict[str, float]:
+        ratio = self.activity_ratio()
+        defined = np.flatnonzero(~np.isnan(ratio))
+        return dict(zip(self.activity_id[defined].tolist(), ratio[defined].tolist()))
+
+    def popular(self, method: str = "capacityratio", threshold: float = 0.02, nb_most_common: int = 5) -> np.ndarray:
+        # True for the popular activities, with groupcount a tie goes to the activity asked for first in the
+        # priorities, as with Counter.most_common
+        if method == "capacityratio":
+            with np.errstate(invalid="ignore"):
+                return self.activity_ratio() < threshold
+        if method == "groupcount":
+            popular = np.zeros(len(self.activity_id), dtype=bool)
+            asked = np.flatnonzero(self.activity_groups > 0)
+            order = np.lexsort((self.activity_first_asked[asked], -self.activity_groups[asked]))
+            popular[asked[order[:nb_most_common]]] = True
+            return popular
+        raise ValueError(f"Unknown popular method '{method}', use {', '.join(POPULAR_METHODS)}")
+
+    def activity_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "Activityid": self.activity_id,
+                "Capacity": self.activity_capacity.astype(np.int64),
+                "Groups": self.activity_groups,
+                "Scouts": self.activity_scouts.astype(np.int64),
+                "Scouts_without_leaders": self.activity_scouts_without_leaders.astype(np.int64),
+                "Ratio": self.activity_ratio(),
+            }
+        )
+
+    def session_dataframe(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "Sessionid": self.session_id,
+                "Activityid": self.activity_id[self.session_activity],
+                "Capacity": self.session_capacity,
+                "Groups": self.session_groups,
+                "Scouts": self.session_scouts.astype(np.int64),
+                "Scouts_without_leaders": self.session_scouts_without_leaders.astype(np.int64),
+                "Ratio": self.session_ratio(),
+            }
+        )
@@ -0,0 +1,125 @@
+from opti_scout.matrix import ModelMatrix, RowBlock
+from opti_scout.metrics import PresolveReport
+import numpy as np
+
+# Reductions of the model before it is handed to the solver. All columns are binary and the rows of the builder
+# have nonnegative coefficients, so the largest left hand side of a row is the sum of its coefficients and the
+# smallest is 0. On that basis the presolve
+# - fixes at 0 the columns that would break a <= row on their own, for example a group larger than a session
+# - drops the <= rows that hold even with all their columns at 1, such as capacities that fit every candidate group,
+#   max sessions above the number of candidates or the one session rows of activities with one candidate session,
+#   and the >= rows that hold with all columns at 0, such as min sessions of 0
+# - drops the rows x + y <= 1 of pairs that are inside another row of coefficients 1 and rhs 1, such as the pairs
+#   of overlapping sessions of one activity next to its one session row, and all but one of equal pair rows
+# until nothing changes. Infeasible rows are kept so the solver reports them
+
+# rows longer than this are not expanded into their pairs, the number of pairs grows with the square of the length
+MAX_PACKING_ROW = 64
+
+
+def presolve(matrix: ModelMatrix, row_family: np.ndarray, families: list[str]) -> PresolveReport:
+    # Reduces matrix in place. row_family is the position in families of the constraint family of each row,
+    # the report counts the dropped rows per family
+    row, column, coefficient, sense, rhs = matrix.to_coo()
+    nb_columns = len(matrix.column_names)
+    report = PresolveReport(
+        rows_before=len(rhs), rows_after=len(rhs), nonzeros_before=len(row), nonzeros_after=len(row), fixed_columns=0
+    )
+    if np.any(coefficient < 0):
+        print("presolve skipped, the model has negative coefficients")
+        return report
+
+    fixed = matrix.fixed.copy() if matrix.fixed is not None else np.zeros(nb_columns, dtype=bool)
+    dropped = np.zeros(len(rhs), dtype=bool)
+    dominated = np.zeros(len(rhs), dtype=bool)
+    while True:
+        live = ~fixed[column] & ~dropped[row]
+        # columns that alone exceed the rhs of a <= row
+        too_large = live & (sense[row] == "<=") & (coefficient > rhs[row] + 1e-9)
+        newly_fixed = np.zeros(nb_columns, dtype=bool)
+        newly_fixed[column[too_large]] = True
+        newly_fixed &= ~fixed
+        fixed |= newly_fixed
+        live &= ~fixed[column]
+
+        largest = np.bincount(row[live], weights=coefficient[live], minlength=len(rhs))
+        never_binding = ((sense == "<=") & (largest <= rhs + 1e-9)) | ((sense == ">=") & (rhs <= 1e-9))
+        newly_dropped = never_binding & ~dropped
+        dropped |= newly_dropped
+
+        newly_dominated = dominated_pairs(row, column, coefficient, sense, rhs, live & ~dropped[row], nb_columns)
+        dominated |= newly_dominated
+        dropped |= newly_dominated
+        if not (newly_fixed.any() or newly_dropped.any() or newly_dominated.any()):
+            break
+
+    for r in np.flatnonzero(dropped & ~dominated).tolist():
+        name = families[row_family[r]]
+        report.dropped_rows[name] = report.dropped_rows.get(name, 0) + 1
+    report.dominated_pairs = int(dominated.sum())
+    report.fixed_columns = int(fixed.sum())
+
+    # the blocks again without the dropped rows and without the nonzeros of the fixed columns
+    offset = 0
+    blocks = []
+    for b in matrix.blocks:
+        kept_rows = np.flatnonzero(~dropped[offset : offset + b.num_rows])
+        position = np.full(b.num_rows, -1, dtype=np.int64)
+        position[kept_rows] = np.arange(len(kept_rows))
+        kept = (position[b.row] >= 0) & ~fixed[b.column]
+        blocks.append(
+            RowBlock.create(
+                row=position[b.row[kept]],
+                column=b.column[kept],
+                coefficient=b.coefficient[kept],
+                sense=b.sense,
+                rhs=b.rhs[kept_rows],
+                nb_rows=len(kept_rows),
+                names=[b.names[r] for r in kept_rows.tolist()] if b.names is not None else None,
+            )
+        )
+        offset += b.num_rows
+    matrix.blocks = blocks
+    matrix.fixed = fixed
+    report.rows_after = matrix.num_rows
+    report.nonzeros_after = matrix.num_nz
+    return report
+
+
+def dominated_pairs(
+    row: np.ndarray,
+    column: np.ndarray,
+    coefficient: np.ndarray,
+    sense: np.ndarray,
+    rhs: np.ndarray,
+    live: np.ndarray,
+    nb_columns: int,
+) -> np.ndarray:
+    # the pair rows x + y <= 1 that another row of coefficients 1 and rhs 1 already covers, counting live nonzeros
+    nb_rows = len(rhs)
+    length = np.bincount(row[live], minlength=nb_rows)
+    ones = np.bincount(row[live], weights=coefficient[live] == 1, minlength=nb_rows) == length
+    packing = (sense == "<=") & (np.abs(rhs - 1) <= 1e-9) & ones & (length >= 2)
+    selected = live & packing[row]
+    order = np.lexsort((column[selected], row[selected]))
+    packing_row, packing_column = row[selected][order], column[selected][order]
+    starts = np.concatenate([[0], np.cumsum(np.bincount(packing_row, minlength=nb_rows))])
+
+    # every pair of the longer rows, as the key smaller column * nb_columns + larger column
+    covered = []
+    for r in np.flatnonzero(packing & (length > 2) & (length <= MAX_PACKING_ROW)).tolist():
+        columns = packing_column[starts[r] : starts[r + 1]]
+        first, second = np.triu_indices(len(columns), k=1)
+        covered.append(columns[first] * nb_columns + columns[second])
+    covered = np.unique(np.concatenate(covered + [np.empty(0, dtype=np.int64)]))
+
+    pair_rows = np.flatnonzero(packing & (length == 2))
+    pair_keys = packing_column[starts[pair_rows]] * nb_columns + packing_column[starts[pair_rows] + 1]
+    result = np.zeros(nb_rows, dtype=bool)
+    result[pair_rows[np.isin(pair_keys, covered)]] = True
+    # of equal pair rows the first one stays
+    _, first = np.unique(pair_keys, return_index=True)
+    duplicate = np.ones(len(pair_rows), dtype=bool)
+    duplicate[first] = False
+    result[pair_rows[duplicate]] = True
+    return result
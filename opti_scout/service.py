@@ -0,0 +1,246 @@
+from opti_scout.classes import AssigningActivititesProblem, Solution
+from opti_scout.build_model import ModelBuilder
+from opti_scout.metrics import BuildReport, ProgressEvent
+from opti_scout.solver import SolverConfig
+from mip import OptimizationStatus
+from typing import AsyncIterator
+import asyncio
+import contextlib
+import itertools
+import multiprocessing
+import queue
+import traceback
+import numpy as np
+
+# Builds and solves camps in worker processes for an asyncio application, such as a user interface showing the
+# progress of several camp runs at the same time. Every job streams its progress events, can be cancelled and can be
+# given more time, and ends with its Solution.
+# The solver cannot be stopped or given more time while it runs. Cancelling ends the worker process, the job then
+# has no solution. More time continues the search from the best solution once the solver stops at its time limit
+
+# events of the end of a job
+FINAL_EVENTS = ["done", "cancelled", "failed"]
+
+
+def run_job(
+    job: str,
+    problem: AssigningActivititesProblem,
+    settings: dict,
+    solver_config: SolverConfig,
+    filename: str,
+    events: multiprocessing.Queue,
+    commands: multiprocessing.Queue,
+) -> None:
+    # the worker process, the messages to the service are ("event", ProgressEvent) and at the end
+    # ("result", assigned, status, report) or ("error", traceback). What the builder prints goes to filename + ".log"
+    with open(filename + ".log", "w", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        solve_job(job, problem, settings, solver_config, filename, events, commands)
+
+
+def solve_job(
+    job: str,
+    problem: AssigningActivititesProblem,
+    settings: dict,
+    solver_config: SolverConfig,
+    filename: str,
+    events: multiprocessing.Queue,
+    commands: multiprocessing.Queue,
+) -> None:
+    try:
+        model_builder = ModelBuilder.create(problem, solver_config)
+        model_builder.model.verbose = 0
+        for name, value in settings.items():
+            setattr(model_builder, name, value)
+        model_builder.progress = lambda event: events.put(("event", event.model_copy(update={"job": job})))
+        solution = model_builder.solve(filename)
+
+        # the seconds asked for while solving, only a search stopped by its time limit is continued
+        while model_builder.engine == "mip" and solution.status == OptimizationStatus.FEASIBLE:
+            seconds = 0
+            while True:
+                try:
+                    seconds += commands.get_nowait()
+                except queue.Empty:
+                    break
+            if seconds <= 0:
+                break
+            events.put(("event", ProgressEvent(kind="extended", job=job, seconds=seconds)))
+            model_builder.maxSolveSeconds = seconds
+            model_builder.warmStart = solution
+            # the report of the extended search keeps the build and the earlier solves
+            previous = model_builder.report
+            report = model_builder.new_report(filename)
+            report.phases = previous.phases
+            report.rows, report.nonzeros = previous.rows, previous.nonzeros
+            report.build_seconds = previous.build_seconds
+            report.presolve = previous.presolve
+            solution = model_builder.optimize(model_builder.variables, filename)
+        events.put(("result", solution.assigned, solution.status, solution.report))
+    except Exception:
+        events.put(("error", traceback.format_exc()))
+
+
+class SolveJob:
+    def __init__(
+        self,
+        job: str,
+        problem: AssigningActivititesProblem,
+        filename: str,
+        settings: dict,
+        solver_config: SolverConfig,
+        context,
+    ):
+        self.job = job
+        self.problem = problem
+        self.filename = filename
+        self.settings = settings
+        self.solver_config = solver_config
+        # "queued", "running", "done", "cancelled" or "failed"
+        self.state = "queued"
+        # the last progress of the search
+        self.latest: ProgressEvent | None = None
+        self.process = None
+        self.task: asyncio.Task | None = None
+        self.extra_seconds = 0
+        self.context = context
+        self.event_queue = context.Queue()
+        self.command_queue = context.Queue()
+        self.events_out: asyncio.Queue[ProgressEvent] = asyncio.Queue()
+        self.solution: asyncio.Future[Solution] = asyncio.get_running_loop().create_future()
+
+    async def events(self) -> AsyncIterator[ProgressEvent]:
+        # the progress events of the job up to the one of its end
+        while True:
+            event = await self.events_out.get()
+            yield event
+            if event.kind in FINAL_EVENTS:
+                return
+
+    async def result(self) -> Solution:
+        # the final solution, raises asyncio.CancelledError for a cancelled job and RuntimeError for a failed one
+        return await self.solution
+
+    def extend(self, seconds: int) -> None:
+        # more seconds for the solver, before it starts they are added to its time limit
+        if self.state == "queued":
+            self.extra_seconds += seconds
+        elif self.state == "running":
+            self.command_queue.put(seconds)
+
+    async def cancel(self) -> None:
+        # the job ends before its worker is joined, so the worker is no longer polled for messages
+        if self.state in FINAL_EVENTS:
+            return
+        if self.process is not None:
+            self.process.terminate()
+        self.finish("cancelled")
+        self.solution.cancel()
+        if self.process is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.process.join)
+
+    def emit(self, event: ProgressEvent) -> None:
+        if event.kind == "solver":
+            self.latest = event
+        self.events_out.put_nowait(event)
+
+    def finish(self, state: str, message: str = "") -> None:
+        self.state = state
+        self.emit(ProgressEvent(kind=state, job=self.job, message=message))
+
+    def start(self) -> None:
+        settings = self.settings | {"maxSolveSeconds": self.settings.get("maxSolveSeconds", 300) + self.extra_seconds}
+        self.process = self.context.Process(
+            target=run_job,
+            args=(
+                self.job,
+                self.problem,
+                settings,
+                self.solver_config,
+                self.filename,
+                self.event_queue,
+                self.command_queue,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        self.state = "running"
+        self.emit(ProgressEvent(kind="started", job=self.job))
+
+    def receive(self) -> bool:
+        # passes on the messages of the worker, True once the job has ended
+        while self.state == "running":
+            try:
+                message = self.event_queue.get_nowait()
+            except queue.Empty:
+                if not self.process.is_alive() and self.event_queue.empty():
+                    self.finish("failed", f"worker ended with exit code {self.process.exitcode}")
+                    self.solution.set_exception(RuntimeError(f"Job {self.job} ended without a solution"))
+                break
+            if message[0] == "event":
+                self.emit(message[1])
+            elif message[0] == "result":
+                _, assigned, status, report = message
+                self.set_result(assigned, status, report)
+            else:
+                self.finish("failed", message[1])
+                self.solution.set_exception(RuntimeError(f"Job {self.job} failed:\n{message[1]}"))
+        return self.state != "running"
+
+    def set_result(self, assigned: np.ndarray, status: OptimizationStatus, report: BuildReport) -> None:
+        solution = Solution(problem=self.problem, assigned=assigned, status=status, report=report)
+        self.finish("done")
+        self.solution.set_result(solution)
+
+
+class SolveService:
+    # at most workers jobs run at the same time, the others wait in the order they were submitted
+    def __init__(self, workers: int = 1, poll_seconds: float = 0.2):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        # spawned workers do not inherit the threads and the event loop of the application
+        self.context = multiprocessing.get_context("spawn")
+        self.jobs: dict[str, SolveJob] = {}
+        self.counter = itertools.count(1)
+        self.semaphore: asyncio.Semaphore | None = None
+
+    def submit(
+        self,
+        problem: AssigningActivititesProblem,
+        filename: str,
+        settings: dict | None = None,
+        solver_config: SolverConfig | None = None,
+    ) -> SolveJob:
+        # Settings are fields of ModelBuilder, such as maxSolveSeconds or noOverlapMode. Must be called from a
+        # running event loop, the job runs as a task of it
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.workers)
+        job = SolveJob(
+            f"job{next(self.counter)}", problem, filename, settings or {}, solver_config or SolverConfig(), self.context
+        )
+        self.jobs[job.job] = job
+        job.emit(ProgressEvent(kind="queued", job=job.job))
+        # kept with the job, the event loop only keeps a weak reference to its tasks
+        job.task = asyncio.get_running_loop().create_task(self.run(job))
+        return job
+
+    async def run(self, job: SolveJob) -> None:
+        async with self.semaphore:
+            if job.state != "queued":
+                return
+            try:
+                job.start()
+            except Exception as error:
+                job.finish("failed", str(error))
+                job.solution.set_exception(error)
+                return
+            while not job.receive():
+                await asyncio.sleep(self.poll_seconds)
+            # the worker ends after its last message, joined before its place goes to the next job
+            await asyncio.get_running_loop().run_in_executor(None, job.process.join)
+
+    async def solve(self, problem: AssigningActivititesProblem, filename: str, **settings) -> Solution:
+        # submits a job and waits for its solution
+        return await self.submit(problem, filename, settings).result()
+
+    async def cancel_all(self) -> None:
+        await asyncio.gather(*(job.cancel() for job in self.jobs.values()))
@@ -0,0 +1,171 @@
+from opti_scout.metrics import ProgressEvent
+from pydantic import BaseModel
+from mip import INT_MAX, Model, SearchEmphasis
+from contextlib import contextmanager
+from typing import Callable
+import ctypes
+import os
+import re
+import sys
+import threading
+
+# solver_name of python-mip for each backend, HiGHS needs the highspy package, pip install opti_scout[highs]
+BACKENDS = {"cbc": "CBC", "highs": "HIGHS"}
+
+# the messages of CBC with the time of a new solution and the number of nodes of the search
+SOLUTION_MESSAGE = re.compile(r"Integer solution of \S+ found .*\((\d+(?:\.\d*)?) seconds\)")
+NODES_MESSAGE = re.compile(r"Enumerated nodes:\s*(\d+)")
+# The progress of the search, the lines of the branch and bound table with nodes, on tree, depth, best solution,
+# method, best bound, gap and seconds, and the messages of CBC with the nodes, the best solution, the best bound and
+# the seconds. The messages give the objective of the minimization CBC solves, the negative of the priorities
+PROGRESS_ROW = re.compile(r"^\W*(\d+)\s+\d+\s+\d+\s+(\S+)\s+(?:[A-Za-z]\S*\s+)?(\S+)\s+\S+%\s+(\S+)\s*$")
+PROGRESS_MESSAGE = re.compile(
+    r"Cbc0010I After (\d+) nodes, \d+ on tree, (\S+) best solution, best possible (\S+) \((\S+) seconds\)"
+)
+# the best solution in the table before the first solution is found
+NO_SOLUTION = 1e49
+
+
+class SolverConfig(BaseModel):
+    # "cbc" or "highs", both solve the same model, written and read as MPS with matrix assembly
+    backend: str = "cbc"
+    # 0 lets the solver decide, -1 uses all cores
+    threads: int = 0
+    # cut generation -1 automatic, 0 off, 1 moderate, 2 and 3 more aggressive
+    cuts: int = -1
+    # preprocessing -1 automatic, 0 off, 1 on
+    preprocess: int = -1
+    # 0 balanced, 1 find feasible solutions fast, 2 prove optimality
+    emphasis: int = 0
+    # stop once the objective is within this relative gap of the bound
+    maxMipGap: float = 1e-4
+    maxNodes: int | None = None
+    # Write the output of the solver to <filename>_solver.log, the number of nodes and the time to the first
+    # solution are read from it. The output of a verbose model is then only shown once the solver is done. The log is
+    # also written when the model builder has a progress listener, which follows it
+    solverLog: bool = False
+
+    def create_model(self) -> Model:
+        if self.backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{self.backend}', use 'cbc' or 'highs'")
+        return Model(solver_name=BACKENDS[self.backend])
+
+    def uses(self, model: Model) -> bool:
+        return model.solver_name.upper() == BACKENDS.get(self.backend)
+
+    def apply(self, model: Model) -> None:
+        model.threads = self.threads
+        model.cuts = self.cuts
+        model.preprocess = self.preprocess
+        model.emphasis = SearchEmphasis(self.emphasis)
+        model.max_mip_gap = self.maxMipGap
+
+    def settings(self) -> dict[str, int | float | str]:
+        return {
+            "backend": self.backend,
+            "threads": self.threads,
+            "cuts": self.cuts,
+            "preprocess": self.preprocess,
+            "emphasis": self.emphasis,
+            "maxMipGap": self.maxMipGap,
+            "maxNodes": self.maxNodes if self.maxNodes is not None else INT_MAX,
+        }
+
+
+@contextmanager
+def captured_output(path: str):
+    # The solvers print from C to the file descriptor of stdout, past sys.stdout, so the descriptor itself is
+    # pointed to path. The C buffers are flushed before it is pointed back, where the C library can be found
+    sys.stdout.flush()
+    saved = os.dup(1)
+    with open(path, "wb") as file:
+        os.dup2(file.fileno(), 1)
+        try:
+            yield
+        finally:
+            try:
+                ctypes.CDLL(None).fflush(None)
+            except (OSError, TypeError):
+                pass
+            os.dup2(saved, 1)
+            os.close(saved)
+
+
+def parse_solver_log(text: str) -> tuple[int | None, float | None]:
+    # the number of nodes and the seconds to the first solution in the output of CBC, None when not in it
+    nodes = NODES_MESSAGE.search(text)
+    solution = SOLUTION_MESSAGE.search(text)
+    return (
+        int(nodes.group(1)) if nodes is not None else None,
+        float(solution.group(1)) if solution is not None else None,
+    )
+
+
+def parse_progress_line(line: str) -> ProgressEvent | None:
+    # the solver progress of a line of the output of CBC, None for the other lines
+    row = PROGRESS_ROW.match(line)
+    message = PROGRESS_MESSAGE.search(line)
+    try:
+        if row is not None:
+            nodes, objective, bound, seconds = int(row[1]), float(row[2]), float(row[3]), float(row[4])
+        elif message is not None:
+            nodes, seconds = int(message[1]), float(message[4])
+            objective, bound = -float(message[2]), -float(message[3])
+        else:
+            return None
+    except ValueError:
+        return None
+    if abs(objective) >= NO_SOLUTION:
+        objective = None
+    return ProgressEvent(kind="solver", nodes=nodes, objective=objective, bound=bound, seconds=seconds)
+
+
+@contextmanager
+def followed_log(path: str, listener: Callable[[ProgressEvent], None], interval: float = 1.0):
+    # Reads the log at path while the body runs and gives listener the progress of the new lines of the branch and
+    # bound that change it. The C buffers of the solver are flushed every interval, as stdout is fully buffered when
+    # it is a file
+    stop = threading.Event()
+
+    def follow() -> None:
+        position = 0
+        rest = ""
+        last = None
+        while True:
+            stopped = stop.wait(interval)
+            try:
+                ctypes.CDLL(None).fflush(None)
+            except (OSError, TypeError):
+                pass
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8", errors="replace") as file:
+                    file.seek(position)
+                    text = rest + file.read()
+                    position = file.tell()
+                lines = text.split("\n")
+                rest = lines.pop()
+                for line in lines:
+                    event = parse_progress_line(line)
+                    if event is not None and (event.nodes, event.objective, event.bound) != last:
+                        last = (event.nodes, event.objective, event.bound)
+                        listener(event)
+            if stopped:
+                return
+
+    thread = threading.Thread(target=follow, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def highs_node_count(model: Model) -> int | None:
+    # HiGHS keeps the number of nodes in its info values
+    from mip.highs import ffi
+
+    value = ffi.new("int64_t*")
+    if model.solver._lib.Highs_getInt64InfoValue(model.solver._model, b"mip_node_count", value) != 0:
+        return None
+    return int(value[0])
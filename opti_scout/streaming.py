@@ -0,0 +1,89 @@
+from typing import Iterator, TextIO
+import json
+
+# Reads the top level object of a json file piece by piece. The items of its arrays are decoded one at a time with
+# the raw_decode of the json module, so a large registration export is never in memory as a whole, only the part of
+# the file that is read but not yet decoded
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE = " \t\n\r"
+
+
+class JsonStream:
+    def __init__(self, file: TextIO, chunk_size: int = CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+
+    def read(self) -> bool:
+        # appends the next chunk to what is left of the buffer, False at the end of the file
+        if self.eof:
+            return False
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.position :] + chunk
+        self.position = 0
+        self.eof = len(chunk) == 0
+        return not self.eof
+
+    def peek(self) -> str:
+        # the next character that is not whitespace, "" at the end of the file
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer) or not self.read():
+                return self.buffer[self.position : self.position + 1]
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if character == "" or character not in characters:
+            raise json.JSONDecodeError(f"Expecting one of '{characters}'", self.buffer, self.position)
+        self.position += 1
+        return character
+
+    def value(self):
+        # A value that ends at the end of the buffer may continue in the next chunk, a number for example,
+        # so it is only taken once more of the file is read or the file has ended
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self.read()
+
+    def items(self) -> Iterator[tuple[str, object]]:
+        # (key, item) for every item of the arrays of the top level object and (key, value) for its other values
+        self.expect("{")
+        if self.peek() == "}":
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError("Expecting a key", self.buffer, self.position)
+            self.expect(":")
+            if self.peek() == "[":
+                self.position += 1
+                if self.peek() == "]":
+                    self.position += 1
+                else:
+                    while True:
+                        yield key, self.value()
+                        if self.expect(",]") == "]":
+                            break
+            else:
+                yield key, self.value()
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_json_items(file_name: str, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple[str, object]]:
+    with open(file_name, "r", encoding="utf-8") as file:
+        yield from JsonStream(file, chunk_size).items()
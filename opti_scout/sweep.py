@@ -0,0 +1,129 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.build_model import ModelBuilder
+from opti_scout.solver import SolverConfig
+from pydantic import BaseModel
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import os
+import time
+import numpy as np
+import pandas as pd
+
+
+class Scenario(BaseModel):
+    minSessionsPerGroup: int = 0
+    maxSessionsPerGroup: int = 100
+    maxPopularActivities: int = 10
+    maxSolveSeconds: int = 300
+    # capacity ratio below which an activity counts as popular, None keeps the popular activities of the problem
+    popularThreshold: float | None = None
+
+    @property
+    def name(self) -> str:
+        name = f"mi{self.minSessionsPerGroup}mx{self.maxSessionsPerGroup}po{self.maxPopularActivities}"
+        return name + (f"th{self.popularThreshold:g}" if self.popularThreshold is not None else "")
+
+
+class ScenarioResult(BaseModel):
+    scenario: Scenario
+    status: str
+    objective: float | None
+    bound: float | None
+    # assigned selections, share of the prioritized activities with a session in the groups available time that
+    # were assigned, and groups with at least one activity
+    fulfilled: int
+    fulfilled_share: float
+    groups_with_activity: int
+    nb_popular_activities: int
+    seconds: float
+
+
+# the problem of the sweep, set once in every worker process instead of being sent with every scenario
+worker_problem: AssigningActivititesProblem | None = None
+
+
+def init_worker(problem: AssigningActivititesProblem) -> None:
+    global worker_problem
+    worker_problem = problem
+
+
+def run_scenario(
+    scenario: Scenario, settings: dict[str, str], solver_config: SolverConfig, directory: str
+) -> ScenarioResult:
+    problem = worker_problem
+    if scenario.popularThreshold is not None:
+        problem = problem.with_popular_threshold(scenario.popularThreshold)
+
+    starttime = time.perf_counter()
+    model_builder = ModelBuilder.create(problem, solver_config)
+    model_builder.model.verbose = 0
+    model_builder.minSessionsPerGroup = scenario.minSessionsPerGroup
+    model_builder.maxSessionsPerGroup = scenario.maxSessionsPerGroup
+    model_builder.maxPopularActivities = scenario.maxPopularActivities
+    model_builder.maxSolveSeconds = scenario.maxSolveSeconds
+    model_builder.noOverlapMode = settings["noOverlapMode"]
+    model_builder.assembly = settings["assembly"]
+    model_builder.engine = settings["engine"]
+    solution = model_builder.solve(os.path.join(directory, scenario.name))
+
+    assigned = solution.assigned.astype(bool)
+    groups = np.unique(problem.selection_table.group[assigned])
+    nb_requests = len(problem.get_selection_index().by_group_activity)
+    return ScenarioResult(
+        scenario=scenario,
+        status=solution.report.status,
+        objective=solution.report.objective,
+        bound=solution.report.bound,
+        fulfilled=int(assigned.sum()),
+        fulfilled_share=assigned.sum() / nb_requests if nb_requests > 0 else 0.0,
+        groups_with_activity=len(groups),
+        nb_popular_activities=len(problem.popularactivities),
+        seconds=time.perf_counter() - starttime,
+    )
+
+
+class Sweep(BaseModel, arbitrary_types_allowed=True):
+    # Solves one problem for a list of scenarios of the builder settings, side by side in worker processes
+    problem: AssigningActivititesProblem
+    scenarios: list[Scenario]
+    noOverlapMode: str = "clique"
+    assembly: str = "matrix"
+    # "mip" or "heuristic", the decomposition engine starts processes of its own
+    engine: str = "mip"
+    workers: int | None = None
+    # the scenarios run side by side, one solver thread each
+    solverConfig: SolverConfig = SolverConfig(threads=1)
+    results: list[ScenarioResult] = []
+
+    @classmethod
+    def grid(cls, problem: AssigningActivititesProblem, **values: list) -> "Sweep":
+        # all combinations of the given values of the Scenario fields, for example maxPopularActivities=[1, 2]
+        names = list(values)
+        scenarios = [Scenario(**dict(zip(names, combination))) for combination in itertools.product(*values.values())]
+        return cls(problem=problem, scenarios=scenarios)
+
+    def run(self, directory: str) -> pd.DataFrame:
+        # the model files of the scenarios are written to directory
+        if self.engine not in ["mip", "heuristic"]:
+            raise ValueError(f"Unknown engine '{self.engine}' for a sweep, use 'mip' or 'heuristic'")
+        # built here so the workers get the index with the problem
+        self.problem.get_selection_index()
+        settings = {"noOverlapMode": self.noOverlapMode, "assembly": self.assembly, "engine": self.engine}
+        workers = min(self.workers or os.cpu_count(), len(self.scenarios))
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(self.problem,)) as pool:
+            futures = [pool.submit(run_scenario, s, settings, self.solverConfig, directory) for s in self.scenarios]
+            self.results = []
+            for future in futures:
+                self.results.append(future.result())
+                print(f"scenario {self.results[-1].scenario.name}: {self.results[-1].status}")
+        return self.to_dataframe()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        data = [
+            {"scenario": r.scenario.name} | r.scenario.model_dump() | r.model_dump(exclude={"scenario"})
+            for r in self.results
+        ]
+        return pd.DataFrame(data=data)
+
+    def to_excel(self, filename: str) -> None:
+        self.to_dataframe().to_excel(filename, sheet_name="sweep", index=False)
@@ -20,11 +20,25 @@ modelrunsecs=3600
 maxsessions=1
 minsessions=0
 maxpopular=1
+#"pairwise" for one row per overlapping pair of sessions, "clique" for one row per set of sessions running at the same time, fewer rows on large camps
+nooverlapmode="pairwise"
+#"expression" adds the rows one by one, "matrix" collects them as arrays and loads them in bulk, faster on large camps
+assembly="expression"
+#True to start the solver from a greedy assignment, or set model_builder.warmStart to an earlier solution with Solution.from_excel(assign_activity_problem, resultname)
+warmstart=False
+#"mip", "heuristic" for a quick plan from greedy assignment and local search, or "decomposition" to solve per day in parallel
+engine="mip"
+#True to write the seconds, rows and memory of every phase of the build as <modelfilename>_metrics.json
+writemetrics=False
+#a directory such as "../opti_scout/tests/snapshots/" keeps the loaded camp and reads it back on the next run as long as the json file and the popular threshold are unchanged, None to always load the json
+snapshotdirectory=None
+#a directory such as "../opti_scout/tests/modelfiles/cache/" keeps the built models and reads them back when the camp and the settings are unchanged, None to always build the model
+modelcache=None
 
 optionalSuffix="_mi"+str(minsessions)+"mx"+str(maxsessions)+"po"+str(maxpopular)
 #optionalSuffix=""
 
-assign_activity_problem =  AssigningActivititesProblem.from_json("../opti_scout/tests/data/"+filename+".json")
+assign_activity_problem =  AssigningActivititesProblem.from_json("../opti_scout/tests/data/"+filename+".json", snapshot_directory=snapshotdirectory)
 
 assign_activity_problem.write_base_info('../opti_scout/tests/output/')
 
@@ -46,6 +60,13 @@ model_builder.minSessionsPerGroup = minsessions
 model_builder.maxSessionsPerGroup = maxsessions
 model_builder.maxSolveSeconds=modelrunsecs
 model_builder.maxPopularActivities=maxpopular
+model_builder.noOverlapMode=nooverlapmode
+model_builder.assembly=assembly
+model_builder.writeMetrics=writemetrics
+model_builder.engine=engine
+model_builder.modelCache=modelcache
+if warmstart:
+    model_builder.greedy_start()
 
 solution = model_builder.solve( filename=modelfilename)
 
@@ -53,11 +74,9 @@ solution = model_builder.solve( filename=modelfilename)
 print("Input filename:" +filename)
 print("resultname:" +resultname)
 
-solution.to_excel(resultname)
-solution.to_visualization_excel(resultname_all)
-#add model properties to solution excel workbook
-model_builder.to_excel(resultname,  mode="a",sheet="properties")
-model_builder.to_excel(resultname_all,mode="a",sheet="properties")
+#solution, all selections and the model properties in one workbook, all selections with the model properties in another
+solution.export(resultname, properties=model_builder.settings())
+solution.to_visualization_excel(resultname_all, properties=model_builder.settings())
 
 #todo
 # check uniqueness of ids for groups, activities, priorities
@@ -0,0 +1,32 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.sweep import Sweep
+
+import os
+
+
+# change path to where ever the python file is
+abspath = os.path.abspath(__file__)
+dname = os.path.dirname(abspath)
+os.chdir(dname)
+currpath = os.getcwd()
+print("we are now in: ", currpath)
+filename = "20260429response"
+
+# every combination of these values is solved, side by side on all cores
+sweep = Sweep.grid(
+    AssigningActivititesProblem.from_json(
+        "../opti_scout/tests/data/" + filename + ".json", snapshot_directory="../opti_scout/tests/snapshots/"
+    ),
+    minSessionsPerGroup=[0],
+    maxSessionsPerGroup=[1, 2],
+    maxPopularActivities=[1, 2],
+    maxSolveSeconds=[600],
+    popularThreshold=[None],
+)
+sweep.noOverlapMode = "clique"
+sweep.assembly = "matrix"
+sweep.engine = "mip"
+
+sweep.run("../opti_scout/tests/modelfiles/")
+print(sweep.to_dataframe())
+sweep.to_excel("../opti_scout/tests/output/" + filename + "_sweep.xlsx")
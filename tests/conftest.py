@@ -5,3 +5,8 @@ from pytest import fixture
 @fixture
 def assigning_activities_problem():
     return AssigningActivititesProblem.from_json("tests/data/tom_full_periodeid.json")
+
+
+@fixture
+def small_camp_problem():
+    return AssigningActivititesProblem.from_json("tests/data/small_camp.json")
@@ -0,0 +1,219 @@
+from opti_scout.classes import AssigningActivititesProblem, SelectionTable
+from opti_scout.build_model import ModelBuilder
+from opti_scout.metrics import BuildReport
+from pydantic import BaseModel
+from contextlib import redirect_stdout
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from synthetic import write_camp  # noqa: E402
+
+# Benchmarks loading the problem and building and solving the model on synthetic camps of increasing size,
+# up to the 1300 groups and 150 activities of a full camp. Run with `hatch run test:performance` or
+# `python tests/performance.py --output bench.json --baseline previous.json` to compare two runs. With --camp a camp
+# file is benchmarked instead, such as the 576 groups of tests/data/20260218response.json
+
+SCALES = {
+    "small": (100, 30),
+    "medium": (300, 60),
+    "large": (700, 100),
+    "camp": (1300, 150),
+}
+
+
+class BenchmarkResult(BaseModel):
+    scale: str
+    nb_groups: int
+    nb_activities: int
+    seed: int
+    load_seconds: float
+    load_peak_memory_mb: float
+    generation_seconds: float
+    report: BuildReport
+
+
+class BenchmarkRun(BaseModel):
+    results: list[BenchmarkResult] = []
+
+    def get_result(self, scale: str, mode: str, assembly: str) -> BenchmarkResult | None:
+        return next(
+            (
+                r
+                for r in self.results
+                if r.scale == scale
+                and r.report.settings["noOverlapMode"] == mode
+                and r.report.settings["assembly"] == assembly
+            ),
+            None,
+        )
+
+
+def timed_generation(timings: list[float]):
+    # wraps SelectionTable.generate to time the selection generation inside from_json
+    generate = SelectionTable.generate.__func__
+
+    def wrapper(cls, *args, **kwargs):
+        start = time.perf_counter()
+        table = generate(cls, *args, **kwargs)
+        timings.append(time.perf_counter() - start)
+        return table
+
+    return classmethod(wrapper)
+
+
+def run_benchmark(
+    scale: str,
+    seed: int,
+    mode: str,
+    assembly: str,
+    solve: bool,
+    max_seconds: int,
+    directory: str,
+    verbose: bool,
+    camp: str | None = None,
+    trace_memory: bool = True,
+) -> BenchmarkResult:
+    # the scale is the name of the camp file without its extension when a camp file is given
+    if camp is not None:
+        file_name = camp
+    else:
+        file_name = os.path.join(directory, f"{scale}_{seed}.json")
+        if not os.path.exists(file_name):
+            write_camp(file_name, *SCALES[scale], seed=seed)
+
+    timings = []
+    generate = SelectionTable.generate
+    SelectionTable.generate = timed_generation(timings)
+    try:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        problem = AssigningActivititesProblem.from_json(file_name)
+        load_seconds = time.perf_counter() - start
+        load_peak = tracemalloc.get_traced_memory()[1] / 2**20 if trace_memory else 0.0
+        tracemalloc.stop()
+    finally:
+        SelectionTable.generate = generate
+
+    builder = ModelBuilder.create(problem)
+    builder.noOverlapMode = mode
+    builder.assembly = assembly
+    builder.maxSolveSeconds = max_seconds
+    builder.traceMemory = trace_memory
+    builder.model.verbose = 1 if verbose else 0
+    model_file = os.path.join(directory, f"{scale}_{seed}_{mode}_{assembly}")
+    if solve:
+        builder.solve(model_file)
+    else:
+        builder.build(model_file)
+
+    return BenchmarkResult(
+        scale=scale,
+        nb_groups=len(problem.groups),
+        nb_activities=len(problem.activities),
+        seed=seed,
+        load_seconds=load_seconds,
+        load_peak_memory_mb=load_peak,
+        generation_seconds=timings[0],
+        report=builder.report,
+    )
+
+
+def compare(current: float, previous: float | None) -> str:
+    if previous is None or previous == 0:
+        return ""
+    return f" ({current / previous:.2f}x)"
+
+
+def print_result(result: BenchmarkResult, previous: BenchmarkResult | None) -> None:
+    report = result.report
+    print(
+        f"== {result.scale}: {result.nb_groups} groups, {result.nb_activities} activities, "
+        f"{report.nb_sessions} sessions, {report.nb_selections} selections, "
+        f"{report.settings['noOverlapMode']} {report.settings['assembly']} =="
+    )
+    print(f"{'phase':<50}{'seconds':>10}{'rows':>10}{'nonzeros':>12}{'peak MB':>10}")
+    print(
+        f"{'load':<50}{result.load_seconds:>10.2f}{'':>22}{result.load_peak_memory_mb:>10.1f}"
+        + compare(result.load_seconds, previous.load_seconds if previous else None)
+    )
+    print(
+        f"{'selection generation':<50}{result.generation_seconds:>10.2f}"
+        + compare(result.generation_seconds, previous.generation_seconds if previous else None)
+    )
+    for p in report.phases:
+        before = previous.report.get_phase(p.name) if previous else None
+        peak = f"{p.peak_memory_mb:.1f}" if p.peak_memory_mb is not None else "-"
+        print(
+            f"{p.name:<50}{p.seconds:>10.2f}{p.rows:>10}{p.nonzeros:>12}{peak:>10}"
+            + compare(p.seconds, before.seconds if before else None)
+        )
+    print(
+        f"{'build':<50}{report.build_seconds:>10.2f}{report.rows:>10}{report.nonzeros:>12}"
+        + compare(report.build_seconds, previous.report.build_seconds if previous else None)
+    )
+    if report.status is not None:
+        print(f"status: {report.status}, objective: {report.objective}")
+
+
+def main(arguments: list[str] | None = None) -> BenchmarkRun:
+    parser = argparse.ArgumentParser(description="Benchmark opti_scout on synthetic camps")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=list(SCALES))
+    parser.add_argument("--camp", help="benchmark this camp file instead of the synthetic camps of the scales")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="+", choices=["pairwise", "clique"], default=["pairwise", "clique"])
+    parser.add_argument("--assemblies", nargs="+", choices=["expression", "matrix"], default=["expression", "matrix"])
+    parser.add_argument("--no-solve", dest="solve", action="store_false", help="only build the model")
+    parser.add_argument("--max-seconds", type=int, default=60, help="time limit of each solve")
+    parser.add_argument("--directory", help="keep the camps and model files here instead of a temporary directory")
+    parser.add_argument("--output", help="write the results as json")
+    parser.add_argument("--baseline", help="json results of an earlier run to compare with")
+    parser.add_argument("--verbose", action="store_true", help="show the output of loading and building")
+    parser.add_argument(
+        "--no-memory", dest="trace_memory", action="store_false", help="time the phases without tracing their memory"
+    )
+    args = parser.parse_args(arguments)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = BenchmarkRun.model_validate_json(file.read())
+
+    run = BenchmarkRun()
+    with tempfile.TemporaryDirectory() as temporary:
+        directory = args.directory or temporary
+        scales = args.scales if args.camp is None else [os.path.splitext(os.path.basename(args.camp))[0]]
+        for scale in scales:
+            for mode in args.modes:
+                for assembly in args.assemblies:
+                    output = sys.stdout if args.verbose else io.StringIO()
+                    with redirect_stdout(output):
+                        result = run_benchmark(
+                            scale,
+                            args.seed,
+                            mode,
+                            assembly,
+                            args.solve,
+                            args.max_seconds,
+                            directory,
+                            args.verbose,
+                            args.camp,
+                            args.trace_memory,
+                        )
+                    run.results.append(result)
+                    print_result(result, baseline.get_result(scale, mode, assembly) if baseline else None)
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(run.model_dump_json(indent=2))
+    return run
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+import json
+import random
+
+# Seeded generator of camps in the format read by AssigningActivititesProblem.from_json, used by the
+# benchmarks in tests/performance.py to measure the model at the size of a real camp
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+AREAS = ["Lejren", "Søen", "Skoven", "Byen", "Stranden", "Bakken"]
+DURATIONS = [60, 90, 120, 180, 240]
+CAPACITIES = [20, 30, 50, 80, 120, 200]
+
+
+def random_age_span(rng: random.Random) -> dict:
+    low = rng.choice([6, 7, 8, 10, 12, 14])
+    high = rng.choice([low + 3, low + 6, 99])
+    return {"low": low, "high": high}
+
+
+def generate_activities(rng: random.Random, nb_activities: int, first_day: datetime, nb_days: int) -> list[dict]:
+    activities = []
+    session_id = 0
+    for i in range(nb_activities):
+        duration = rng.choice(DURATIONS)
+        in_camp = rng.random() < 0.8
+        capacity = rng.choice(CAPACITIES)
+        timeslots = []
+        for _ in range(rng.randint(1, 3 * nb_days)):
+            session_id += 1
+            # sessions start on the half hour between 08:00 and 20:00 minus the duration
+            day = first_day + timedelta(days=rng.randrange(nb_days))
+            start = day + timedelta(hours=8, minutes=30 * rng.randrange((12 * 60 - duration) // 30 + 1))
+            timeslots.append(
+                {
+                    "id": f"p{session_id:05d}",
+                    "start": start.strftime(DATE_FORMAT),
+                    "end": (start + timedelta(minutes=duration)).strftime(DATE_FORMAT),
+                    "capacity": capacity,
+                }
+            )
+        activities.append(
+            {
+                "id": f"a{i + 1:05d}",
+                "name": f"Aktivitet {i + 1}",
+                "age_span": random_age_span(rng),
+                "leaders_can_participate": rng.random() < 0.5,
+                "activity_area": "Lejren" if in_camp else rng.choice(AREAS[1:]),
+                "in_camp": in_camp,
+                "timeslots": timeslots,
+            }
+        )
+    return activities
+
+
+def generate_groups(
+    rng: random.Random, nb_groups: int, activities: list[dict], first_day: datetime, nb_days: int
+) -> list[dict]:
+    # some activities are asked for much more often than others, as on a real camp
+    ids = [a["id"] for a in activities]
+    weights = [1 / (rank + 1) for rank in range(len(ids))]
+    groups = []
+    for i in range(nb_groups):
+        size = rng.randint(4, 40)
+        arrival = rng.randrange(max(nb_days - 2, 1))
+        departure = rng.randint(arrival + 1, nb_days)
+        available = []
+        for d in range(arrival, departure):
+            day = first_day + timedelta(days=d)
+            # the first and the last day are shortened by the travel to and from the camp
+            start = day + timedelta(hours=12 if d == arrival and rng.random() < 0.5 else 7)
+            end = day + timedelta(hours=14 if d == departure - 1 and rng.random() < 0.5 else 20)
+            available.append({"start": start.strftime(DATE_FORMAT), "end": end.strftime(DATE_FORMAT)})
+        priorities = list(dict.fromkeys(rng.choices(ids, weights, k=rng.randint(0, 20))))
+        groups.append(
+            {
+                "id": f"g{i + 1:05d}",
+                "size": size,
+                "size_without_leaders": size - rng.randint(1, min(4, size - 1)),
+                "age_span": random_age_span(rng),
+                "priorities": priorities,
+                "available": available,
+            }
+        )
+    return groups
+
+
+def generate_camp(
+    nb_groups: int,
+    nb_activities: int,
+    nb_days: int = 7,
+    seed: int = 0,
+    first_day: datetime = datetime(2026, 7, 19),
+) -> dict:
+    rng = random.Random(seed)
+    activities = generate_activities(rng, nb_activities, first_day, nb_days)
+    groups = generate_groups(rng, nb_groups, activities, first_day, nb_days)
+    return {"groups": groups, "activities": activities}
+
+
+def write_camp(file_name: str, nb_groups: int, nb_activities: int, nb_days: int = 7, seed: int = 0) -> None:
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(generate_camp(nb_groups, nb_activities, nb_days, seed), file, ensure_ascii=False)
@@ -1,8 +1,21 @@
-from opti_scout.classes import Activity, AssigningActivititesProblem, Group, Selection, Timeslot, ActivityTimeslot
+from opti_scout.classes import (
+    Activity,
+    AssigningActivititesProblem,
+    Group,
+    ProblemDelta,
+    Selection,
+    Solution,
+    Timeslot,
+    ActivityTimeslot,
+)
 from opti_scout.build_model import ModelBuilder
+from opti_scout.metrics import BuildReport
 
 from hypothesis import strategies as st
 from datetime import datetime, timedelta
+from pytest import mark, raises
+import json
+import tracemalloc
 
 
 def allowed_age_groups():
@@ -91,4 +104,337 @@ def test_generate_variables(assigning_activities_problem: AssigningActivititesPr
     x = model_builder.generate_variables()
 
     # Assert
-    assert 12 == len(x)
+    # 12 prioritized sessions, the 2 of a00059 are on days g00004 is not at the camp
+    assert 10 == len(x)
+
+
+def test_max_1_session_constraint_only_for_prioritized_activities(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    x = model_builder.generate_variables()
+
+    # Act
+    model_builder.add_max_1_session_constraint(x)
+
+    # Assert
+    pairs = {(s.group.id, s.activity.id) for s in small_camp_problem.selections}
+    assert len(pairs) == model_builder.model.num_rows
+
+
+def test_maxscout_constraint_covers_all_selections(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    x = model_builder.generate_variables()
+
+    # Act
+    model_builder.add_maxscout_constraint(x)
+
+    # Assert
+    assert small_camp_problem.count_sessions() == model_builder.model.num_rows
+    assert len(small_camp_problem.selections) == model_builder.model.num_nz
+
+
+@mark.parametrize("mode", ["pairwise", "clique"])
+def test_no_overlap_modes_give_same_optimum(small_camp_problem: AssigningActivititesProblem, mode: str):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.noOverlapMode = mode
+    model_builder.model.verbose = 0
+    x = model_builder.generate_variables()
+    model_builder.add_max_1_session_constraint(x)
+    model_builder.add_objective(x)
+
+    # Act
+    model_builder.add_no_overlapping_sessions_constraint(x)
+    model_builder.model.optimize()
+
+    # Assert
+    assert 170 == model_builder.model.objective_value
+
+
+def test_solution_selections_follow_variables(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    x = model_builder.generate_variables()
+    model_builder.add_max_1_session_constraint(x)
+    model_builder.add_no_overlapping_sessions_constraint(x)
+    model_builder.add_objective(x)
+    status = model_builder.model.optimize()
+
+    # Act
+    solution = Solution.build(small_camp_problem, x, status)
+
+    # Assert
+    assert solution.is_valid()
+    assert len(solution.allvars) == len(x)
+    assert {str(s) for s in solution.selections} == {v.name for v in x if v.x > 0.5}
+    assert all(s.assigned == 1 for s in solution.selections)
+    assert sum(s.priority for s in solution.selections) == model_builder.model.objective_value
+
+
+@mark.parametrize("row_names", [False, True])
+def test_matrix_assembly_matches_expression_assembly(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, row_names: bool
+):
+    # Arrange
+    results = {}
+    for assembly in ["expression", "matrix"]:
+        model_builder = ModelBuilder.create(small_camp_problem)
+        model_builder.model.verbose = 0
+        model_builder.assembly = assembly
+        model_builder.rowNames = row_names
+        x = model_builder.generate_variables()
+        model_builder.add_maxscout_constraint(x)
+        model_builder.add_max_1_session_constraint(x)
+        model_builder.add_no_overlapping_sessions_constraint(x)
+        model_builder.add_max_nb_of_most_popular_activities_constraint(x)
+        model_builder.add_max_sessions_per_group_constraint(x)
+        model_builder.add_at_most_1_activity_out_of_camp(x)
+        model_builder.add_objective(x)
+
+        # Act
+        if assembly == "matrix":
+            x = model_builder.load_matrix(str(tmp_path / "model"))
+        model_builder.model.optimize()
+        results[assembly] = (model_builder.model.num_rows, model_builder.model.objective_value, [v.name for v in x])
+
+    # Assert
+    assert results["expression"] == results["matrix"]
+    assert (tmp_path / "model.mps").exists()
+    if row_names:
+        assert model_builder.model.constr_by_name("group_g00001_max_sessions") is not None
+
+
+def test_solve_reports_phases(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.traceMemory = True
+    model_builder.writeMetrics = True
+    filename = str(tmp_path / "small_camp")
+
+    # Act
+    solution = model_builder.solve(filename)
+
+    # Assert
+    report = solution.report
+    assert report.status == "OPTIMAL"
+    assert report.objective == model_builder.model.objective_value
+    assert report.get_phase("add_max_1_session_constraint").rows == 9
+    assert sum(p.rows for p in report.phases) == report.rows == model_builder.model.num_rows
+    assert all(p.peak_memory_mb is not None for p in report.phases)
+    assert BuildReport.model_validate_json((tmp_path / "small_camp_metrics.json").read_text()) == report
+
+
+def test_failed_phase_is_recorded_and_stops_tracing():
+    # Arrange
+    report = BuildReport(filename="camp", nb_activities=0, nb_sessions=0, nb_groups=0, nb_selections=0)
+
+    # Act
+    with raises(ValueError):
+        with report.phase("failing", lambda: (3, 5), trace_memory=True):
+            raise ValueError("phase failed")
+
+    # Assert
+    assert [p.name for p in report.phases] == ["failing"]
+    assert report.phases[0].peak_memory_mb is not None
+    assert not tracemalloc.is_tracing()
+
+
+@mark.parametrize("export", ["json", "excel"])
+def test_warm_start_from_exported_solution(small_camp_problem: AssigningActivititesProblem, tmp_path, export: str):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    solution = model_builder.solve(str(tmp_path / "first"))
+    if export == "json":
+        solution.to_json(str(tmp_path / "solution.json"))
+        previous = Solution.from_json(small_camp_problem, str(tmp_path / "solution.json"))
+    else:
+        solution.to_excel(str(tmp_path / "solution.xlsx"))
+        previous = Solution.from_excel(small_camp_problem, str(tmp_path / "solution.xlsx"))
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.warmStart = previous
+
+    # Act
+    warm = model_builder.solve(str(tmp_path / "second"))
+
+    # Assert
+    assert previous.get_selection_ids() == solution.get_selection_ids()
+    assert warm.report.get_phase("warm_start") is not None
+    assert warm.report.objective == solution.report.objective == 153
+
+
+def test_warm_start_from_greedy_assignment(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.maxPopularActivities = 0
+
+    # Act
+    start = model_builder.greedy_start()
+    solution = model_builder.solve(str(tmp_path / "greedy"))
+
+    # Assert
+    greedy_objective = int(start.assigned @ small_camp_problem.selection_table.priority)
+    assert 0 < greedy_objective <= solution.report.objective
+    assert not any(s.activity.id == "a00004" for s in solution.selections)
+
+
+def edited_small_camp(tmp_path) -> tuple[ProblemDelta, str]:
+    # the same edits as a delta and as a new camp file
+    delta = ProblemDelta(
+        add_groups=[
+            {
+                "id": "g00005",
+                "size": 10,
+                "size_without_leaders": 8,
+                "age_span": {"low": 7, "high": 10},
+                "priorities": ["a00002", "a00001"],
+                "available": [{"start": "2026-07-20T07:00:00Z", "end": "2026-07-20T20:00:00Z"}],
+            }
+        ],
+        remove_groups=["g00002"],
+        priorities={"g00003": ["a00001", "a00003"], "g00004": ["a00001"]},
+        capacities={("a00001", "p0001"): 20},
+        session_times={("a00002", "p0003"): ("2026-07-20T14:00:00Z", "2026-07-20T16:00:00Z")},
+    )
+    with open("tests/data/small_camp.json", "r", encoding="utf-8") as file:
+        data = json.load(file)
+    data["groups"] = [g for g in data["groups"] if g["id"] != "g00002"] + delta.add_groups
+    for g in data["groups"]:
+        g["priorities"] = delta.priorities.get(g["id"], g["priorities"])
+    for a in data["activities"]:
+        for t in a["timeslots"]:
+            t["capacity"] = delta.capacities.get((a["id"], t["id"]), t["capacity"])
+            t["start"], t["end"] = delta.session_times.get((a["id"], t["id"]), (t["start"], t["end"]))
+    file_name = str(tmp_path / "edited_camp.json")
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    return delta, file_name
+
+
+def test_apply_delta_matches_edited_camp(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    delta, file_name = edited_small_camp(tmp_path)
+    edited = AssigningActivititesProblem.from_json(file_name)
+
+    # Act
+    problem = small_camp_problem.apply(delta)
+
+    # Assert
+    assert [g.id for g in problem.groups] == [g.id for g in edited.groups]
+    assert problem.get_selection_names() == edited.get_selection_names()
+    assert problem.selection_table.priority.tolist() == edited.selection_table.priority.tolist()
+    assert [(t.id, t.start, t.end, t.capacity) for t in problem.sessions] == [
+        (t.id, t.start, t.end, t.capacity) for t in edited.sessions
+    ]
+
+
+@mark.parametrize("assembly", ["expression", "matrix"])
+def test_update_gives_same_optimum_as_rebuilding(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, assembly: str
+):
+    # Arrange
+    delta, file_name = edited_small_camp(tmp_path)
+    rebuilt = ModelBuilder.create(AssigningActivititesProblem.from_json(file_name))
+    rebuilt.model.verbose = 0
+    expected = rebuilt.solve(str(tmp_path / "rebuilt"))
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.assembly = assembly
+    model_builder.solve(str(tmp_path / "first"))
+    nb_cols = model_builder.model.num_cols
+
+    # Act
+    solution = model_builder.update(delta)
+
+    # Assert
+    assert solution.report.status == "OPTIMAL"
+    assert solution.report.objective == expected.report.objective
+    assert sum(s.priority for s in solution.selections) == expected.report.objective
+    assert model_builder.model.num_cols < nb_cols + len(solution.assigned)
+    assert all(s.group.id != "g00002" for s in solution.selections)
+    assert solution.report.get_phase("update_model").rows > 0
+
+
+def test_update_edits_the_session_of_its_own_activity(tmp_path):
+    # Arrange
+    with open("tests/data/small_camp.json", "r", encoding="utf-8") as file:
+        data = json.load(file)
+    # a00002 has a session with the same id as the first session of a00001
+    data["activities"][1]["timeslots"][0]["id"] = "p0001"
+    file_name = str(tmp_path / "shared_ids.json")
+    with open(file_name, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    delta = ProblemDelta(capacities={("a00002", "p0001"): 0})
+    data["activities"][1]["timeslots"][0]["capacity"] = 0
+    with open(str(tmp_path / "edited.json"), "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    rebuilt = ModelBuilder.create(AssigningActivititesProblem.from_json(str(tmp_path / "edited.json")))
+    rebuilt.model.verbose = 0
+    expected = rebuilt.solve(str(tmp_path / "rebuilt"))
+    model_builder = ModelBuilder.create(AssigningActivititesProblem.from_json(file_name))
+    model_builder.model.verbose = 0
+    model_builder.solve(str(tmp_path / "first"))
+
+    # Act
+    solution = model_builder.update(delta)
+
+    # Assert
+    capacities = {(a.id, t.id): t.capacity for a, t in solution.problem.get_session_activities()}
+    assert capacities[("a00002", "p0001")] == 0
+    assert capacities[("a00001", "p0001")] == data["activities"][0]["timeslots"][0]["capacity"]
+    assert solution.report.objective == expected.report.objective
+
+
+@mark.parametrize("assembly", ["expression", "matrix"])
+def test_model_cache_reads_the_model_of_an_unchanged_problem(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, assembly: str
+):
+    # Arrange
+    def cached_builder(maxSessionsPerGroup: int = 100) -> ModelBuilder:
+        model_builder = ModelBuilder.create(small_camp_problem)
+        model_builder.model.verbose = 0
+        model_builder.assembly = assembly
+        model_builder.maxSessionsPerGroup = maxSessionsPerGroup
+        model_builder.modelCache = str(tmp_path / "cache")
+        return model_builder
+
+    built = cached_builder().solve(str(tmp_path / "built"))
+
+    # Act
+    cached = cached_builder().solve(str(tmp_path / "cached"))
+    other = cached_builder(maxSessionsPerGroup=1).solve(str(tmp_path / "other"))
+
+    # Assert
+    assert built.report.get_phase("load_cached_model") is None
+    assert cached.report.get_phase("load_cached_model") is not None
+    assert cached.report.get_phase("add_maxscout_constraint") is None
+    assert cached.report.rows == built.report.rows
+    assert cached.report.objective == built.report.objective == 153
+    assert cached.get_selection_ids() == built.get_selection_ids()
+    assert other.report.get_phase("load_cached_model") is None
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 2
+
+
+def test_update_after_reading_a_cached_model(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    delta, file_name = edited_small_camp(tmp_path)
+    rebuilt = ModelBuilder.create(AssigningActivititesProblem.from_json(file_name))
+    rebuilt.model.verbose = 0
+    expected = rebuilt.solve(str(tmp_path / "rebuilt"))
+    for name in ["built", "cached"]:
+        model_builder = ModelBuilder.create(small_camp_problem)
+        model_builder.model.verbose = 0
+        model_builder.modelCache = str(tmp_path / "cache")
+        model_builder.solve(str(tmp_path / name))
+
+    # Act
+    solution = model_builder.update(delta)
+
+    # Assert
+    assert model_builder.report.filename == str(tmp_path / "cached")
+    assert solution.report.objective == expected.report.objective
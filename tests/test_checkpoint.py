@@ -0,0 +1,83 @@
+from opti_scout.classes import AssigningActivititesProblem, Solution
+from opti_scout.build_model import ModelBuilder
+from opti_scout.checkpoint import IncumbentSnapshots
+
+from mip import BINARY, Model, OptimizationStatus
+import json
+import os
+
+
+def test_snapshots_write_only_improving_solutions(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    model = Model()
+    x = [model.add_var(var_type=BINARY) for _ in range(len(small_camp_problem.selection_table))]
+    path = str(tmp_path / "camp_incumbent.json")
+    snapshots = IncumbentSnapshots(model, small_camp_problem, x, path)
+
+    # Act
+    snapshots.update_incumbent(10.0, 20.0, [(x[0], 1.0), (x[2], 1.0)])
+    snapshots.update_incumbent(8.0, 20.0, [(x[1], 1.0)])
+
+    # Assert
+    solution = Solution.from_json(small_camp_problem, path)
+    with open(path, "r", encoding="utf-8") as file:
+        data = json.load(file)
+    assert snapshots.written == 1
+    assert solution.assigned.nonzero()[0].tolist() == [0, 2]
+    assert data["objective"] == 10.0
+    assert data["bound"] == 20.0
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_checkpointed_solve_and_resume(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    filename = str(tmp_path / "camp")
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.checkpointSeconds = 5
+    model_builder.model.verbose = 0
+    resumed = ModelBuilder.create(small_camp_problem)
+
+    # Act
+    solution = model_builder.solve(filename)
+    nothing = resumed.resume(str(tmp_path / "other"))
+    warm_start = resumed.resume(filename)
+
+    # Assert
+    assert solution.report.objective == 153
+    assert solution.report.checkpoints >= 1
+    assert nothing is None
+    assert resumed.warmStart is warm_start
+    assert (warm_start.assigned == solution.assigned).all()
+
+
+def test_best_snapshot_is_kept_when_the_last_part_finds_nothing(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, monkeypatch
+):
+    # Arrange
+    run_solver = ModelBuilder.run_solver
+    statuses = []
+
+    def stopped_solver(model_builder: ModelBuilder, filename: str, max_seconds: float) -> OptimizationStatus:
+        # the first part finds the optimum but stops as if on its time limit, the next ones find nothing
+        if not statuses:
+            run_solver(model_builder, filename, max_seconds)
+            statuses.append(OptimizationStatus.FEASIBLE)
+        else:
+            statuses.append(OptimizationStatus.NO_SOLUTION_FOUND)
+        return statuses[-1]
+
+    monkeypatch.setattr(ModelBuilder, "run_solver", stopped_solver)
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.checkpointSeconds = 1
+    model_builder.model.verbose = 0
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "camp"))
+
+    # Assert
+    assert statuses[-1] == OptimizationStatus.NO_SOLUTION_FOUND
+    assert solution.status == OptimizationStatus.FEASIBLE
+    assert solution.report.objective == 153
+    assert solution.report.checkpoints == 1
+    snapshot = Solution.from_json(small_camp_problem, str(tmp_path / "camp_incumbent.json"))
+    assert (solution.assigned == snapshot.assigned).all()
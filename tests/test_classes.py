@@ -1,7 +1,16 @@
 from opti_scout.classes import Activity, AssigningActivititesProblem, Group, Selection, Timeslot, ActivityTimeslot
+from opti_scout.classes import PriorityMatrix, Solution, camp_hash
 
-from datetime import datetime
-from pytest import fixture, mark
+from opti_scout.streaming import iter_json_items
+from tests.synthetic import write_camp
+
+from datetime import datetime, timedelta
+from mip import OptimizationStatus
+from pytest import fixture, mark, raises
+import json
+import os
+import numpy as np
+import pandas as pd
 
 
 @fixture
@@ -15,9 +24,19 @@ def timeslots():
 @fixture
 def activitytimeslots():
     return [
-        ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9, 0), end=datetime(2025, 9, 25, 10, 0)),
         ActivityTimeslot(
-            id="p0002", capacity=100, start=datetime(2025, 9, 25, 9, 30), end=datetime(2025, 9, 25, 16, 0)
+            id="p0001",
+            capacity=300,
+            start=datetime(2025, 9, 25, 9, 0),
+            end=datetime(2025, 9, 25, 10, 0),
+            real_end=datetime(2025, 9, 25, 10, 0),
+        ),
+        ActivityTimeslot(
+            id="p0002",
+            capacity=100,
+            start=datetime(2025, 9, 25, 9, 30),
+            end=datetime(2025, 9, 25, 16, 0),
+            real_end=datetime(2025, 9, 25, 16, 0),
         ),
     ]
 
@@ -90,50 +109,146 @@ def test_timeslot_overlap(slot1, slot2, expected):
     [
         # Identical timeslots
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 10)),
-            ActivityTimeslot(id="p0002", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 10)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 10),
+                real_end=datetime(2025, 9, 25, 10),
+            ),
+            ActivityTimeslot(
+                id="p0002",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 10),
+                real_end=datetime(2025, 9, 25, 10),
+            ),
             True,
         ),
         # slot3 starts during slot4
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 11)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 10), end=datetime(2025, 9, 25, 12)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 11),
+                real_end=datetime(2025, 9, 25, 11),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 10),
+                end=datetime(2025, 9, 25, 12),
+                real_end=datetime(2025, 9, 25, 12),
+            ),
             True,
         ),
         # slot4 ends during slot3
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 10), end=datetime(2025, 9, 25, 12)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 11)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 10),
+                end=datetime(2025, 9, 25, 12),
+                real_end=datetime(2025, 9, 25, 12),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 11),
+                real_end=datetime(2025, 9, 25, 11),
+            ),
             True,
         ),
         # slot4 fully inside slot3
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 12)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 10), end=datetime(2025, 9, 25, 11)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 12),
+                real_end=datetime(2025, 9, 25, 12),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 10),
+                end=datetime(2025, 9, 25, 11),
+                real_end=datetime(2025, 9, 25, 11),
+            ),
             True,
         ),
         # slot3 fully inside slot4
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 10), end=datetime(2025, 9, 25, 11)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 12)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 10),
+                end=datetime(2025, 9, 25, 11),
+                real_end=datetime(2025, 9, 25, 11),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 12),
+                real_end=datetime(2025, 9, 25, 12),
+            ),
             True,
         ),
         # Adjacent timeslots (no overlap)
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 10)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 10), end=datetime(2025, 9, 25, 11)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 10),
+                real_end=datetime(2025, 9, 25, 10),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 10),
+                end=datetime(2025, 9, 25, 11),
+                real_end=datetime(2025, 9, 25, 11),
+            ),
             False,
         ),
         # Completely separate timeslots
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 9), end=datetime(2025, 9, 25, 10)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 11), end=datetime(2025, 9, 25, 12)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 9),
+                end=datetime(2025, 9, 25, 10),
+                real_end=datetime(2025, 9, 25, 10),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 11),
+                end=datetime(2025, 9, 25, 12),
+                real_end=datetime(2025, 9, 25, 12),
+            ),
             False,
         ),
         # Overlap across midnight
         (
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 25, 23), end=datetime(2025, 9, 26, 1)),
-            ActivityTimeslot(id="p0001", capacity=300, start=datetime(2025, 9, 26, 0), end=datetime(2025, 9, 26, 2)),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 25, 23),
+                end=datetime(2025, 9, 26, 1),
+                real_end=datetime(2025, 9, 26, 1),
+            ),
+            ActivityTimeslot(
+                id="p0001",
+                capacity=300,
+                start=datetime(2025, 9, 26, 0),
+                end=datetime(2025, 9, 26, 2),
+                real_end=datetime(2025, 9, 26, 2),
+            ),
             True,
         ),
     ],
@@ -149,9 +264,10 @@ def test_get_overlapping_selections(timeslots, activitytimeslots):
         name="Archery",
         id="A0001",
         age_span={"low": 7, "high": 10},
-        timeslots=set([activitytimeslots[0]]),
+        timeslots=set(activitytimeslots),
         activity_area="Lejren",
         in_camp=False,
+        leaders_can_participate=True,
     )
     activity2 = Activity(
         name="Kayaking",
@@ -160,17 +276,27 @@ def test_get_overlapping_selections(timeslots, activitytimeslots):
         timeslots=set([activitytimeslots[1]]),
         activity_area="Lejren",
         in_camp=False,
+        leaders_can_participate=True,
     )
 
     # Create ScoutGroups
-    group1 = Group(name="Eagles", id="G0001", age_span={"low": 7, "high": 10}, size=10, available=set(timeslots))
-    group2 = Group(name="Wolves", id="G0002", age_span={"low": 7, "high": 10}, size=8, available=set([timeslots[1]]))
+    age = {"low": 7, "high": 10}
+    group1 = Group(name="Eagles", id="G0001", age_span=age, size=10, size_without_leaders=8, available=set(timeslots))
+    group2 = Group(name="Wolves", id="G0002", age_span=age, size=8, size_without_leaders=6, available={timeslots[1]})
 
     # Create Selections
-    selection1 = Selection(group=group1, activity=activity1, time_slot=activitytimeslots[0], priority=1)
-    selection1a = Selection(group=group1, activity=activity1, time_slot=activitytimeslots[1], priority=1)
-    selection2 = Selection(group=group1, activity=activity2, time_slot=activitytimeslots[1], priority=2)
-    selection3 = Selection(group=group2, activity=activity2, time_slot=activitytimeslots[1], priority=1)
+    selection1 = Selection(
+        group=group1, activity=activity1, time_slot=activitytimeslots[0], priority=1, assigned=0, popular=0
+    )
+    selection1a = Selection(
+        group=group1, activity=activity1, time_slot=activitytimeslots[1], priority=1, assigned=0, popular=0
+    )
+    selection2 = Selection(
+        group=group1, activity=activity2, time_slot=activitytimeslots[1], priority=2, assigned=0, popular=0
+    )
+    selection3 = Selection(
+        group=group2, activity=activity2, time_slot=activitytimeslots[1], priority=1, assigned=0, popular=0
+    )
 
     # Act
     problem = AssigningActivititesProblem(
@@ -178,6 +304,8 @@ def test_get_overlapping_selections(timeslots, activitytimeslots):
         groups=[group1, group2],
         selections=[selection1, selection2, selection3, selection1a],
         popularactivities=[activity1],
+        grpswithoutselections=0,
+        activitieswithoutsesessions=0,
     )
 
     overlapping_selections = problem.get_overlapping_selections(selection1)
@@ -185,6 +313,324 @@ def test_get_overlapping_selections(timeslots, activitytimeslots):
     # Assert
     assert len(overlapping_selections) == 1
     assert (
-        Selection(group=group1, activity=activity2, time_slot=activitytimeslots[1], priority=2)
+        Selection(group=group1, activity=activity2, time_slot=activitytimeslots[1], priority=2, assigned=0, popular=0)
         == overlapping_selections.pop()
     )
+
+
+def test_selection_index_matches_full_scan(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    problem = small_camp_problem
+    selections = problem.selections
+    popular = {a.id for a in problem.popularactivities}
+
+    def rows(condition):
+        return {r for r, s in enumerate(selections) if condition(s)}
+
+    # Act
+    index = problem.get_selection_index()
+
+    # Assert
+    for i, g in enumerate(problem.groups):
+        assert set(index.for_group(i).tolist()) == rows(lambda s: s.group == g)
+        assert set(index.out_of_camp_for_group(i).tolist()) == rows(lambda s: s.group == g and not s.activity.in_camp)
+        assert set(index.popular_for_group(i).tolist()) == rows(lambda s: s.group == g and s.activity.id in popular)
+        for j, a in enumerate(problem.activities):
+            assert set(index.for_group_activity(i, j).tolist()) == rows(lambda s: s.group == g and s.activity == a)
+    for j, a in enumerate(problem.activities):
+        assert set(index.for_activity(j).tolist()) == rows(lambda s: s.activity == a)
+        for t in a.timeslots:
+            assert problem.get_selections_for_activity(a, t) == {
+                s for s in selections if s.activity == a and s.time_slot == t
+            }
+
+
+def test_selection_index_is_built_once(small_camp_problem: AssigningActivititesProblem):
+    assert small_camp_problem.get_selection_index() is small_camp_problem.get_selection_index()
+
+
+def test_overlapping_selection_pairs_are_unique(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    selections = small_camp_problem.selections
+    expected = {
+        frozenset((str(s), str(s1))) for s in selections for s1 in small_camp_problem.get_overlapping_selections(s)
+    }
+
+    # Act
+    pairs = small_camp_problem.get_overlapping_selection_pairs()
+
+    # Assert
+    assert len(expected) > 0
+    assert len(pairs) == len(expected)
+    assert {frozenset((str(selections[r]), str(selections[r1]))) for r, r1 in pairs.tolist()} == expected
+
+
+def test_overlapping_selection_cliques_cover_all_pairs(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    selections = small_camp_problem.selections
+    pairs = small_camp_problem.get_overlapping_selection_pairs().tolist()
+
+    # Act
+    cliques = small_camp_problem.get_overlapping_selection_cliques()
+
+    # Assert
+    assert len(cliques) <= len(pairs)
+    for clique in cliques:
+        for r in clique:
+            assert all(r == r1 or selections[r].time_slot.overlaps(selections[r1].time_slot) for r1 in clique)
+    for r, r1 in pairs:
+        assert any(r in clique and r1 in clique for clique in cliques)
+
+
+def test_selection_table_matches_available_timeslots(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    problem = small_camp_problem
+    prioritized = {("g00001", "a00001"), ("g00001", "a00002"), ("g00001", "a00003"), ("g00001", "a00004")}
+    prioritized |= {("g00002", "a00002"), ("g00002", "a00001"), ("g00002", "a00004")}
+    prioritized |= {("g00003", "a00003"), ("g00003", "a00001")}
+    expected = {
+        (g.id, a.id, t.id)
+        for g in problem.groups
+        for a in problem.activities
+        for t in a.timeslots
+        if (g.id, a.id) in prioritized and g.in_available_timeslots(t)
+    }
+
+    # Act
+    selections = {(s.group.id, s.activity.id, s.time_slot.id) for s in problem.selections}
+
+    # Assert
+    assert len(problem.selection_table) == len(expected)
+    assert selections == expected
+
+
+def test_selections_are_created_on_demand(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    problem = small_camp_problem
+
+    # Act
+    before = problem._selections
+    selections = problem.selections
+
+    # Assert
+    assert before is None
+    assert selections is problem.selections
+    assert {s.priority for s in selections if s.group.id == "g00003"} == {20, 19}
+
+
+@mark.parametrize("seed", [0, 1])
+def test_selection_table_matches_available_timeslots_on_synthetic_camp(tmp_path, seed: int):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=40, nb_activities=15, seed=seed)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    with open(file_name, "r", encoding="utf-8") as file:
+        prioritized = {(g["id"], a) for g in json.load(file)["groups"] for a in g["priorities"]}
+    expected = {
+        (g.id, a.id, t.id)
+        for g in problem.groups
+        for a in problem.activities
+        for t in a.timeslots
+        if (g.id, a.id) in prioritized and g.in_available_timeslots(t)
+    }
+
+    # Act
+    selections = {(s.group.id, s.activity.id, s.time_slot.id) for s in problem.selections}
+
+    # Assert
+    assert len(expected) > 0
+    assert selections == expected
+
+
+@mark.parametrize("chunk_size", [7, 1 << 16])
+def test_json_stream_yields_the_items_of_the_camp_file(tmp_path, chunk_size: int):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=10, nb_activities=5)
+    with open(file_name, "r", encoding="utf-8") as file:
+        data = json.load(file)
+
+    # Act
+    items = list(iter_json_items(file_name, chunk_size))
+
+    # Assert
+    assert [item for key, item in items if key == "groups"] == data["groups"]
+    assert [item for key, item in items if key == "activities"] == data["activities"]
+
+
+def test_json_stream_reads_values_and_empty_arrays(tmp_path):
+    # Arrange
+    file_name = tmp_path / "camp.json"
+    file_name.write_text('{"version": 12345, "groups": [], "activities": [{"id": "a1"}, 2.5]}', encoding="utf-8")
+
+    # Act
+    items = list(iter_json_items(str(file_name), chunk_size=3))
+
+    # Assert
+    assert items == [("version", 12345), ("activities", {"id": "a1"}), ("activities", 2.5)]
+
+
+def test_from_json_adds_travel_time_to_sessions_and_available_times():
+    # Act
+    problem = AssigningActivititesProblem.from_json("tests/data/small_camp.json")
+
+    # Assert
+    assert all(t.end - t.real_end == timedelta(minutes=30) for t in problem.sessions)
+    assert all(a.end.minute == 30 for g in problem.groups for a in g.available)
+
+
+def test_snapshot_reads_back_the_loaded_problem(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=40, nb_activities=15)
+    problem = AssigningActivititesProblem.from_json(file_name)
+
+    # Act
+    problem.to_snapshot(str(tmp_path / "camp.npz"))
+    snapshot = AssigningActivititesProblem.from_snapshot(str(tmp_path / "camp.npz"))
+
+    # Assert
+    assert [s.id for s in snapshot.sessions] == [s.id for s in problem.sessions]
+    assert [(s.start, s.end, s.real_end) for s in snapshot.sessions] == [
+        (s.start, s.end, s.real_end) for s in problem.sessions
+    ]
+    assert [(g.id, g.available) for g in snapshot.groups] == [(g.id, g.available) for g in problem.groups]
+    assert [a.model_dump(exclude={"timeslots"}) for a in snapshot.activities] == [
+        a.model_dump(exclude={"timeslots"}) for a in problem.activities
+    ]
+    assert snapshot.get_selection_names() == problem.get_selection_names()
+    assert (snapshot.selection_table.priority == problem.selection_table.priority).all()
+    assert [a.id for a in snapshot.popularactivities] == [a.id for a in problem.popularactivities]
+    assert snapshot.capacity_ratios == problem.capacity_ratios
+    assert snapshot.group_priorities == problem.group_priorities
+
+
+def test_from_json_reuses_the_snapshot_of_an_unchanged_camp(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    directory = str(tmp_path / "snapshots")
+    write_camp(file_name, nb_groups=10, nb_activities=5)
+    first = AssigningActivititesProblem.from_json(file_name, snapshot_directory=directory)
+    names = [camp_hash(file_name, 0.02) + ".npz", camp_hash(file_name, 0.5) + ".npz"]
+
+    # Act
+    again = AssigningActivititesProblem.from_json(file_name, snapshot_directory=directory)
+    AssigningActivititesProblem.from_json(file_name, popular_threshold=0.5, snapshot_directory=directory)
+    write_camp(file_name, nb_groups=10, nb_activities=5, seed=1)
+    changed = AssigningActivititesProblem.from_json(file_name, snapshot_directory=directory)
+
+    # Assert
+    assert again.get_selection_names() == first.get_selection_names()
+    assert set(names) < set(os.listdir(directory))
+    assert len(os.listdir(directory)) == 3
+    assert changed.group_priorities == AssigningActivititesProblem.from_json(file_name).group_priorities
+
+
+def test_export_columns_match_the_selections(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    assigned = np.zeros(len(small_camp_problem.selection_table), dtype=np.int8)
+    assigned[::3] = 1
+    solution = Solution(problem=small_camp_problem, assigned=assigned, status=OptimizationStatus.FEASIBLE)
+
+    # Act
+    df = solution.to_dataframe()
+    allvars = solution.to_visualization_dataframe()
+
+    # Assert
+    expected = [
+        [s.group.id, s.activity.id, s.time_slot.id, s.time_slot.real_end.replace(tzinfo=None), 21 - s.priority]
+        for s in solution.selections
+    ]
+    assert df[["Group", "Activity", "Timeslot", "End", "Priority"]].values.tolist() == expected
+    assert allvars["Assigned"].tolist() == assigned.tolist()
+    assert allvars["Size"].tolist() == [s.group.size for s in solution.allvars]
+    assert allvars["PopularActivity"].tolist() == [s.popular for s in solution.allvars]
+
+
+@mark.parametrize("format", ["xlsx", "csv"])
+def test_export_writes_all_sheets(small_camp_problem: AssigningActivititesProblem, tmp_path, format: str):
+    # Arrange
+    assigned = np.zeros(len(small_camp_problem.selection_table), dtype=np.int8)
+    assigned[::2] = 1
+    solution = Solution(problem=small_camp_problem, assigned=assigned, status=OptimizationStatus.FEASIBLE)
+    filename = str(tmp_path / ("camp.xlsx" if format == "xlsx" else "camp"))
+
+    # Act
+    files = solution.export(filename, format, properties={"maxSolveSeconds": 300}, base_info=True)
+
+    # Assert
+    if format == "xlsx":
+        sheets = pd.read_excel(filename, sheet_name=None)
+        assert Solution.from_excel(small_camp_problem, filename).get_selection_ids() == solution.get_selection_ids()
+    else:
+        sheets = {os.path.basename(f)[len("camp_") : -len(".csv")]: pd.read_csv(f) for f in files}
+    names = ["solution", "allvars", "properties", "group_info", "session_info", "popular_info", "selections"]
+    names += ["activity_demand", "session_demand"]
+    assert list(sheets) == names
+    assert len(sheets["solution"]) == assigned.sum()
+    assert len(sheets["allvars"]) == len(sheets["selections"]) == len(assigned)
+    assert sheets["properties"]["maxSolveSeconds"].tolist() == [300]
+    with raises(ValueError):
+        solution.export(filename, "ods")
+
+
+def test_visualization_excel_keeps_the_properties(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    assigned = np.zeros(len(small_camp_problem.selection_table), dtype=np.int8)
+    assigned[::2] = 1
+    solution = Solution(problem=small_camp_problem, assigned=assigned, status=OptimizationStatus.FEASIBLE)
+    filename = str(tmp_path / "camp_all.xlsx")
+
+    # Act
+    solution.to_visualization_excel(filename, properties={"maxSolveSeconds": 300})
+
+    # Assert
+    sheets = pd.read_excel(filename, sheet_name=None)
+    assert list(sheets) == ["solution", "properties"]
+    assert sheets["properties"]["maxSolveSeconds"].tolist() == [300]
+    assert Solution.from_excel(small_camp_problem, filename).get_selection_ids() == solution.get_selection_ids()
+
+
+def test_priority_matrix_keys_by_position():
+    # Arrange
+    groups = [Group.model_construct(id=i) for i in ["1", "12", "3"]]
+    activities = [Activity.model_construct(id=i) for i in ["23", "3", "7"]]
+    # "1" + "23" and "12" + "3" are the same string, group "3" lists "7" twice and an activity that is not in the camp
+    group_priorities = {"1": ["23"], "12": ["3"], "3": ["7", "99", "23", "7"]}
+
+    # Act
+    priorities = PriorityMatrix.build(groups, activities, group_priorities)
+
+    # Assert
+    assert list(zip(priorities.group.tolist(), priorities.activity.tolist())) == [(0, 0), (1, 1), (2, 2), (2, 0)]
+    assert priorities.value.tolist() == [20, 20, 17, 18]
+    assert priorities.to_dense().tolist() == [[20, 0, 0], [0, 20, 0], [18, 0, 17]]
+
+
+def test_group_availability_is_merged(timeslots):
+    # Arrange
+    later = Timeslot(start=datetime(2025, 9, 25, 16, 0), end=datetime(2025, 9, 25, 18, 0))
+    apart = Timeslot(start=datetime(2025, 9, 26, 9, 0), end=datetime(2025, 9, 26, 12, 0))
+    available = [*timeslots, later, apart]
+    group = Group(id="g1", size=10, size_without_leaders=8, age_span={"low": 8, "high": 12}, available=available)
+    slots = [
+        ActivityTimeslot(id=f"p{i}", capacity=10, start=start, end=end, real_end=end)
+        for i, (start, end) in enumerate(
+            [
+                # across the overlapping 9-10 and 9:30-16 and the touching 16-18
+                (datetime(2025, 9, 25, 9, 0), datetime(2025, 9, 25, 17, 0)),
+                (datetime(2025, 9, 25, 17, 0), datetime(2025, 9, 26, 10, 0)),
+                (datetime(2025, 9, 26, 9, 0), datetime(2025, 9, 26, 12, 0)),
+                (datetime(2025, 9, 24, 9, 0), datetime(2025, 9, 24, 10, 0)),
+            ]
+        )
+    ]
+
+    # Act
+    start, end = group.get_intervals()
+    contained = group.contains_all(slots)
+
+    # Assert
+    assert len(start) == len(end) == 2
+    assert contained.tolist() == [True, False, True, False]
+    assert [group.in_available_timeslots(t) for t in slots] == contained.tolist()
@@ -0,0 +1,89 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.build_model import ModelBuilder
+from opti_scout.decomposition import block_columns
+from opti_scout.heuristic import greedy_assignment
+from opti_scout.matrix import RowActivity
+
+import numpy as np
+from pytest import fixture, mark
+
+
+@fixture
+def small_camp_matrix(small_camp_problem: AssigningActivititesProblem):
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.assembly = "matrix"
+    model_builder.new_report("small_camp")
+    x = model_builder.generate_variables()
+    model_builder.add_constraints(x)
+    return model_builder.matrix
+
+
+@mark.parametrize("by, nb_blocks", [("day", 2), ("area", 4)])
+def test_blocks_cover_all_selections(small_camp_problem: AssigningActivititesProblem, by: str, nb_blocks: int):
+    # Act
+    blocks = block_columns(small_camp_problem, by)
+
+    # Assert
+    assert len(blocks) == nb_blocks
+    assert sorted(np.concatenate(blocks).tolist()) == list(range(len(small_camp_problem.selection_table)))
+
+
+def test_restricted_matrix_keeps_feasible_assignment(
+    small_camp_problem: AssigningActivititesProblem, small_camp_matrix
+):
+    # Arrange
+    assigned = greedy_assignment(small_camp_problem, 100, 10)
+    columns = block_columns(small_camp_problem, "day")[0]
+
+    # Act
+    block = small_camp_matrix.restrict(columns, assigned)
+
+    # Assert
+    assert small_camp_matrix.violated_rows(assigned) == 0
+    assert block.violated_rows(assigned[columns]) == 0
+    assert len(block.column_names) == len(columns)
+    assert 0 < block.num_rows < small_camp_matrix.num_rows
+    assert block.objective @ assigned[columns] == small_camp_matrix.objective[columns] @ assigned[columns]
+
+
+def test_row_activity_only_accepts_improving_changes(
+    small_camp_problem: AssigningActivititesProblem, small_camp_matrix
+):
+    # Arrange
+    table = small_camp_problem.selection_table
+    activity = RowActivity.create(small_camp_matrix, np.zeros(len(table), dtype=np.int8))
+    first, second = small_camp_problem.get_selection_index().by_group_activity[(0, 0)][:2]
+
+    # Act
+    added = activity.try_change(np.array([first]), np.array([1]))
+    both = activity.try_change(np.array([second]), np.array([1]))
+    removed = activity.try_change(np.array([first]), np.array([0]))
+
+    # Assert
+    assert added and not both and not removed
+    assert activity.nb_violated == 0
+    assert activity.objective_value == table.priority[first]
+
+
+@mark.parametrize("by", ["day", "area"])
+def test_decomposition_engine_returns_feasible_solution(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, by: str
+):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.engine = "decomposition"
+    model_builder.decomposeBy = by
+    model_builder.workers = 2
+    model_builder.maxSolveSeconds = 20
+    greedy = greedy_assignment(small_camp_problem, 100, 10)
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "decomposition"))
+
+    # Assert
+    assert solution.report.status == "FEASIBLE"
+    assert model_builder.matrix.violated_rows(solution.assigned) == 0
+    assert model_builder.matrix.objective @ greedy <= solution.report.objective <= 153
+    assert solution.report.objective == sum(s.priority for s in solution.selections)
+    assert model_builder.rounds[-1].violated_rows == 0
+    assert not list(tmp_path.glob("block_*.mps"))
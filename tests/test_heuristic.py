@@ -0,0 +1,167 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.build_model import ModelBuilder
+from opti_scout.heuristic import AssignmentState, greedy_assignment, priority_order
+from tests.synthetic import write_camp
+
+import numpy as np
+import time
+from pytest import mark
+
+
+def violated_rows(model_builder: ModelBuilder, assigned: np.ndarray) -> int:
+    blocks = [
+        model_builder.maxscout_rows(),
+        model_builder.max_1_session_rows(),
+        model_builder.no_overlapping_sessions_rows(),
+        model_builder.max_nb_of_most_popular_activities_rows(),
+        model_builder.max_sessions_per_group_rows(),
+        model_builder.at_most_1_activity_out_of_camp_rows(),
+    ]
+    violated = 0
+    for block in blocks:
+        lhs = np.bincount(block.row, weights=block.coefficient * assigned[block.column], minlength=block.num_rows)
+        violated += int((lhs > block.rhs + 1e-9).sum())
+    return violated
+
+
+@mark.parametrize("max_sessions, max_popular", [(100, 10), (2, 1), (1, 0)])
+def test_greedy_assignment_is_feasible(small_camp_problem: AssigningActivititesProblem, max_sessions, max_popular):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.maxSessionsPerGroup = max_sessions
+    model_builder.maxPopularActivities = max_popular
+
+    # Act
+    assigned = greedy_assignment(small_camp_problem, max_sessions, max_popular)
+
+    # Assert
+    assert assigned.any()
+    assert violated_rows(model_builder, assigned) == 0
+
+
+def test_greedy_assignment_is_feasible_on_synthetic_camp(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=80, nb_activities=20, seed=3)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    model_builder = ModelBuilder.create(problem)
+    model_builder.maxSessionsPerGroup = 3
+    model_builder.maxPopularActivities = 1
+
+    # Act
+    assigned = greedy_assignment(problem, 3, 1)
+
+    # Assert
+    assert assigned.any()
+    assert violated_rows(model_builder, assigned) == 0
+
+
+def test_greedy_assignment_keeps_preferred_rows(small_camp_problem: AssigningActivititesProblem):
+    # Arrange
+    state = AssignmentState.create(small_camp_problem, 100, 10)
+    preferred = np.zeros(len(small_camp_problem.selection_table), dtype=np.int8)
+    # the lowest priority selection that fits on its own
+    row = int(np.argmin(small_camp_problem.selection_table.priority))
+    preferred[row] = 1
+
+    # Act
+    assigned = greedy_assignment(small_camp_problem, 100, 10, preferred)
+
+    # Assert
+    assert state.fits(row)
+    assert assigned[row] == 1
+
+
+@mark.parametrize("lp_bound", [False, True])
+def test_heuristic_engine_returns_feasible_solution(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, lp_bound: bool
+):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.engine = "heuristic"
+    model_builder.lpBound = lp_bound
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "heuristic"))
+
+    # Assert
+    report = solution.report
+    assert solution.is_valid()
+    assert violated_rows(model_builder, solution.assigned) == 0
+    assert report.objective == sum(s.priority for s in solution.selections) <= 153
+    assert report.get_phase("local_search") is not None
+    assert (report.bound is not None) == lp_bound
+    if lp_bound:
+        assert report.bound >= 153
+        assert 0 <= report.gap < 1
+
+
+def test_local_search_improves_on_greedy(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=80, nb_activities=20, seed=3)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    order = priority_order(problem)
+    state = AssignmentState.create(problem, 3, 1)
+    state.greedy(order)
+    greedy_objective = state.objective
+    model_builder = ModelBuilder.create(problem)
+    model_builder.maxSessionsPerGroup = 3
+    model_builder.maxPopularActivities = 1
+
+    # Act
+    moves = state.local_search(order, time.perf_counter() + 10)
+
+    # Assert
+    assert moves > 0
+    assert state.objective > greedy_objective
+    assert violated_rows(model_builder, state.assigned) == 0
+
+
+@mark.parametrize("max_sessions", [2, 3])
+def test_heuristic_engine_reaches_the_optimum_of_small_camp(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, max_sessions: int
+):
+    # Arrange
+    # the optimum moves the first two groups to other sessions of their activities together
+    optimum = ModelBuilder.create(small_camp_problem)
+    optimum.model.verbose = 0
+    optimum.maxSessionsPerGroup = max_sessions
+    expected = optimum.solve(str(tmp_path / "optimum"))
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.engine = "heuristic"
+    model_builder.lpBound = False
+    model_builder.maxSessionsPerGroup = max_sessions
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "heuristic"))
+
+    # Assert
+    assert solution.report.objective == expected.report.objective
+    assert violated_rows(model_builder, solution.assigned) == 0
+
+
+def test_heuristic_gap_to_the_optimum_is_small(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=80, nb_activities=20, seed=3)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    optimum = ModelBuilder.create(problem)
+    optimum.model.verbose = 0
+    optimum.maxSessionsPerGroup = 3
+    optimum.maxPopularActivities = 1
+    expected = optimum.solve(str(tmp_path / "optimum"))
+    model_builder = ModelBuilder.create(problem)
+    model_builder.engine = "heuristic"
+    model_builder.lpBound = False
+    model_builder.maxSessionsPerGroup = 3
+    model_builder.maxPopularActivities = 1
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "heuristic"))
+
+    # Assert
+    assert expected.report.status == "OPTIMAL"
+    assert solution.report.objective >= 0.98 * expected.report.objective
+    assert violated_rows(model_builder, solution.assigned) == 0
@@ -0,0 +1,130 @@
+from opti_scout.classes import AssigningActivititesProblem, ProblemDelta
+from opti_scout.build_model import MIN_ROUND_SECONDS, ModelBuilder
+from opti_scout.lazy import ConflictGenerator
+
+from tests.synthetic import write_camp
+
+from mip import BINARY, Model, OptimizationStatus
+from pytest import mark, raises
+import numpy as np
+
+
+def test_conflict_generator_adds_broken_pairs_and_repairs():
+    # Arrange
+    model = Model()
+    x = [model.add_var(var_type=BINARY, obj=priority) for priority in [3, 1, 2, 5]]
+    generator = ConflictGenerator(x, np.array([[0, 1], [1, 2], [2, 3], [0, 3]]), group=np.array([0, 0, 1, 1]))
+    values = np.array([1.0, 1.0, 0.0, 1.0])
+
+    # Act
+    added = generator.add_rows(model, values)
+    assigned = generator.repair(values)
+
+    # Assert
+    # the pairs of group 0 with the broken (0, 1) and (0, 3), not (2, 3) of group 1
+    assert added == 3
+    assert generator.added.tolist() == [True, True, False, True]
+    assert model.num_rows == 3
+    # 1 has the lower priority in (0, 1), then 0 in (0, 3)
+    assert assigned.tolist() == [False, False, False, True]
+    assert len(generator.broken(assigned.astype(float))) == 0
+
+
+@mark.parametrize("conflictRows", ["rounds", "lazy"])
+def test_conflict_rows_left_out_give_same_optimum(tmp_path, conflictRows: str):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=12, nb_activities=8, nb_days=3)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    full = ModelBuilder.create(problem)
+    full.oneLocationPerDay = True
+    full.maxSessionsPerGroup = 2
+    full.model.verbose = 0
+    expected = full.solve(str(tmp_path / "full"))
+    model_builder = ModelBuilder.create(problem)
+    model_builder.oneLocationPerDay = True
+    model_builder.maxSessionsPerGroup = 2
+    model_builder.conflictRows = conflictRows
+    model_builder.model.verbose = 0
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / conflictRows))
+
+    # Assert
+    pairs = model_builder.conflict_pairs()
+    assigned = solution.assigned
+    assert solution.report.objective == expected.report.objective
+    assert not (assigned[pairs[:, 0]] & assigned[pairs[:, 1]]).any()
+    assert solution.report.rows < expected.report.rows - len(pairs) // 2
+    assert solution.report.lazy_rows > 0
+    assert solution.report.settings["conflictRows"] == conflictRows
+
+
+def test_update_with_conflict_rounds(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    delta = ProblemDelta(remove_groups=["g00001"])
+    rebuilt = ModelBuilder.create(small_camp_problem.apply(delta))
+    rebuilt.oneLocationPerDay = True
+    rebuilt.model.verbose = 0
+    expected = rebuilt.solve(str(tmp_path / "rebuilt"))
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.oneLocationPerDay = True
+    model_builder.conflictRows = "rounds"
+    model_builder.model.verbose = 0
+    model_builder.solve(str(tmp_path / "first"))
+
+    # Act
+    solution = model_builder.update(delta)
+
+    # Assert
+    assert solution.report.objective == expected.report.objective
+    assert solution.report.lazy_rounds >= 1
+    with raises(ValueError):
+        model_builder.conflictRows = "cuts"
+        model_builder.solve(str(tmp_path / "unknown"))
+
+
+class BreakingGenerator:
+    # finds broken pairs in every solution and repairs them by dropping all selections
+    def add_rows(self, model: Model, values: np.ndarray) -> int:
+        return 1
+
+    def repair(self, values: np.ndarray) -> np.ndarray:
+        return np.zeros(len(values), dtype=bool)
+
+
+@mark.parametrize(
+    "minSessionsPerGroup, expected", [(0, OptimizationStatus.FEASIBLE), (1, OptimizationStatus.NO_SOLUTION_FOUND)]
+)
+def test_rounds_out_of_time_only_return_a_repair_with_the_min_sessions(
+    small_camp_problem: AssigningActivititesProblem,
+    tmp_path,
+    monkeypatch,
+    minSessionsPerGroup: int,
+    expected: OptimizationStatus,
+):
+    # Arrange
+    run_solver = ModelBuilder.run_solver
+    seconds = []
+
+    def recorded_solver(model_builder: ModelBuilder, filename: str, max_seconds: float) -> OptimizationStatus:
+        seconds.append(max_seconds)
+        return run_solver(model_builder, filename, max_seconds)
+
+    monkeypatch.setattr(ModelBuilder, "run_solver", recorded_solver)
+    # g00004 has no selections and could never have its min sessions
+    model_builder = ModelBuilder.create(small_camp_problem.apply(ProblemDelta(remove_groups=["g00004"])))
+    model_builder.conflictRows = "rounds"
+    model_builder.minSessionsPerGroup = minSessionsPerGroup
+    model_builder.maxSolveSeconds = 0
+    model_builder.model.verbose = 0
+    filename = str(tmp_path / "rounds")
+    x = model_builder.build(filename)
+
+    # Act
+    status, assigned = model_builder.solve_rounds(x, filename, BreakingGenerator())
+
+    # Assert
+    assert status == expected
+    assert (assigned is not None) == (expected == OptimizationStatus.FEASIBLE)
+    assert seconds == [MIN_ROUND_SECONDS]
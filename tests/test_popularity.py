@@ -0,0 +1,90 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.popularity import Popularity
+
+from tests.synthetic import write_camp
+
+from pytest import raises
+import numpy as np
+
+
+def test_demand_matches_the_priorities_and_selections(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=40, nb_activities=10)
+    problem = AssigningActivititesProblem.from_json(file_name)
+
+    # Act
+    popularity = problem.get_popularity()
+
+    # Assert
+    sizes = {g.id: g.size for g in problem.groups}
+    for i, a in enumerate(problem.activities):
+        asking = [g for g, priorities in problem.group_priorities.items() if a.id in priorities]
+        assert popularity.activity_capacity[i] == sum(t.capacity for t in a.timeslots)
+        assert popularity.activity_groups[i] == len(asking)
+        assert popularity.activity_scouts[i] == sum(sizes[g] for g in asking)
+    for t, session in enumerate(problem.sessions):
+        selections = [s for s in problem.selections if s.time_slot is session]
+        assert popularity.session_groups[t] == len(selections)
+        assert popularity.session_scouts_without_leaders[t] == sum(s.group.size_without_leaders for s in selections)
+    assert problem.capacity_ratios == popularity.capacity_ratios()
+    assert problem.get_popularity() is popularity
+
+
+def test_popular_methods(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=40, nb_activities=10)
+
+    # Act
+    problem = AssigningActivititesProblem.from_json(file_name, popular_method="groupcount", nb_most_common=3)
+
+    # Assert
+    popularity = problem.get_popularity()
+    most_asked = np.sort(popularity.activity_groups)[-3:]
+    assert sorted(popularity.activity_groups[popularity.popular("groupcount", nb_most_common=3)]) == most_asked.tolist()
+    assert len(problem.popularactivities) == 3
+    assert set(popularity.activity_id[popularity.popular(threshold=1e9)]) == set(problem.capacity_ratios)
+    with raises(ValueError):
+        popularity.popular("seats")
+
+
+def test_popular_threshold_keeps_the_popular_method(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=40, nb_activities=10)
+    problem = AssigningActivititesProblem.from_json(file_name, popular_method="groupcount", nb_most_common=3)
+    problem.to_snapshot(str(tmp_path / "camp.npz"))
+
+    # Act
+    copy = problem.with_popular_threshold(1e9)
+    snapshot = AssigningActivititesProblem.from_snapshot(str(tmp_path / "camp.npz")).with_popular_threshold(1e9)
+
+    # Assert
+    assert [a.id for a in copy.popularactivities] == [a.id for a in problem.popularactivities]
+    assert [a.id for a in snapshot.popularactivities] == [a.id for a in problem.popularactivities]
+    assert (snapshot.popular_method, snapshot.nb_most_common) == ("groupcount", 3)
+
+
+def test_groupcount_tie_goes_to_the_activity_asked_for_first():
+    # Arrange
+    # a00002 and a00003 are asked for by two groups each, the first group asks for a00003 first
+    nothing = np.zeros(0, dtype=np.int64)
+    popularity = Popularity.build(
+        activity_id=np.array(["a00001", "a00002", "a00003"], dtype=object),
+        session_id=np.array([], dtype=object),
+        session_activity=nothing,
+        session_capacity=nothing,
+        group_size=np.array([10, 10]),
+        group_size_without_leaders=np.array([8, 8]),
+        priority_group=np.array([0, 0, 0, 1, 1]),
+        priority_activity=np.array([2, 1, 0, 1, 2]),
+        selection_group=nothing,
+        selection_session=nothing,
+    )
+
+    # Act
+    popular = popularity.popular("groupcount", nb_most_common=1)
+
+    # Assert
+    assert popularity.activity_id[popular].tolist() == ["a00003"]
@@ -0,0 +1,95 @@
+from opti_scout.classes import AssigningActivititesProblem, ProblemDelta
+from opti_scout.build_model import ModelBuilder
+from opti_scout.matrix import ModelMatrix, RowBlock
+from opti_scout.presolve import presolve
+
+from tests.synthetic import write_camp
+
+from pytest import mark, raises
+import numpy as np
+
+
+def test_presolve_drops_rows_that_never_bind_and_fixes_columns():
+    # Arrange
+    matrix = ModelMatrix(column_names=["a", "b", "c", "d"])
+    # capacities of 10 and 25 for sizes 12, 5, 8, 30: the first row fixes a and d, the second never binds
+    matrix.add(
+        RowBlock.create(
+            row=[0, 0, 0, 1, 1],
+            column=[0, 1, 3, 1, 2],
+            coefficient=[12, 5, 30, 5, 8],
+            sense="<=",
+            rhs=[10, 25],
+            nb_rows=2,
+        )
+    )
+    # a pair inside the clique row, a pair twice and a min of 0
+    matrix.add(
+        RowBlock.create(
+            row=[0, 0, 0, 1, 1, 2, 2], column=[0, 1, 2, 1, 2, 1, 2], coefficient=1, sense="<=", rhs=1, nb_rows=3
+        )
+    )
+    matrix.add(RowBlock.create(row=[0, 0], column=[1, 2], coefficient=1, sense=">=", rhs=0, nb_rows=1))
+
+    # Act
+    report = presolve(matrix, np.array([0, 0, 1, 1, 1, 2]), ["capacity", "packing", "min"])
+
+    # Assert
+    assert matrix.fixed.tolist() == [True, False, False, True]
+    assert report.fixed_columns == 2
+    assert report.dropped_rows == {"capacity": 2, "min": 1}
+    assert report.dominated_pairs == 2
+    assert report.rows_after == matrix.num_rows == 1
+    assert matrix.blocks[1].column.tolist() == [1, 2]
+
+
+def test_presolve_keeps_the_optimum_of_small_camp(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.presolve = True
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "small_camp"))
+
+    # Assert
+    report = solution.report
+    assert model_builder.assembly == "matrix"
+    assert report.objective == 153
+    assert report.presolve.rows_after < report.presolve.rows_before
+    assert report.rows == report.presolve.rows_after == model_builder.model.num_rows
+    assert report.presolve.dropped_rows["add_min_session_per_group_constraint"] == 4
+    with raises(ValueError):
+        model_builder.update(ProblemDelta(remove_groups=["g00001"]))
+
+
+@mark.parametrize("mode", ["pairwise", "clique"])
+def test_presolved_solution_is_feasible_for_the_whole_model(tmp_path, mode: str):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=60, nb_activities=20)
+    problem = AssigningActivititesProblem.from_json(file_name)
+    full = ModelBuilder.create(problem)
+    full.assembly = "matrix"
+    full.noOverlapMode = mode
+    full.maxSessionsPerGroup = 2
+    full.model.verbose = 0
+    expected = full.solve(str(tmp_path / "full"))
+    model_builder = ModelBuilder.create(problem)
+    model_builder.presolve = True
+    model_builder.noOverlapMode = mode
+    model_builder.maxSessionsPerGroup = 2
+    model_builder.model.verbose = 0
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "presolved"))
+
+    # Assert
+    too_large = (
+        problem.get_selection_sizes()
+        > np.array([t.capacity for t in problem.sessions])[problem.selection_table.session]
+    )
+    assert solution.report.objective == expected.report.objective
+    assert full.matrix.violated_rows(solution.assigned) == 0
+    assert (model_builder.matrix.fixed[too_large]).all()
+    assert not solution.assigned[model_builder.matrix.fixed].any()
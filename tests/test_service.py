@@ -0,0 +1,95 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.build_model import ModelBuilder
+from opti_scout.service import SolveService, solve_job
+from opti_scout.solver import SolverConfig
+
+from tests.synthetic import write_camp
+
+from mip import OptimizationStatus
+from pytest import raises
+import asyncio
+import queue
+
+
+def test_jobs_stream_their_progress_and_end_with_the_solution(
+    small_camp_problem: AssigningActivititesProblem, tmp_path
+):
+    # Arrange
+    async def run():
+        service = SolveService(workers=2, poll_seconds=0.05)
+        jobs = [
+            service.submit(small_camp_problem, str(tmp_path / "all")),
+            service.submit(small_camp_problem, str(tmp_path / "one"), {"maxSessionsPerGroup": 1}),
+        ]
+        events = {job.job: [e async for e in job.events()] for job in jobs}
+        return jobs, events, [await job.result() for job in jobs]
+
+    # Act
+    jobs, events, solutions = asyncio.run(run())
+
+    # Assert
+    kinds = [e.kind for e in events["job1"]]
+    assert kinds[:2] == ["queued", "started"] and kinds[-1] == "done"
+    assert "optimize" in [e.phase.name for e in events["job1"] if e.kind == "phase"]
+    assert all(e.job == "job1" for e in events["job1"])
+    assert solutions[0].report.objective == 153
+    assert solutions[1].report.settings["maxSessionsPerGroup"] == 1
+    assert solutions[1].assigned.sum() <= len(small_camp_problem.groups)
+    assert all(job.state == "done" for job in jobs)
+    assert (tmp_path / "all.log").exists()
+
+
+def test_cancelled_jobs_stop_their_worker(tmp_path):
+    # Arrange
+    file_name = str(tmp_path / "camp.json")
+    write_camp(file_name, nb_groups=300, nb_activities=60)
+    problem = AssigningActivititesProblem.from_json(file_name)
+
+    async def run():
+        service = SolveService(workers=1, poll_seconds=0.05)
+        running = service.submit(problem, str(tmp_path / "running"), {"maxSolveSeconds": 600})
+        queued = service.submit(problem, str(tmp_path / "queued"))
+        async for event in running.events():
+            if event.kind == "phase":
+                await running.cancel()
+        await queued.cancel()
+        with raises(asyncio.CancelledError):
+            await running.result()
+        return running, queued, [e.kind async for e in queued.events()]
+
+    # Act
+    running, queued, queued_events = asyncio.run(run())
+
+    # Assert
+    assert running.state == "cancelled"
+    assert not running.process.is_alive()
+    assert queued.process is None
+    assert queued_events == ["queued", "cancelled"]
+
+
+def test_extended_search_keeps_the_phases_of_the_build(
+    small_camp_problem: AssigningActivititesProblem, tmp_path, monkeypatch
+):
+    # Arrange
+    run_solver = ModelBuilder.run_solver
+
+    def stopped_solver(model_builder: ModelBuilder, filename: str, max_seconds: float) -> OptimizationStatus:
+        # the first search stops as if on its time limit
+        status = run_solver(model_builder, filename, max_seconds)
+        return OptimizationStatus.FEASIBLE if model_builder.warmStart is None else status
+
+    monkeypatch.setattr(ModelBuilder, "run_solver", stopped_solver)
+    events, commands = queue.Queue(), queue.Queue()
+    commands.put(5)
+
+    # Act
+    solve_job("job1", small_camp_problem, {}, SolverConfig(), str(tmp_path / "camp"), events, commands)
+
+    # Assert
+    messages = [events.get_nowait() for _ in range(events.qsize())]
+    kind, _, status, report = messages[-1]
+    phases = [p.name for p in report.phases]
+    assert kind == "result" and status == OptimizationStatus.OPTIMAL
+    assert "extended" in [m[1].kind for m in messages[:-1]]
+    assert phases[0] == "generate_variables" and phases.count("optimize") == 2
+    assert report.build_seconds > 0 and report.rows > 0
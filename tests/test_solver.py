@@ -0,0 +1,105 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.build_model import ModelBuilder
+from opti_scout.solver import SolverConfig, parse_progress_line, parse_solver_log
+
+from pytest import importorskip, mark, raises
+
+
+def test_parse_solver_log_reads_nodes_and_first_solution():
+    # Arrange
+    log = "\n".join(
+        [
+            "Cbc0038I Solution found of -8704",
+            "Cbc0012I Integer solution of -8967 found by feasibility pump after 0 iterations and 0 nodes "
+            "(24.55 seconds)",
+            "Cbc0012I Integer solution of -9155 found by RINS after 23220 iterations and 41 nodes (47.45 seconds)",
+            "Enumerated nodes:               6003",
+        ]
+    )
+
+    # Act
+    nodes, first_feasible_seconds = parse_solver_log(log)
+
+    # Assert
+    assert nodes == 6003
+    assert first_feasible_seconds == 24.55
+    assert parse_solver_log("") == (None, None)
+
+
+@mark.parametrize("assembly", ["expression", "matrix"])
+def test_solver_config_is_applied_and_reported(small_camp_problem: AssigningActivititesProblem, tmp_path, assembly):
+    # Arrange
+    config = SolverConfig(threads=1, cuts=0, preprocess=0, emphasis=2, maxMipGap=0.0, maxNodes=1000, solverLog=True)
+    model_builder = ModelBuilder.create(small_camp_problem, config)
+    model_builder.model.verbose = 0
+    model_builder.assembly = assembly
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "small_camp"))
+
+    # Assert
+    assert solution.report.objective == 153
+    assert solution.report.gap == 0
+    assert solution.report.nodes is not None
+    assert solution.report.settings["cuts"] == 0
+    assert solution.report.settings["maxNodes"] == 1000
+    assert model_builder.model.threads == 1
+    assert model_builder.model.max_mip_gap == 0.0
+    assert (tmp_path / "small_camp_solver.log").exists()
+
+
+def test_solver_log_is_only_written_when_asked_for(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "small_camp"))
+
+    # Assert
+    assert solution.report.objective == 153
+    assert solution.report.nodes is None
+    assert not (tmp_path / "small_camp_solver.log").exists()
+
+
+def test_unknown_backend_is_rejected(small_camp_problem: AssigningActivititesProblem):
+    # Act / Assert
+    with raises(ValueError):
+        ModelBuilder.create(small_camp_problem, SolverConfig(backend="glpk"))
+
+
+def test_highs_backend_gives_same_optimum(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    importorskip("highspy")
+    model_builder = ModelBuilder.create(small_camp_problem)
+    model_builder.model.verbose = 0
+    model_builder.assembly = "matrix"
+    model_builder.solverConfig = SolverConfig(backend="highs", solverLog=True)
+
+    # Act
+    solution = model_builder.solve(str(tmp_path / "small_camp"))
+
+    # Assert
+    assert model_builder.model.solver_name.upper() == "HIGHS"
+    assert solution.report.objective == 153
+    assert solution.report.nodes is not None
+
+
+def test_parse_progress_line_reads_the_branch_and_bound():
+    # Arrange
+    lines = [
+        " ★       2        1      2           20458 DiveCoefficient          20654.1    0.96%      24.8",
+        "      1403      303     60          -1e+50                          1998.65  100.00%      1.01",
+        "Cbc0010I After 100 nodes, 5 on tree, -8967 best solution, best possible -9206 (35.40 seconds)",
+        "  Pass     Rows    Tight   Frac     Suminf        Objective  Time(s)",
+    ]
+
+    # Act
+    events = [parse_progress_line(line) for line in lines]
+
+    # Assert
+    assert (events[0].nodes, events[0].objective, events[0].bound, events[0].seconds) == (2, 20458, 20654.1, 24.8)
+    assert events[1].objective is None and events[1].bound == 1998.65
+    assert (events[2].nodes, events[2].objective, events[2].bound) == (100, 8967, 9206)
+    assert round(events[2].gap, 4) == round(239 / 9206, 4)
+    assert events[3] is None
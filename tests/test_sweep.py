@@ -0,0 +1,38 @@
+from opti_scout.classes import AssigningActivititesProblem
+from opti_scout.sweep import Sweep
+
+
+def test_sweep_solves_all_scenarios(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    sweep = Sweep.grid(small_camp_problem, maxPopularActivities=[0, 1], popularThreshold=[None, 0.6])
+    sweep.workers = 2
+
+    # Act
+    df = sweep.run(str(tmp_path))
+
+    # Assert
+    assert len(df) == 4
+    assert (df["status"] == "OPTIMAL").all()
+    objective = dict(zip(df["scenario"], df["objective"]))
+    assert objective["mi0mx100po1"] == 153
+    assert objective["mi0mx100po0"] <= objective["mi0mx100po1"]
+    assert objective["mi0mx100po0th0.6"] <= objective["mi0mx100po0"]
+    assert set(df["nb_popular_activities"]) == {1, 2}
+    assert (df["fulfilled_share"] <= 1).all()
+
+
+def test_sweep_writes_comparison_table(small_camp_problem: AssigningActivititesProblem, tmp_path):
+    # Arrange
+    sweep = Sweep.grid(small_camp_problem, maxSessionsPerGroup=[1, 2])
+    sweep.engine = "heuristic"
+    sweep.workers = 1
+    sweep.run(str(tmp_path))
+
+    # Act
+    sweep.to_excel(str(tmp_path / "sweep.xlsx"))
+
+    # Assert
+    assert (tmp_path / "sweep.xlsx").exists()
+    df = sweep.to_dataframe()
+    assert list(df["scenario"]) == ["mi0mx1po10", "mi0mx2po10"]
+    assert df["fulfilled"].iloc[0] <= df["fulfilled"].iloc[1]